@@ -58,6 +58,8 @@ def do_run_migrations(connection: Connection) -> None:
         target_metadata=target_metadata,
         compare_type=True,
         compare_server_default=True,
+        # SQLite cannot ALTER most things in place, so let Alembic rebuild tables
+        render_as_batch=connection.dialect.name == "sqlite",
     )
 
     with context.begin_transaction():
@@ -0,0 +1,38 @@
+"""user progress indexes
+
+Revision ID: 5b7e2c91d4a0
+Revises: 03972334d397
+Create Date: 2026-10-17 09:12:44.318204
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5b7e2c91d4a0"
+down_revision: str | None = "03972334d397"
+branch_labels: str | None = None
+depends_on: str | None = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_user_training_programs_user_active",
+        "user_training_programs",
+        ["user_id", "program_id"],
+        unique=False,
+        sqlite_where=sa.text("end_date IS NULL"),
+        postgresql_where=sa.text("end_date IS NULL"),
+    )
+    op.create_index(
+        "ix_user_workouts_program_finished",
+        "user_workouts",
+        ["user_program_id", "finished_at", "workout_id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_user_workouts_program_finished", table_name="user_workouts")
+    op.drop_index("ix_user_training_programs_user_active", table_name="user_training_programs")
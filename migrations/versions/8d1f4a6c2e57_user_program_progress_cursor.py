@@ -0,0 +1,74 @@
+"""user program progress cursor
+
+Revision ID: 8d1f4a6c2e57
+Revises: 5b7e2c91d4a0
+Create Date: 2026-10-17 10:05:31.902417
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "8d1f4a6c2e57"
+down_revision: str | None = "5b7e2c91d4a0"
+branch_labels: str | None = None
+depends_on: str | None = None
+
+
+user_training_programs = sa.table(
+    "user_training_programs",
+    sa.column("id", sa.Integer),
+    sa.column("next_workout_order", sa.Integer),
+    sa.column("completed_workouts", sa.Integer),
+)
+user_workouts = sa.table(
+    "user_workouts",
+    sa.column("workout_id", sa.Integer),
+    sa.column("user_program_id", sa.Integer),
+    sa.column("finished_at", sa.DateTime),
+)
+workouts = sa.table(
+    "workouts",
+    sa.column("id", sa.Integer),
+    sa.column("order", sa.Integer),
+)
+
+
+def upgrade() -> None:
+    op.add_column(
+        "user_training_programs",
+        sa.Column("next_workout_order", sa.Integer(), server_default="1", nullable=False),
+    )
+    op.add_column(
+        "user_training_programs",
+        sa.Column("completed_workouts", sa.Integer(), server_default="0", nullable=False),
+    )
+
+    # Backfill: the next workout follows the most recently finished one
+    last_order = (
+        sa.select(workouts.c.order)
+        .select_from(user_workouts.join(workouts, workouts.c.id == user_workouts.c.workout_id))
+        .where(user_workouts.c.user_program_id == user_training_programs.c.id)
+        .order_by(user_workouts.c.finished_at.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    completed = (
+        sa.select(sa.func.count())
+        .select_from(user_workouts)
+        .where(user_workouts.c.user_program_id == user_training_programs.c.id)
+        .scalar_subquery()
+    )
+    op.execute(
+        user_training_programs.update().values(
+            next_workout_order=sa.func.coalesce(last_order, 0) + 1,
+            completed_workouts=completed,
+        )
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("user_training_programs") as batch_op:
+        batch_op.drop_column("completed_workouts")
+        batch_op.drop_column("next_workout_order")
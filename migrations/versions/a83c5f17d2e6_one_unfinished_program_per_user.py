@@ -0,0 +1,64 @@
+"""one unfinished program per user
+
+Revision ID: a83c5f17d2e6
+Revises: f6b2d8e04a91
+Create Date: 2026-10-17 19:05:31.240718
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a83c5f17d2e6"
+down_revision: str | None = "f6b2d8e04a91"
+branch_labels: str | None = None
+depends_on: str | None = None
+
+
+user_training_programs = sa.table(
+    "user_training_programs",
+    sa.column("id", sa.Integer),
+    sa.column("user_id", sa.BigInteger),
+    sa.column("end_date", sa.DateTime),
+)
+
+
+def upgrade() -> None:
+    # Concurrent registrations could leave a user with several unfinished
+    # programs, only the latest one stays unfinished
+    later = user_training_programs.alias("later")
+    op.execute(
+        user_training_programs.update()
+        .where(
+            user_training_programs.c.end_date.is_(None),
+            sa.exists().where(
+                later.c.user_id == user_training_programs.c.user_id,
+                later.c.end_date.is_(None),
+                later.c.id > user_training_programs.c.id,
+            ),
+        )
+        .values(end_date=sa.func.current_timestamp())
+    )
+
+    op.drop_index("ix_user_training_programs_user_active", table_name="user_training_programs")
+    op.create_index(
+        "uix_user_training_programs_user_active",
+        "user_training_programs",
+        ["user_id"],
+        unique=True,
+        sqlite_where=sa.text("end_date IS NULL"),
+        postgresql_where=sa.text("end_date IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uix_user_training_programs_user_active", table_name="user_training_programs")
+    op.create_index(
+        "ix_user_training_programs_user_active",
+        "user_training_programs",
+        ["user_id", "program_id"],
+        unique=False,
+        sqlite_where=sa.text("end_date IS NULL"),
+        postgresql_where=sa.text("end_date IS NULL"),
+    )
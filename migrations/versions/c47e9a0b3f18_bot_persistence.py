@@ -0,0 +1,41 @@
+"""bot persistence
+
+Revision ID: c47e9a0b3f18
+Revises: 8d1f4a6c2e57
+Create Date: 2026-10-17 11:38:02.517390
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c47e9a0b3f18"
+down_revision: str | None = "8d1f4a6c2e57"
+branch_labels: str | None = None
+depends_on: str | None = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "persisted_user_data",
+        sa.Column("user_id", sa.BigInteger(), nullable=False),
+        sa.Column("data", sa.JSON(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+    op.create_table(
+        "persisted_conversations",
+        sa.Column("name", sa.String(length=64), nullable=False),
+        sa.Column("key", sa.String(length=128), nullable=False),
+        sa.Column("state", sa.JSON(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("name", "key"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("persisted_conversations")
+    op.drop_table("persisted_user_data")
@@ -0,0 +1,27 @@
+"""training program content hash
+
+Revision ID: e3a9d5b71c20
+Revises: c47e9a0b3f18
+Create Date: 2026-10-17 14:12:45.803126
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e3a9d5b71c20"
+down_revision: str | None = "c47e9a0b3f18"
+branch_labels: str | None = None
+depends_on: str | None = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "training_programs", sa.Column("content_hash", sa.String(length=64), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("training_programs") as batch_op:
+        batch_op.drop_column("content_hash")
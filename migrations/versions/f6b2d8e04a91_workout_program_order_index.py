@@ -0,0 +1,81 @@
+"""workout program order index
+
+Revision ID: f6b2d8e04a91
+Revises: e3a9d5b71c20
+Create Date: 2026-10-17 16:40:18.527390
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f6b2d8e04a91"
+down_revision: str | None = "e3a9d5b71c20"
+branch_labels: str | None = None
+depends_on: str | None = None
+
+
+workouts = sa.table(
+    "workouts",
+    sa.column("id", sa.Integer),
+    sa.column("program_id", sa.Integer),
+    sa.column("order", sa.Integer),
+)
+user_workouts = sa.table(
+    "user_workouts",
+    sa.column("id", sa.Integer),
+    sa.column("user_id", sa.BigInteger),
+    sa.column("workout_id", sa.Integer),
+    sa.column("user_program_id", sa.Integer),
+)
+
+
+def _same_position(workout: sa.TableClause, other: sa.TableClause) -> sa.ColumnElement[bool]:
+    return sa.and_(other.c.program_id == workout.c.program_id, other.c.order == workout.c.order)
+
+
+def upgrade() -> None:
+    # Duplicates created by earlier loader runs are merged into the oldest workout
+    workout = workouts.alias("workout")
+    kept = workouts.alias("kept")
+    earlier = user_workouts.alias("earlier")
+    earlier_workout = workouts.alias("earlier_workout")
+
+    # A user program keeps only its first record of a merged workout
+    op.execute(
+        user_workouts.delete().where(
+            sa.exists()
+            .select_from(
+                earlier.join(earlier_workout, earlier_workout.c.id == earlier.c.workout_id)
+            )
+            .where(
+                workout.c.id == user_workouts.c.workout_id,
+                _same_position(workout, earlier_workout),
+                earlier.c.user_id == user_workouts.c.user_id,
+                earlier.c.user_program_id == user_workouts.c.user_program_id,
+                earlier.c.id < user_workouts.c.id,
+            )
+        )
+    )
+    kept_id = (
+        sa.select(sa.func.min(kept.c.id))
+        .where(workout.c.id == user_workouts.c.workout_id, _same_position(workout, kept))
+        .scalar_subquery()
+    )
+    op.execute(
+        user_workouts.update()
+        .where(user_workouts.c.workout_id != kept_id)
+        .values(workout_id=kept_id)
+    )
+    op.execute(
+        workouts.delete().where(
+            sa.exists().where(_same_position(workouts, kept), kept.c.id < workouts.c.id)
+        )
+    )
+
+    op.create_index("uix_workouts_program_order", "workouts", ["program_id", "order"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index("uix_workouts_program_order", table_name="workouts")
@@ -0,0 +1,227 @@
+"""Measure routing cost of callback query updates in the running conversation.
+
+Compares the conversation handler with one regex pattern handler per button
+and the id parsing its callbacks did, against the current handler routing
+compact callback data with one dict lookup and pre-decoded ids.
+
+Every callback query a user can send in each conversation state is routed
+through ConversationHandler.check_update, no callbacks are run:
+
+    python -m scripts.bench_callback_routing [--rounds 20000]
+"""
+
+import argparse
+import time
+import warnings
+from collections.abc import Callable
+from datetime import UTC, datetime
+from typing import Any
+
+from telegram import CallbackQuery, Chat, Message, Update, User
+from telegram.ext import BaseHandler, CallbackQueryHandler, ConversationHandler
+from telegram.warnings import PTBUserWarning
+
+from src.bot.callback_data import CallbackAction, encode_callback_data
+from src.bot.handlers import running
+from src.bot.handlers.running import get_running_conversation_handler
+
+USER = User(id=42, first_name="Bench", is_bot=False)
+CHAT = Chat(id=42, type=Chat.PRIVATE)
+
+# Buttons of each state as (action, ids), keyboards of the running conversation
+STATE_BUTTONS: dict[int, list[tuple[CallbackAction, tuple[int, ...]]]] = {
+    running.SHOW_PROGRAMS: [(CallbackAction.PROGRAM, (12,))],
+    running.ACCEPT_PROGRAM_MENU: [
+        (CallbackAction.PROGRAM, (12,)),
+        (CallbackAction.GIVE_ACTIVE_WORKOUT, ()),
+    ],
+    running.SHOW_PROGRAM_MENU: [
+        (CallbackAction.SHOW_PROGRAM, (12,)),
+        (CallbackAction.BACK_TO_PROGRAMS, ()),
+        (CallbackAction.REGISTER_PROGRAM, (12,)),
+        (CallbackAction.END_PROGRAM, (12,)),
+        (CallbackAction.GIVE_ACTIVE_WORKOUT, ()),
+    ],
+    running.SHOW_WORKOUTS: [
+        (CallbackAction.WORKOUT, (345,)),
+        (CallbackAction.PROGRAM, (12,)),
+        (CallbackAction.SHOW_PROGRAM, (12,)),
+    ],
+    running.SHOW_WORKOUT_DETAILS: [
+        (CallbackAction.SHOW_PROGRAM, (12,)),
+        (CallbackAction.PROGRAM, (12,)),
+        (CallbackAction.END_WORKOUT, (12, 345)),
+    ],
+    running.SHOW_END_WORKOUT: [
+        (CallbackAction.GIVE_ACTIVE_WORKOUT, ()),
+        (CallbackAction.SHOW_PROGRAM, (12,)),
+        (CallbackAction.MAIN_MENU, ()),
+    ],
+}
+
+LEGACY_DATA = {
+    CallbackAction.RUNNING: "running",
+    CallbackAction.MAIN_MENU: "main_menu",
+    CallbackAction.BACK_TO_PROGRAMS: "back_to_programs",
+    CallbackAction.GIVE_ACTIVE_WORKOUT: "give_active_workout",
+    CallbackAction.PROGRAM: "program_{}",
+    CallbackAction.SHOW_PROGRAM: "show_program_{}",
+    CallbackAction.WORKOUT: "workout_{}",
+    CallbackAction.REGISTER_PROGRAM: "reg_program_{}",
+    CallbackAction.END_PROGRAM: "end_program_{}",
+    CallbackAction.END_WORKOUT: "end_workout_{}_{}",
+}
+
+# Patterns and id parsing of the handlers before the compact callback data
+LEGACY_PATTERNS = {
+    "running": "^running$",
+    "program": "^program_",
+    "show_program": "^show_program_",
+    "workout": "^workout_",
+    "back_to_programs": "^back_to_programs$",
+    "main_menu": "^main_menu$",
+    "reg_program": "^reg_program_",
+    "end_program": "^end_program_",
+    "give_active_workout": "^give_active_workout$",
+    "end_workout": "^end_workout_",
+}
+LEGACY_PARSERS: dict[str, Callable[[str], tuple[int, ...]]] = {
+    "program": lambda data: (int(data.split("_")[1]),),
+    "show_program": lambda data: (int(data.split("_")[-1]),),
+    "workout": lambda data: (int(data.split("_")[1]),),
+    "reg_program": lambda data: (int(data.split("_")[-1]),),
+    "end_program": lambda data: (int(data.split("_")[-1]),),
+    "end_workout": lambda data: tuple(map(int, data.split("_")[-2:])),
+}
+
+
+# Pattern names of the legacy handlers, to parse ids the way their callback did
+LEGACY_HANDLER_NAMES: dict[BaseHandler[Any, Any, Any], str] = {}
+
+
+async def _unused(update: Any, context: Any) -> None:
+    pass
+
+
+def legacy_handler(name: str) -> CallbackQueryHandler[Any, Any]:
+    handler: CallbackQueryHandler[Any, Any] = CallbackQueryHandler(
+        _unused, pattern=LEGACY_PATTERNS[name]
+    )
+    LEGACY_HANDLER_NAMES[handler] = name
+    return handler
+
+
+def get_legacy_conversation_handler() -> ConversationHandler:
+    """Build the running conversation handler as it was before the compact callback data."""
+    return ConversationHandler(
+        entry_points=[legacy_handler("running")],
+        states={
+            running.SHOW_PROGRAMS: [legacy_handler("program")],
+            running.ACCEPT_PROGRAM_MENU: [
+                legacy_handler("program"),
+                legacy_handler("give_active_workout"),
+            ],
+            running.SHOW_PROGRAM_MENU: [
+                legacy_handler("show_program"),
+                legacy_handler("back_to_programs"),
+                legacy_handler("reg_program"),
+                legacy_handler("end_program"),
+                legacy_handler("give_active_workout"),
+            ],
+            running.SHOW_WORKOUTS: [
+                legacy_handler("workout"),
+                legacy_handler("program"),
+                legacy_handler("show_program"),
+            ],
+            running.SHOW_WORKOUT_DETAILS: [
+                legacy_handler("show_program"),
+                legacy_handler("program"),
+                legacy_handler("end_workout"),
+            ],
+            running.SHOW_END_WORKOUT: [
+                legacy_handler("give_active_workout"),
+                legacy_handler("show_program"),
+            ],
+        },
+        fallbacks=[legacy_handler("main_menu")],
+        name="legacy_running_conversation",
+        allow_reentry=True,
+    )
+
+
+def make_update(data: str) -> Update:
+    message = Message(message_id=1, date=datetime.now(UTC), chat=CHAT, from_user=USER)
+    query = CallbackQuery(id="1", from_user=USER, chat_instance="bench", data=data, message=message)
+    return Update(update_id=1, callback_query=query)
+
+
+def route_legacy(conversation: ConversationHandler, update: Update) -> tuple[int, ...]:
+    state, key, handler, check = conversation.check_update(update)
+    # The handler callbacks parsed their ids from the callback data
+    parse = LEGACY_PARSERS.get(LEGACY_HANDLER_NAMES[handler])
+    return parse(update.callback_query.data) if parse else ()
+
+
+def route_compact(conversation: ConversationHandler, update: Update) -> tuple[int, ...]:
+    state, key, handler, check = conversation.check_update(update)
+    return check[1]
+
+
+def measure(
+    conversation: ConversationHandler,
+    route: Callable[[ConversationHandler, Update], tuple[int, ...]],
+    encode: Callable[[CallbackAction, tuple[int, ...]], str],
+    rounds: int,
+) -> tuple[int, float]:
+    # Updates of every state, the user's conversation is set to it before routing
+    key = (CHAT.id, USER.id)
+    cases = [
+        (state, make_update(encode(action, ids)), ids)
+        for state, buttons in STATE_BUTTONS.items()
+        for action, ids in buttons
+    ]
+    for state, update, ids in cases:
+        conversation._conversations[key] = state
+        routed = route(conversation, update)
+        if routed != ids:
+            raise AssertionError(f"{update.callback_query.data} routed with ids {routed}")
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for state, update, _ids in cases:
+            conversation._conversations[key] = state
+            route(conversation, update)
+    elapsed = time.perf_counter() - started
+    return rounds * len(cases), elapsed
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=20000, help="repetitions of all updates")
+    args = parser.parse_args()
+    # The legacy handler warns about per_message like the original did
+    warnings.filterwarnings("ignore", category=PTBUserWarning)
+
+    variants = [
+        (
+            "regex patterns, parsed ids",
+            get_legacy_conversation_handler(),
+            route_legacy,
+            lambda action, ids: LEGACY_DATA[action].format(*ids),
+        ),
+        (
+            "compact data, dict routing",
+            get_running_conversation_handler(),
+            route_compact,
+            lambda action, ids: encode_callback_data(action, *ids),
+        ),
+    ]
+    print(f"Routing callback queries of {len(STATE_BUTTONS)} conversation states")
+    for name, conversation, route, encode in variants:
+        updates, elapsed = measure(conversation, route, encode, args.rounds)
+        print(f"  {name:<28} {elapsed / updates * 1e6:6.2f} us/update  ({updates} updates)")
+
+
+if __name__ == "__main__":
+    main()
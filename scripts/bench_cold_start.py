@@ -0,0 +1,96 @@
+"""Measure cold start of the program loader and the bot's catalog warm-up.
+
+Compares the steps before and after catalog snapshots:
+
+- parsing all program YAML files with the pure Python and the libyaml loader
+- warming the catalog from the database and from the snapshot
+- loader runs on an unchanged catalog without and with the snapshot
+
+Writes to the configured database, run it against a scratch DATA_DIR:
+
+    DATA_DIR=/tmp/bench alembic upgrade head
+    DATA_DIR=/tmp/bench python -m scripts.bench_cold_start [--runs 5]
+"""
+
+import argparse
+import asyncio
+import io
+import time
+from collections.abc import Awaitable, Callable
+from contextlib import redirect_stdout
+from typing import Any
+
+import yaml  # type: ignore
+
+from scripts.load_running_program import YAML_LOADER, get_trainings_dir, load_trainings
+from src.bot.config import get_settings
+from src.bot.db.catalog import catalog
+
+
+def report(name: str, timings: list[float]) -> None:
+    print(f"  {name:<34} best {min(timings) * 1000:8.1f} ms  worst {max(timings) * 1000:8.1f} ms")
+
+
+def measure_sync(runs: int, func: Callable[[], Any]) -> list[float]:
+    timings = []
+    # Keep loader and catalog output out of the report
+    with redirect_stdout(io.StringIO()):
+        for _ in range(runs):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+    return timings
+
+
+async def measure(runs: int, func: Callable[[], Awaitable[Any]]) -> list[float]:
+    timings = []
+    with redirect_stdout(io.StringIO()):
+        for _ in range(runs):
+            started = time.perf_counter()
+            await func()
+            timings.append(time.perf_counter() - started)
+    return timings
+
+
+async def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5, help="repetitions of each step")
+    args = parser.parse_args()
+    trainings_dir = get_trainings_dir()
+    snapshot_path = get_settings().catalog_snapshot_path or "catalog.snapshot"
+    contents = [path.read_bytes() for path in sorted(trainings_dir.glob("*.yaml"))]
+    print(f"{len(contents)} program files, {sum(map(len, contents)) // 1024} KiB")
+
+    print("YAML parsing")
+    report(
+        "SafeLoader",
+        measure_sync(args.runs, lambda: [yaml.load(c, Loader=yaml.SafeLoader) for c in contents]),
+    )
+    report(
+        YAML_LOADER.__name__,
+        measure_sync(args.runs, lambda: [yaml.load(c, Loader=YAML_LOADER) for c in contents]),
+    )
+
+    # Bring the database and the snapshot up to date
+    await measure(1, lambda: load_trainings(trainings_dir, snapshot_path))
+
+    print("Catalog warm-up at bot startup")
+    report("database", await measure(args.runs, catalog.load))
+    report(
+        "snapshot",
+        measure_sync(args.runs, lambda: catalog.load_snapshot(snapshot_path)),
+    )
+
+    print("Loader on an unchanged catalog")
+    report(
+        "without snapshot", await measure(args.runs, lambda: load_trainings(trainings_dir, None))
+    )
+    report(
+        "with snapshot",
+        await measure(args.runs, lambda: load_trainings(trainings_dir, snapshot_path)),
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
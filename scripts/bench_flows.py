@@ -0,0 +1,474 @@
+"""Replay benchmark of the conversation flows against a local fake Bot API server.
+
+Simulated users drive the real main menu conversation handler: /start,
+running, program, register, two workouts, main menu and ending the program.
+Each user taps a button of the last keyboard the bot sent it and waits for
+the bot's reply before the next tap. The fake Bot API server answers over
+HTTP in the same process, so timings include python-telegram-bot's requests.
+
+Reports reply latency percentiles per step, updates per second, and SQL
+statements and Bot API calls per update, and handlers over their query
+budget (see bot.query_budget). Writes to the configured database,
+run it against a scratch DATA_DIR:
+
+    DATA_DIR=/tmp/bench alembic upgrade head
+    DATA_DIR=/tmp/bench python -m scripts.bench_flows [--users 1000] [--api-latency 0.05]
+
+--check compares the results with a baseline, run with its users and API
+latency. It exits with status 1 if users fail, handlers exceed their query
+budget, or SQL statements or Bot API calls per update grow; these do not
+depend on the machine. Slower timings are only reported, the baseline may
+come from a different machine. --write-baseline records a new baseline.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import statistics
+import sys
+import time
+import warnings
+from collections import defaultdict
+from pathlib import Path
+from typing import Any
+from urllib.parse import parse_qs
+
+import structlog
+from sqlalchemy import func, select
+from telegram import Update
+from telegram.ext import Application
+
+# Handlers import the `bot` package, load the application the way main does so
+# that the benchmark shares module state (catalog, caches, user state) with them
+from bot.callback_data import CallbackAction, decode_callback_data
+from bot.config import get_settings
+from bot.db.catalog import catalog
+from bot.db.database import async_session
+from bot.db.models.training import TrainingProgram, Workout
+from bot.db.models.user import User
+from bot.handlers.main_menu import get_main_menu_conversation_handler
+from bot.messages import prerender_catalog_messages
+from bot.metrics import query_budget_overruns, registry
+from bot.persistence import DatabasePersistence
+from bot.rate_limiter import TelegramRateLimiter
+from bot.update_filter import install_update_filter
+from bot.update_processor import PerUserUpdateProcessor
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "bench", "username": "bench_bot"}
+# Users are numbered from here, away from ids of real users in the database
+FIRST_USER_ID = 900_000_000
+# Seconds to wait for the bot's reply before a user gives up
+STEP_TIMEOUT = 30.0
+# Rate limits high enough to never delay a request
+UNLIMITED_RATE = 1e9
+
+START_STEP = "/start"
+# Buttons tapped by every user after /start, by action
+FLOW = (
+    CallbackAction.RUNNING,
+    CallbackAction.PROGRAM,
+    CallbackAction.REGISTER_PROGRAM,
+    CallbackAction.GIVE_ACTIVE_WORKOUT,
+    CallbackAction.END_WORKOUT,
+    CallbackAction.GIVE_ACTIVE_WORKOUT,
+    CallbackAction.END_WORKOUT,
+    CallbackAction.MAIN_MENU,
+    CallbackAction.RUNNING,
+    CallbackAction.PROGRAM,
+    CallbackAction.END_PROGRAM,
+)
+
+# Keyboard of a bot message as (message id, callback data of its buttons)
+Reply = tuple[int, list[str]]
+
+
+class FakeBotApi:
+    """Bot API server answering every call locally.
+
+    Remembers the keyboards sent to each chat and hands the next one to the
+    user waiting for it.
+    """
+
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+        self.calls: dict[str, int] = defaultdict(int)
+        self._message_ids: dict[int, int] = defaultdict(int)
+        self._waiters: dict[int, asyncio.Future[Reply]] = {}
+        self._server: asyncio.Server | None = None
+
+    async def start(self) -> int:
+        """Start the server on a free local port and return the port."""
+        self._server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+        port: int = self._server.sockets[0].getsockname()[1]
+        return port
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def expect_reply(self, chat_id: int) -> asyncio.Future[Reply]:
+        """Get a future resolved with the next keyboard sent to the chat."""
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[chat_id] = waiter
+        return waiter
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            # Keep-alive connections, requests are answered one after another
+            while True:
+                head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1")
+                request_line, *header_lines = head.rstrip().split("\r\n")
+                path = request_line.split(" ")[1]
+                headers = dict(line.lower().split(": ", 1) for line in header_lines)
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                params = {key: values[0] for key, values in parse_qs(body.decode()).items()}
+
+                result = await self._call(path.rsplit("/", 1)[-1], params)
+                payload = json.dumps({"ok": True, "result": result}).encode()
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    b"Content-Length: %d\r\n\r\n%s" % (len(payload), payload)
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _call(self, method: str, params: dict[str, str]) -> Any:
+        self.calls[method] += 1
+        if method == "getMe":
+            return BOT_USER
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if method not in ("sendMessage", "editMessageText"):
+            return True
+
+        chat_id = int(params["chat_id"])
+        if method == "sendMessage":
+            self._message_ids[chat_id] += 1
+            message_id = self._message_ids[chat_id]
+        else:
+            message_id = int(params["message_id"])
+
+        if "reply_markup" in params:
+            rows = json.loads(params["reply_markup"])["inline_keyboard"]
+            buttons = [button["callback_data"] for row in rows for button in row]
+            waiter = self._waiters.pop(chat_id, None)
+            if waiter is not None and not waiter.done():
+                waiter.set_result((message_id, buttons))
+
+        chat = {"id": chat_id, "type": "private"}
+        return {"message_id": message_id, "date": 0, "chat": chat, "text": params["text"]}
+
+
+class FlowRunner:
+    """Runs the flow of simulated users against the application."""
+
+    def __init__(self, application: Application, api: FakeBotApi) -> None:
+        self.application = application
+        self.api = api
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.failures: list[str] = []
+        self._update_ids = itertools.count(1)
+
+    async def run_user(self, user_id: int) -> None:
+        """Run the whole flow of a user, recording the latency of every step."""
+        user = {"id": user_id, "is_bot": False, "first_name": f"user {user_id}"}
+        chat = {"id": user_id, "type": "private"}
+        start = {
+            "message_id": 1,
+            "date": 0,
+            "chat": chat,
+            "from": user,
+            "text": START_STEP,
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(START_STEP)}],
+        }
+        reply = await self._send(user_id, START_STEP, {"message": start})
+
+        for action in FLOW:
+            if reply is None:
+                return
+            message_id, buttons = reply
+            choices = [data for data in buttons if _action(data) is action]
+            if not choices:
+                self.failures.append(f"user {user_id}: no {action.name} button in {buttons}")
+                return
+            query = {
+                "id": str(user_id),
+                "chat_instance": "bench",
+                "from": user,
+                # Users spread over the programs listed
+                "data": choices[user_id % len(choices)],
+                "message": {"message_id": message_id, "date": 0, "chat": chat, "text": ""},
+            }
+            reply = await self._send(user_id, action.name, {"callback_query": query})
+
+    async def _send(self, user_id: int, step: str, payload: dict[str, Any]) -> Reply | None:
+        payload["update_id"] = next(self._update_ids)
+        update = Update.de_json(payload, self.application.bot)
+        waiter = self.api.expect_reply(user_id)
+
+        started = time.perf_counter()
+        await self.application.update_queue.put(update)
+        try:
+            reply = await asyncio.wait_for(waiter, STEP_TIMEOUT)
+        except TimeoutError:
+            self.failures.append(f"user {user_id}: no reply to {step}")
+            return None
+        self.latencies[step].append(time.perf_counter() - started)
+        return reply
+
+
+def _action(data: str) -> CallbackAction | None:
+    decoded = decode_callback_data(data)
+    return decoded[0] if decoded else None
+
+
+def percentiles(timings: list[float]) -> dict[str, float]:
+    """Get p50, p95 and p99 of the timings in milliseconds."""
+    if len(timings) < 2:
+        timings = timings * 2
+    cuts = statistics.quantiles(timings, n=100, method="inclusive")
+    return {
+        name: round(cuts[p - 1] * 1000, 2) for name, p in (("p50", 50), ("p95", 95), ("p99", 99))
+    }
+
+
+async def seed_programs(programs: int, workouts: int) -> None:
+    """Add synthetic training programs if the database has none."""
+    async with async_session() as session:
+        if await session.scalar(select(func.count(TrainingProgram.id))):
+            return
+        for i in range(1, programs + 1):
+            program = TrainingProgram(name=f"Program {i}", description=f"Benchmark program {i}")
+            program.workouts = [
+                Workout(
+                    description=f"Workout {order}",
+                    plan="Run 5 km at an easy pace\n" * 20,
+                    warmup="Drills and strides\n" * 5,
+                    final_message="Well done!",
+                    order=order,
+                )
+                for order in range(1, workouts + 1)
+            ]
+            session.add(program)
+        await session.commit()
+
+
+async def next_user_id() -> int:
+    """Get the first user id no earlier run has used, users of a run start fresh."""
+    async with async_session() as session:
+        last = await session.scalar(select(func.max(User.id)).where(User.id >= FIRST_USER_ID))
+    return FIRST_USER_ID if last is None else last + 1
+
+
+def build_application(port: int) -> Application:
+    """Build the application like main does, with the Bot API at the fake server."""
+    settings = get_settings()
+    application = (
+        Application.builder()
+        .token("1:bench")
+        .base_url(f"http://127.0.0.1:{port}/bot")
+        .updater(None)
+        .persistence(
+            DatabasePersistence(
+                update_interval=settings.PERSISTENCE_UPDATE_INTERVAL,
+                flush_delay=settings.PERSISTENCE_FLUSH_DELAY,
+            )
+        )
+        .rate_limiter(
+            TelegramRateLimiter(
+                overall_per_second=UNLIMITED_RATE,
+                chat_per_second=UNLIMITED_RATE,
+                chat_burst=len(FLOW),
+                group_per_minute=UNLIMITED_RATE,
+            )
+        )
+        .concurrent_updates(
+            PerUserUpdateProcessor(
+                max_running_updates=settings.max_concurrent_updates,
+                max_pending_updates=settings.MAX_PENDING_UPDATES,
+            )
+        )
+        .build()
+    )
+    application.add_handler(get_main_menu_conversation_handler())
+    install_update_filter(application)
+    return application
+
+
+def _statements_in_updates() -> tuple[float, int]:
+    statements = registry.get_sample_value("bot_update_db_statements_sum") or 0.0
+    updates = registry.get_sample_value("bot_update_db_statements_count") or 0.0
+    return statements, int(updates)
+
+
+def _query_budget_overruns() -> dict[str, int]:
+    return {
+        sample.labels["handler"]: int(sample.value)
+        for metric in query_budget_overruns.collect()
+        for sample in metric.samples
+        if sample.name.endswith("_total") and sample.value
+    }
+
+
+async def run(users: int, warmup_users: int, api_latency: float) -> dict[str, Any]:
+    """Run the flow for all users and return the results."""
+    first_user_id = await next_user_id()
+    api = FakeBotApi(api_latency)
+    port = await api.start()
+    application = build_application(port)
+    try:
+        async with application:
+            await catalog.load()
+            await prerender_catalog_messages(catalog)
+            await application.start()
+
+            warmup = FlowRunner(application, api)
+            await asyncio.gather(*(warmup.run_user(first_user_id + i) for i in range(warmup_users)))
+
+            runner = FlowRunner(application, api)
+            api.calls.clear()
+            statements_before, updates_before = _statements_in_updates()
+            started = time.perf_counter()
+            await asyncio.gather(
+                *(runner.run_user(first_user_id + warmup_users + i) for i in range(users))
+            )
+            elapsed = time.perf_counter() - started
+            statements, updates = _statements_in_updates()
+
+            await application.stop()
+    finally:
+        await api.stop()
+
+    timings = [t for step_timings in runner.latencies.values() for t in step_timings]
+    updates -= updates_before
+    # Handlers over their query budget in any update, warm-up included
+    overruns = _query_budget_overruns()
+    return {
+        "users": users,
+        "api_latency": api_latency,
+        "updates": updates,
+        "failures": len(runner.failures),
+        "updates_per_second": round(updates / elapsed, 1),
+        "latency_ms": percentiles(timings),
+        "steps": {step: percentiles(t) for step, t in runner.latencies.items()},
+        "db_statements_per_update": round((statements - statements_before) / updates, 3),
+        "api_calls_per_update": round(sum(api.calls.values()) / updates, 3),
+        "query_budget_overruns": overruns,
+        "sample_failures": runner.failures[:5],
+    }
+
+
+def report(results: dict[str, Any]) -> None:
+    print(
+        f"{results['users']} users, {results['updates']} updates, "
+        f"API latency {results['api_latency'] * 1000:.0f} ms"
+    )
+    print(f"  {'step':<20} {'p50':>8} {'p95':>8} {'p99':>8}  (ms)")
+    for step, cuts in (("all", results["latency_ms"]), *results["steps"].items()):
+        print(f"  {step:<20} {cuts['p50']:8.2f} {cuts['p95']:8.2f} {cuts['p99']:8.2f}")
+    print(f"  updates/s:                {results['updates_per_second']:10.1f}")
+    print(f"  SQL statements/update:    {results['db_statements_per_update']:10.3f}")
+    print(f"  Bot API calls/update:     {results['api_calls_per_update']:10.3f}")
+    print(f"  failed users:             {results['failures']:10d}")
+    for failure in results["sample_failures"]:
+        print(f"    {failure}")
+    print(f"  query budget overruns:    {sum(results['query_budget_overruns'].values()):10d}")
+    for handler, count in results["query_budget_overruns"].items():
+        print(f"    {handler}: {count}")
+
+
+def check(results: dict[str, Any], baseline: dict[str, Any]) -> list[str]:
+    """
+    Compare the machine independent results with the baseline.
+
+    All users must finish the flow, no handler may exceed its query budget,
+    and statements and calls per update must not grow.
+
+    Returns:
+        list[str]: Descriptions of the regressions
+    """
+    regressions = []
+    if results["failures"]:
+        regressions.append(f"{results['failures']} users did not finish the flow")
+    for handler, count in results["query_budget_overruns"].items():
+        regressions.append(f"{handler} exceeded its query budget {count} times")
+    for name in ("db_statements_per_update", "api_calls_per_update"):
+        if results[name] > baseline[name] * 1.01:
+            regressions.append(f"{name} grew from {baseline[name]} to {results[name]}")
+    return regressions
+
+
+def compare_timings(
+    results: dict[str, Any], baseline: dict[str, Any], tolerance: float
+) -> list[str]:
+    """
+    Compare timings with the baseline, they may be worse by the tolerance.
+
+    Returns:
+        list[str]: Descriptions of the timings worse than the baseline allows
+    """
+    slower = []
+    for name in ("p50", "p95", "p99"):
+        limit = baseline["latency_ms"][name] * (1 + tolerance)
+        if results["latency_ms"][name] > limit:
+            slower.append(f"{name} latency {results['latency_ms'][name]} ms above {limit:.2f} ms")
+    minimum = baseline["updates_per_second"] / (1 + tolerance)
+    if results["updates_per_second"] < minimum:
+        slower.append(f"{results['updates_per_second']} updates/s below {minimum:.1f}")
+    return slower
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--users", type=int, default=1000, help="simulated users")
+    parser.add_argument("--warmup-users", type=int, default=50, help="users run before measuring")
+    parser.add_argument(
+        "--api-latency", type=float, default=0.0, help="seconds the fake Bot API takes per call"
+    )
+    parser.add_argument("--programs", type=int, default=3, help="programs seeded into an empty db")
+    parser.add_argument("--workouts", type=int, default=8, help="workouts per seeded program")
+    parser.add_argument("--check", type=Path, help="baseline to compare the results with")
+    parser.add_argument(
+        "--tolerance", type=float, default=1.0, help="reported slowdown against the baseline"
+    )
+    parser.add_argument("--write-baseline", type=Path, help="file to record the results in")
+    args = parser.parse_args()
+
+    # Keep the bot's logs and PTB's setup warnings out of the report
+    warnings.simplefilter("ignore")
+    logging.basicConfig(level=logging.WARNING)
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+
+    baseline = json.loads(args.check.read_text()) if args.check else None
+    if baseline is not None:
+        args.users = baseline["users"]
+        args.api_latency = baseline["api_latency"]
+
+    asyncio.run(seed_programs(args.programs, args.workouts))
+    results = asyncio.run(run(args.users, args.warmup_users, args.api_latency))
+    report(results)
+
+    if args.write_baseline:
+        del results["sample_failures"]
+        args.write_baseline.write_text(json.dumps(results, indent=2) + "\n")
+    if baseline is not None:
+        for slower in compare_timings(results, baseline, args.tolerance):
+            print(f"SLOWER: {slower}")
+        regressions = check(results, baseline)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
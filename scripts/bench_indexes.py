@@ -0,0 +1,173 @@
+"""Benchmark the per-user hot queries with and without the progress indexes.
+
+Builds a throwaway SQLite database from the models, fills it with synthetic
+users and workout history, then prints query plans and average latencies.
+
+Usage: python -m scripts.bench_indexes [--workouts 1000000] [--db /tmp/bench.db]
+"""
+
+import argparse
+import random
+import sqlite3
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import create_engine
+
+from src.bot.db.models import Base, UserTrainingProgram, UserWorkout
+
+PROGRAMS = 10
+WORKOUTS_PER_PROGRAM = 50
+SAMPLES = 2000
+
+ACTIVE_PROGRAM_SQL = """
+    SELECT * FROM user_training_programs
+    WHERE user_id = ? AND end_date IS NULL
+"""
+END_PROGRAM_SQL = """
+    SELECT * FROM user_training_programs
+    WHERE user_id = ? AND program_id = ? AND end_date IS NULL
+"""
+LAST_WORKOUT_SQL = """
+    SELECT workout_id FROM user_workouts
+    WHERE user_program_id = ?
+    ORDER BY finished_at DESC
+    LIMIT 1
+"""
+
+
+def progress_indexes() -> list:
+    """Indexes added for the per-user hot queries."""
+    names = {"ix_user_training_programs_user_active", "ix_user_workouts_program_finished"}
+    tables = [UserTrainingProgram.__table__, UserWorkout.__table__]
+    return [index for table in tables for index in table.indexes if index.name in names]
+
+
+def populate(conn: sqlite3.Connection, total_workouts: int) -> list[tuple[int, int, int]]:
+    """Fill the database and return (user_id, program_id, user_program_id) samples."""
+    now = datetime.now(UTC).isoformat(sep=" ")
+    conn.executemany(
+        "INSERT INTO training_programs (id, name, created_at, updated_at) VALUES (?, ?, ?, ?)",
+        [(p, f"program {p}", now, now) for p in range(1, PROGRAMS + 1)],
+    )
+    conn.executemany(
+        "INSERT INTO workouts (id, program_id, description, plan, warmup, final_message, "
+        '"order", created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        [
+            ((p - 1) * WORKOUTS_PER_PROGRAM + o, p, "d", "p", "w", "f", o, now, now)
+            for p in range(1, PROGRAMS + 1)
+            for o in range(1, WORKOUTS_PER_PROGRAM + 1)
+        ],
+    )
+
+    # Every user finished one program and has another one in progress
+    users = total_workouts // (WORKOUTS_PER_PROGRAM + WORKOUTS_PER_PROGRAM // 2)
+    conn.executemany(
+        "INSERT INTO users (id, first_name, is_bot, is_premium, created_at, updated_at) "
+        "VALUES (?, ?, 0, 0, ?, ?)",
+        [(u, f"user {u}", now, now) for u in range(1, users + 1)],
+    )
+
+    start = datetime(2025, 1, 1)
+    started_at = start.isoformat(sep=" ")
+    user_programs = []
+    user_workouts = []
+    samples = []
+    for u in range(1, users + 1):
+        finished_program = random.randint(1, PROGRAMS)
+        active_program = finished_program % PROGRAMS + 1
+        finished_id, active_id = 2 * u - 1, 2 * u
+        user_programs.append((finished_id, u, finished_program, started_at, started_at, now, now))
+        user_programs.append((active_id, u, active_program, started_at, None, now, now))
+        samples.append((u, active_program, active_id))
+        for up_id, program, done in (
+            (finished_id, finished_program, WORKOUTS_PER_PROGRAM),
+            (active_id, active_program, WORKOUTS_PER_PROGRAM // 2),
+        ):
+            for o in range(1, done + 1):
+                workout_id = (program - 1) * WORKOUTS_PER_PROGRAM + o
+                finished_at = (start + timedelta(days=o)).isoformat(sep=" ")
+                user_workouts.append((u, workout_id, up_id, finished_at, now, now))
+
+    conn.executemany(
+        "INSERT INTO user_training_programs (id, user_id, program_id, start_date, end_date, "
+        "created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        user_programs,
+    )
+    conn.executemany(
+        "INSERT INTO user_workouts (user_id, workout_id, user_program_id, finished_at, "
+        "created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+        user_workouts,
+    )
+    conn.commit()
+    conn.execute("ANALYZE")
+    print(f"Populated {users} users, {len(user_programs)} programs, {len(user_workouts)} workouts")
+    return samples
+
+
+def measure(
+    conn: sqlite3.Connection,
+    name: str,
+    sql: str,
+    params: Callable[[tuple[int, int, int]], tuple],
+    samples: list[tuple[int, int, int]],
+) -> None:
+    """Print the query plan and average latency of a query."""
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params(samples[0])).fetchall()
+    picked = random.choices(samples, k=SAMPLES)
+    started = time.perf_counter()
+    for sample in picked:
+        conn.execute(sql, params(sample)).fetchall()
+    elapsed = (time.perf_counter() - started) / SAMPLES
+    print(f"  {name}: {elapsed * 1e6:.1f} us/query")
+    for row in plan:
+        print(f"      {row[-1]}")
+
+
+def run_queries(conn: sqlite3.Connection, samples: list[tuple[int, int, int]]) -> None:
+    """Measure all hot queries."""
+    measure(conn, "active program", ACTIVE_PROGRAM_SQL, lambda s: (s[0],), samples)
+    measure(conn, "end program", END_PROGRAM_SQL, lambda s: (s[0], s[1]), samples)
+    measure(conn, "last workout", LAST_WORKOUT_SQL, lambda s: (s[2],), samples)
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workouts", type=int, default=1_000_000, help="user_workouts rows")
+    parser.add_argument("--db", type=Path, help="database file (temporary by default)")
+    args = parser.parse_args()
+
+    random.seed(42)
+    db_path = args.db or Path(tempfile.mkdtemp()) / "bench.db"
+    db_path.unlink(missing_ok=True)
+
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(engine)
+    indexes = progress_indexes()
+    for index in indexes:
+        index.drop(engine)
+    engine.dispose()
+
+    conn = sqlite3.connect(db_path)
+    samples = populate(conn, args.workouts)
+
+    print("Without progress indexes:")
+    run_queries(conn, samples)
+
+    engine = create_engine(f"sqlite:///{db_path}")
+    for index in indexes:
+        index.create(engine)
+    engine.dispose()
+    conn.execute("ANALYZE")
+
+    print("With progress indexes:")
+    run_queries(conn, samples)
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Measure the cost of logging an event on the calling thread.
+
+Compares the previous configuration, rendering with the standard library
+JSON encoder and printing to stdout on the caller, against the current one,
+which renders with orjson (if installed) and hands lines to a background
+writer thread. A consumer reading stdout slowly makes printing block, run
+both ways:
+
+    python -m scripts.bench_logging > /dev/null
+    python -m scripts.bench_logging | (sleep 2; cat > /dev/null)
+
+The report goes to stderr.
+"""
+
+import argparse
+import logging
+import sys
+import time
+
+import structlog
+
+from src.bot.logging import get_logger, setup_logging
+
+
+def setup_print_logging() -> None:
+    """Configure logging the way it was before the background writer."""
+    structlog.configure(
+        processors=[
+            structlog.contextvars.merge_contextvars,
+            structlog.processors.add_log_level,
+            structlog.processors.TimeStamper(fmt="iso"),
+            structlog.processors.StackInfoRenderer(),
+            structlog.processors.format_exc_info,
+            structlog.processors.UnicodeDecoder(),
+            structlog.processors.JSONRenderer(),
+        ],
+        wrapper_class=structlog.make_filtering_bound_logger(logging.INFO),
+        context_class=dict,
+        logger_factory=structlog.PrintLoggerFactory(),
+        cache_logger_on_first_use=False,
+    )
+
+
+def measure(events: int) -> float:
+    logger = get_logger("bench")
+    started = time.perf_counter()
+    for i in range(events):
+        logger.info("Workout finished", user_id=i, program_id=3, workout_id=45, order=7)
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=20000, help="events logged per setup")
+    args = parser.parse_args()
+
+    setup_print_logging()
+    printed = measure(args.events)
+    setup_logging()
+    queued = measure(args.events)
+
+    print(f"Logging {args.events} info events, cost on the caller", file=sys.stderr)
+    for name, elapsed in (("print, json", printed), ("queue, orjson", queued)):
+        print(f"  {name:<14} {elapsed / args.events * 1e6:6.2f} us/event", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
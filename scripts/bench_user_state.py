@@ -0,0 +1,140 @@
+"""Micro-benchmark of UserDataManager against the previous dict round-trip implementation.
+
+The legacy manager below mirrors the implementation that stored `asdict()`
+copies in user_data and rebuilt dataclasses on every access.
+
+Usage: python -m scripts.bench_user_state [--number 200000]
+"""
+
+import argparse
+import itertools
+import timeit
+from copy import deepcopy
+from dataclasses import asdict, dataclass, field
+from types import SimpleNamespace
+from typing import Any
+
+from src.bot.user_state import UserDataManager, dump_user_data
+
+
+@dataclass(frozen=True)
+class LegacyBotMessage:
+    chat_id: int
+    message_id: int
+
+
+@dataclass
+class LegacyUserState:
+    bot_message: LegacyBotMessage | None = None
+    state: str = "initial"
+    data: dict[str, Any] = field(default_factory=dict)
+
+
+class LegacyUserDataManager:
+    """Previous implementation, kept here for comparison only."""
+
+    def __init__(self, context: Any) -> None:
+        self.context = context
+        if not context.user_data.get("state_obj"):
+            context.user_data["state_obj"] = asdict(LegacyUserState())
+
+    def get_state(self) -> LegacyUserState:
+        state_dict = self.context.user_data["state_obj"]
+        bot_message_dict = state_dict.get("bot_message")
+        bot_message = None
+        if bot_message_dict and isinstance(bot_message_dict, dict):
+            bot_message = LegacyBotMessage(
+                chat_id=bot_message_dict.get("chat_id", 0),
+                message_id=bot_message_dict.get("message_id", 0),
+            )
+        return LegacyUserState(
+            bot_message=bot_message, state=state_dict["state"], data=state_dict["data"]
+        )
+
+    def save_state(self, state: LegacyUserState) -> None:
+        self.context.user_data["state_obj"] = asdict(state)
+
+    def update_message(self, chat_id: int, message_id: int) -> "LegacyUserDataManager":
+        state = self.get_state()
+        state.bot_message = LegacyBotMessage(chat_id=chat_id, message_id=message_id)
+        self.save_state(state)
+        return self
+
+    def get_active_message(self) -> LegacyBotMessage | None:
+        return self.get_state().bot_message
+
+
+def make_context() -> SimpleNamespace:
+    return SimpleNamespace(user_data={})
+
+
+def bench(name: str, number: int, legacy: Any, current: Any) -> None:
+    """Print per-call timings of the legacy and current variants."""
+    legacy_time = timeit.timeit(legacy, number=number) / number
+    current_time = timeit.timeit(current, number=number) / number
+    print(
+        f"{name:<28} legacy {legacy_time * 1e9:8.0f} ns  "
+        f"current {current_time * 1e9:8.0f} ns  x{legacy_time / current_time:.1f}"
+    )
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=200_000, help="calls per measurement")
+    args = parser.parse_args()
+
+    legacy_context, current_context = make_context(), make_context()
+    legacy = LegacyUserDataManager(legacy_context).update_message(1, 1)
+    current = UserDataManager(current_context).update_message(1, 1)
+
+    bench(
+        "new manager per update",
+        args.number,
+        lambda: LegacyUserDataManager(legacy_context),
+        lambda: UserDataManager(current_context),
+    )
+    bench(
+        "get_active_message",
+        args.number,
+        legacy.get_active_message,
+        current.get_active_message,
+    )
+    bench(
+        "update_message (same)",
+        args.number,
+        lambda: legacy.update_message(1, 1),
+        lambda: current.update_message(1, 1),
+    )
+    legacy_ids, current_ids = itertools.count(), itertools.count()
+    bench(
+        "update_message (new)",
+        args.number,
+        lambda: legacy.update_message(1, next(legacy_ids)),
+        lambda: current.update_message(1, next(current_ids)),
+    )
+    bench(
+        "handler: read + update",
+        args.number,
+        lambda: (
+            LegacyUserDataManager(legacy_context)
+            .update_message(1, legacy.get_active_message().message_id)
+            .get_active_message()
+        ),
+        lambda: (
+            UserDataManager(current_context)
+            .update_message(1, current.get_active_message().message_id)
+            .get_active_message()
+        ),
+    )
+    # Persistence deep-copies user data and serializes it once per flush
+    bench(
+        "persistence snapshot",
+        args.number // 10,
+        lambda: deepcopy(legacy_context.user_data),
+        lambda: dump_user_data(deepcopy(current_context.user_data)),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,79 +1,223 @@
 import asyncio
+import hashlib
 import os
+import time
 from pathlib import Path
+from typing import Any
 
 import yaml  # type: ignore
-from sqlalchemy import select
+from sqlalchemy import delete, insert, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.bot.db.database import async_session
-from src.bot.db.models.training import TrainingProgram, Workout
+from src.bot.config import get_settings
+from src.bot.db.catalog import catalog, read_snapshot
+from src.bot.db.database import async_session, dialect_insert
+from src.bot.db.models.training import TrainingProgram, UserWorkout, Workout
 
+# libyaml based loader is several times faster, if PyYAML was built with it
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
 
-async def load_program(session: AsyncSession, program_data: dict) -> None:
-    """Load program data into database."""
-    # Create program
+
+def get_trainings_dir() -> Path:
+    """Get directory with training program YAML files."""
+    if os.getenv("DOCKER_CONTAINER"):
+        # Running in Docker
+        return Path("/app/trainings")
+    # Running locally
+    return Path(__file__).parent.parent / "trainings"
+
+
+async def load_program(
+    session: AsyncSession, program_data: dict[str, Any], content_hash: str, programs: dict[str, int]
+) -> None:
+    """
+    Insert or update a program and its workouts.
+
+    Workouts are upserted by their order within the program in one bulk
+    statement, relying on the unique (program_id, order) index. Workouts no
+    longer in the file are deleted with their user records, like the ORM
+    cascade of `Workout.user_workouts` does.
+
+    Args:
+        session: Database session
+        program_data: Parsed program YAML
+        content_hash: Hash of the program YAML file
+        programs: Known program ids by name, updated with inserted programs
+    """
     program_name = program_data["program_name"]
-    program_description = program_data["program_description"]
+    program_values = {
+        "name": program_name,
+        "description": program_data["program_description"],
+        "content_hash": content_hash,
+    }
 
-    result = await session.execute(
-        select(TrainingProgram).where(TrainingProgram.name == program_name)
-    )
-    print(f"Program {program_name} already exists")
-    program = result.scalar_one_or_none()
-    if not program:
-        program = TrainingProgram(
-            name=program_name,
-            description=program_description,
+    program_id = programs.get(program_name)
+    if program_id is None:
+        result = await session.execute(
+            insert(TrainingProgram).values(program_values).returning(TrainingProgram.id)
+        )
+        program_id = programs[program_name] = result.scalar_one()
+    else:
+        await session.execute(
+            update(TrainingProgram).where(TrainingProgram.id == program_id).values(program_values)
         )
-        session.add(program)
-        await session.flush()  # Get program.id
-
-    # Create workouts
-    for workout_data in program_data["workouts"]:
-        workout = await session.execute(
-            select(Workout).where(
-                (Workout.order == workout_data["number"]) & (Workout.program_id == program.id)
-            )
+        orders = [workout_data["number"] for workout_data in program_data["workouts"]]
+        removed = select(Workout.id).where(
+            Workout.program_id == program_id, Workout.order.not_in(orders)
         )
-        if workout.scalar_one_or_none():
-            print(f"Workout {workout_data['number']} already exists")
-            continue
-        workout = Workout(
-            program_id=program.id,
-            description=workout_data["description"],
-            plan=workout_data["plan"],
-            warmup=workout_data["sbu"],
-            final_message=workout_data["final_msg"],
-            order=workout_data["number"],
+        await session.execute(delete(UserWorkout).where(UserWorkout.workout_id.in_(removed)))
+        await session.execute(
+            delete(Workout).where(Workout.program_id == program_id, Workout.order.not_in(orders))
         )
-        session.add(workout)
 
-    await session.commit()
+    workouts = [
+        {
+            "program_id": program_id,
+            "description": workout_data["description"],
+            "plan": workout_data["plan"],
+            "warmup": workout_data["sbu"],
+            "final_message": workout_data["final_msg"],
+            "order": workout_data["number"],
+        }
+        for workout_data in program_data["workouts"]
+    ]
+    stmt = dialect_insert(Workout)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Workout.program_id, Workout.order],
+        set_={
+            "description": stmt.excluded.description,
+            "plan": stmt.excluded.plan,
+            "warmup": stmt.excluded.warmup,
+            "final_message": stmt.excluded.final_message,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+    await session.execute(stmt, workouts)
+    print(f"Program {program_name}: {len(workouts)} workouts loaded")
+
+
+async def load_file(
+    session: AsyncSession,
+    content: bytes,
+    content_hash: str,
+    loaded_hashes: dict[str, str | None],
+    programs: dict[str, int],
+) -> tuple[str, bool]:
+    """
+    Parse a program file and load it, unless its program was loaded from the same content.
+
+    Args:
+        session: Database session
+        content: Program YAML
+        content_hash: Hash of the program YAML
+        loaded_hashes: Content hashes of the loaded programs by name, updated with the program
+        programs: Known program ids by name, updated with inserted programs
+
+    Returns:
+        tuple[str, bool]: Name of the program and whether it was loaded
+    """
+    program_data = yaml.load(content, Loader=YAML_LOADER)
+    program_name: str = program_data["program_name"]
+    if loaded_hashes.get(program_name) == content_hash:
+        return program_name, False
+    await load_program(session, program_data, content_hash, programs)
+    loaded_hashes[program_name] = content_hash
+    return program_name, True
+
+
+async def fetch_programs(session: AsyncSession) -> list[tuple[str, int, str | None]]:
+    """Get name, id and content hash of all programs in the database."""
+    result = await session.execute(
+        select(TrainingProgram.name, TrainingProgram.id, TrainingProgram.content_hash).order_by(
+            TrainingProgram.id
+        )
+    )
+    return [tuple(row) for row in result]
+
+
+async def load_trainings(trainings_dir: Path, snapshot_path: str | None) -> int:
+    """
+    Load changed program YAML files into the database and refresh the catalog snapshot.
+
+    Files are only read if their modification time or size differs from the
+    snapshot, and only loaded if their content hash differs from the one stored
+    for their program. Unchanged files known from the snapshot are not parsed.
+    When neither the files nor the programs in the database changed since the
+    snapshot was written, the database is queried once and the snapshot kept.
+
+    Args:
+        trainings_dir: Directory with program YAML files
+        snapshot_path: Catalog snapshot file, None to not write one
+
+    Returns:
+        int: Number of loaded programs
+    """
+    paths = sorted(trainings_dir.glob("*.yaml"))
+    if not paths:
+        print(f"No training programs found in {trainings_dir}")
+        return 0
+    stats = {}
+    for path in paths:
+        stat = path.stat()
+        stats[path.name] = (stat.st_mtime_ns, stat.st_size)
+
+    snapshot = read_snapshot(snapshot_path) if snapshot_path else None
+    cached_files = snapshot["sources"]["files"] if snapshot else {}
+
+    async with async_session() as session:
+        programs_state = await fetch_programs(session)
+        if (
+            snapshot is not None
+            and snapshot["sources"]["database"] == programs_state
+            and {name: cached[:2] for name, cached in cached_files.items()} == stats
+        ):
+            print(f"Training programs unchanged: {len(paths)} files")
+            return 0
+
+        programs = {name: program_id for name, program_id, _ in programs_state}
+        loaded_hashes = {name: content_hash for name, _, content_hash in programs_state}
+        files = {}
+        changed = 0
+        for path in paths:
+            stat = stats[path.name]
+            cached = cached_files.get(path.name)
+            content = None
+            program_name = None
+            if cached is not None and cached[:2] == stat:
+                content_hash, program_name = cached[2:4]
+            else:
+                content = path.read_bytes()
+                content_hash = hashlib.sha256(content).hexdigest()
+            # Unchanged files are skipped without parsing them
+            if program_name is None or loaded_hashes.get(program_name) != content_hash:
+                program_name, loaded = await load_file(
+                    session,
+                    path.read_bytes() if content is None else content,
+                    content_hash,
+                    loaded_hashes,
+                    programs,
+                )
+                changed += loaded
+            files[path.name] = (*stat, content_hash, program_name)
+
+        if changed:
+            await session.commit()
+            # A running bot picks the changes up on its next catalog refresh
+            programs_state = await fetch_programs(session)
+
+    if snapshot_path:
+        await catalog.load()
+        catalog.dump_snapshot(snapshot_path, {"files": files, "database": programs_state})
+
+    print(f"Training programs loaded: {changed} changed, {len(paths) - changed} unchanged")
+    return changed
 
 
 async def main() -> None:
-    """Load program data from YAML to database."""
-    # Determine YAML file path based on environment
-    training_list = ["run_health", "run_start"]
-    for training in training_list:
-        if os.getenv("DOCKER_CONTAINER"):
-            # Running in Docker
-            yaml_path = Path(f"/app/trainings/{training}.yaml")
-        else:
-            # Running locally
-            yaml_path = Path(__file__).parent.parent / "trainings" / f"{training}.yaml"
-
-        if not yaml_path.exists():
-            print(f"Error: File {yaml_path} not found!")
-            continue
-        with open(yaml_path, encoding="utf-8") as f:
-            program_data = yaml.safe_load(f)
-
-        # Load data into database
-        async with async_session() as session:
-            await load_program(session, program_data)
-            print("Program loaded successfully!")
+    """Load changed program YAML files into the database."""
+    started = time.perf_counter()
+    await load_trainings(get_trainings_dir(), get_settings().catalog_snapshot_path)
+    print(f"Done in {time.perf_counter() - started:.2f} s")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,144 @@
+"""Load test of concurrent update processing with per-user ordering.
+
+Runs a real Application against an in-process fake Bot API and feeds it updates
+from many users. Each update is handled by a callback simulating a slow
+database write. Prints throughput per concurrency limit and checks that every
+user's updates were handled in order and never overlapped.
+
+Usage: python -m scripts.load_test_updates [--users 200] [--updates 10] [--delay 0.01]
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from collections import defaultdict
+from typing import Any
+
+from telegram import Update
+from telegram.ext import Application, ContextTypes, TypeHandler
+from telegram.request import BaseRequest, RequestData
+
+from src.bot.update_processor import PerUserUpdateProcessor
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "bot", "username": "bot"}
+
+
+class FakeRequest(BaseRequest):
+    """Bot API transport answering every call locally."""
+
+    @property
+    def read_timeout(self) -> float | None:
+        return None
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def do_request(
+        self,
+        url: str,
+        method: str,
+        request_data: RequestData | None = None,
+        read_timeout: Any = None,
+        write_timeout: Any = None,
+        connect_timeout: Any = None,
+        pool_timeout: Any = None,
+    ) -> tuple[int, bytes]:
+        result: Any = BOT_USER if url.endswith("/getMe") else True
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+
+def make_update(update_id: int, user_id: int, seq: int) -> dict[str, Any]:
+    user = {"id": user_id, "is_bot": False, "first_name": f"user {user_id}"}
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": seq,
+            "date": 0,
+            "chat": {"id": user_id, "type": "private"},
+            "from": user,
+            "text": str(seq),
+        },
+    }
+
+
+async def run(
+    users: int, updates_per_user: int, delay: float, max_running: int | None
+) -> tuple[float, int]:
+    """Process all updates, return elapsed seconds and ordering violations."""
+    builder = (
+        Application.builder()
+        .token("1:fake")
+        .request(FakeRequest())
+        .get_updates_request(FakeRequest())
+        .updater(None)
+    )
+    if max_running is not None:
+        builder = builder.concurrent_updates(
+            PerUserUpdateProcessor(
+                max_running_updates=max_running,
+                max_pending_updates=max(max_running, users * updates_per_user),
+            )
+        )
+    application = builder.build()
+
+    seen: dict[int, list[int]] = defaultdict(list)
+    in_progress: set[int] = set()
+    violations = 0
+
+    async def handle(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        nonlocal violations
+        user_id = update.effective_user.id
+        if user_id in in_progress:
+            violations += 1
+        in_progress.add(user_id)
+        seen[user_id].append(update.message.message_id)
+        await asyncio.sleep(delay)
+        in_progress.discard(user_id)
+
+    application.add_handler(TypeHandler(Update, handle))
+
+    payloads = [
+        make_update(seq * users + user_id, user_id, seq)
+        for seq in range(updates_per_user)
+        for user_id in range(1, users + 1)
+    ]
+
+    async with application:
+        await application.start()
+        started = time.perf_counter()
+        for payload in payloads:
+            await application.update_queue.put(Update.de_json(payload, application.bot))
+        await application.update_queue.join()
+        elapsed = time.perf_counter() - started
+        await application.stop()
+
+    expected = list(range(updates_per_user))
+    violations += sum(1 for order in seen.values() if order != expected)
+    return elapsed, violations
+
+
+async def main() -> None:
+    """Run the load test."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=200, help="number of users")
+    parser.add_argument("--updates", type=int, default=10, help="updates per user")
+    parser.add_argument("--delay", type=float, default=0.01, help="handler duration in seconds")
+    args = parser.parse_args()
+
+    total = args.users * args.updates
+    print(f"{total} updates from {args.users} users, handler takes {args.delay * 1000:.0f} ms")
+    for max_running in (None, 4, 16, 64, 256):
+        elapsed, violations = await run(args.users, args.updates, args.delay, max_running)
+        label = "sequential" if max_running is None else f"{max_running} running"
+        print(
+            f"  {label:<12} {total / elapsed:8.0f} updates/s  "
+            f"{elapsed:6.2f} s  ordering violations: {violations}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
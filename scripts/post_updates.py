@@ -0,0 +1,54 @@
+"""POST recorded Telegram updates to a locally running webhook server.
+
+Start the bot with BOT_MODE=webhook (WEBHOOK_URL unset, so no webhook is
+registered with Telegram), then replay updates from JSON files. A file may hold
+a single update, a list of updates or one update per line.
+
+Usage: python -m scripts.post_updates scripts/sample_updates.json
+           [--url http://localhost:8080/telegram] [--secret-token TOKEN] [--repeat 1]
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Any
+
+import httpx
+
+from src.bot.webhook import SECRET_TOKEN_HEADER
+
+
+def load_updates(path: Path) -> list[dict[str, Any]]:
+    """Load updates from a JSON or JSON lines file."""
+    text = path.read_text(encoding="utf-8")
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    return data if isinstance(data, list) else [data]
+
+
+def main() -> None:
+    """Replay the updates."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("files", nargs="+", type=Path, help="recorded update files")
+    parser.add_argument("--url", default="http://localhost:8080/telegram", help="webhook URL")
+    parser.add_argument("--secret-token", help="value of the secret token header")
+    parser.add_argument("--repeat", type=int, default=1, help="times to send every update")
+    args = parser.parse_args()
+
+    headers = {SECRET_TOKEN_HEADER: args.secret_token} if args.secret_token else {}
+    updates = [update for path in args.files for update in load_updates(path)]
+
+    with httpx.Client(headers=headers) as client:
+        for _ in range(args.repeat):
+            for update in updates:
+                started = time.perf_counter()
+                response = client.post(args.url, json=update)
+                elapsed = (time.perf_counter() - started) * 1000
+                print(f"update {update.get('update_id')}: {response.status_code} {elapsed:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
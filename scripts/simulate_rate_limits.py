@@ -0,0 +1,177 @@
+"""Simulate outgoing request bursts against a fake Bot API enforcing flood control.
+
+The fake API answers 429 (RetryAfter) when more than 30 requests per second
+reach it overall or more than 1 per second (bursts of 5) reach a single chat.
+Two scenarios run with and without TelegramRateLimiter:
+
+- broadcast: one message to each of many chats at once
+- edit storm: many rapid edits of the same few messages, often repeating content
+
+Usage: python -m scripts.simulate_rate_limits [--chats 300] [--edits 50]
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from collections import defaultdict
+from typing import Any
+
+from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import RetryAfter
+from telegram.ext import ExtBot
+from telegram.request import BaseRequest, RequestData
+
+from src.bot.logging import setup_logging
+from src.bot.rate_limiter import TelegramRateLimiter
+
+OVERALL_PER_SECOND = 30
+CHAT_PER_SECOND = 1
+CHAT_BURST = 5
+LATENCY = 0.02
+
+
+class FloodControlledAPI(BaseRequest):
+    """Fake Bot API with token bucket flood control."""
+
+    def __init__(self) -> None:
+        self.calls: dict[str, int] = defaultdict(int)
+        self.flood_errors = 0
+        self._overall = (float(OVERALL_PER_SECOND), time.monotonic())
+        self._chats: dict[Any, tuple[float, float]] = {}
+        self._message_ids = 0
+
+    @property
+    def read_timeout(self) -> float | None:
+        return None
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    @staticmethod
+    def _take(state: tuple[float, float], rate: float, capacity: float) -> tuple[bool, tuple]:
+        tokens, updated = state
+        now = time.monotonic()
+        tokens = min(capacity, tokens + (now - updated) * rate)
+        if tokens < 1:
+            return False, (tokens, now)
+        return True, (tokens - 1, now)
+
+    async def do_request(
+        self,
+        url: str,
+        method: str,
+        request_data: RequestData | None = None,
+        read_timeout: Any = None,
+        write_timeout: Any = None,
+        connect_timeout: Any = None,
+        pool_timeout: Any = None,
+    ) -> tuple[int, bytes]:
+        endpoint = url.rsplit("/", 1)[-1]
+        params = request_data.parameters if request_data else {}
+        await asyncio.sleep(LATENCY)
+        if endpoint == "getMe":
+            result: Any = {"id": 1, "is_bot": True, "first_name": "bot", "username": "bot"}
+            return 200, json.dumps({"ok": True, "result": result}).encode()
+
+        chat_id = params["chat_id"]
+        chat_state = self._chats.get(chat_id, (float(CHAT_BURST), time.monotonic()))
+        ok_overall, overall = self._take(self._overall, OVERALL_PER_SECOND, OVERALL_PER_SECOND)
+        ok_chat, chat_state = self._take(chat_state, CHAT_PER_SECOND, CHAT_BURST)
+        if not (ok_overall and ok_chat):
+            self.flood_errors += 1
+            body = {"ok": False, "error_code": 429, "description": "Too Many Requests"}
+            body["parameters"] = {"retry_after": 1}
+            return 429, json.dumps(body).encode()
+        self._overall, self._chats[chat_id] = overall, chat_state
+
+        self.calls[endpoint] += 1
+        self._message_ids += 1
+        message = {
+            "message_id": params.get("message_id", self._message_ids),
+            "date": 0,
+            "chat": {"id": chat_id, "type": "private"},
+            "text": params.get("text", ""),
+        }
+        return 200, json.dumps({"ok": True, "result": message}).encode()
+
+
+async def broadcast(bot: Bot, chats: int) -> int:
+    async def send(chat_id: int) -> bool:
+        try:
+            await bot.send_message(chat_id=chat_id, text="Новая программа тренировок!")
+            return True
+        except RetryAfter:
+            return False
+
+    results = await asyncio.gather(*(send(chat_id) for chat_id in range(1, chats + 1)))
+    return sum(results)
+
+
+async def edit_storm(bot: Bot, edits: int) -> int:
+    keyboard = InlineKeyboardMarkup([[InlineKeyboardButton("⬅️ Назад", callback_data="running")]])
+
+    async def edit(chat_id: int, i: int) -> bool:
+        try:
+            await bot.edit_message_text(
+                chat_id=chat_id, message_id=1, text=f"Шаг {i // 3}", reply_markup=keyboard
+            )
+            return True
+        except RetryAfter:
+            return False
+
+    tasks = []
+    for i in range(edits):
+        for chat_id in range(1, 4):
+            tasks.append(asyncio.create_task(edit(chat_id, i)))
+        await asyncio.sleep(0.01)
+    return sum(await asyncio.gather(*tasks))
+
+
+async def run(name: str, scenario: Any, count: int, limited: bool) -> None:
+    api = FloodControlledAPI()
+    if limited:
+        bot: Bot = ExtBot(
+            "1:fake",
+            request=api,
+            rate_limiter=TelegramRateLimiter(
+                overall_per_second=OVERALL_PER_SECOND,
+                chat_per_second=CHAT_PER_SECOND,
+                chat_burst=CHAT_BURST,
+                max_retries=3,
+            ),
+        )
+    else:
+        bot = Bot("1:fake", request=api)
+
+    async with bot:
+        started = time.perf_counter()
+        succeeded = await scenario(bot, count)
+        elapsed = time.perf_counter() - started
+
+    label = "limited" if limited else "direct"
+    print(
+        f"  {name:<11} {label:<8} ok {succeeded:5}  sent {sum(api.calls.values()):5}  "
+        f"flood errors {api.flood_errors:5}  {elapsed:6.2f} s"
+    )
+
+
+async def main() -> None:
+    """Run the simulation."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chats", type=int, default=300, help="broadcast recipients")
+    parser.add_argument("--edits", type=int, default=50, help="edit rounds of the storm")
+    args = parser.parse_args()
+    setup_logging()
+
+    for limited in (False, True):
+        await run("broadcast", broadcast, args.chats, limited)
+    for limited in (False, True):
+        await run("edit storm", edit_storm, args.edits, limited)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
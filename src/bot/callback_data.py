@@ -0,0 +1,123 @@
+from enum import Enum
+from functools import lru_cache
+
+# Callback data is a one character action prefix followed by the ids the
+# action takes, each packed as a varint of printable characters: a character
+# holds 5 bits, least significant first, and characters of the terminal
+# alphabet end an id. Ids below 32 take one character and ids below 2**30 six,
+# so even two-id actions stay far below Telegram's 64 byte limit.
+TERMINAL_DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUV"
+CONTINUATION_DIGITS = "WXYZabcdefghijklmnopqrstuvwxyz-_"
+DIGIT_BITS = 5
+
+# Distinct callback data decoded with a dict lookup instead of parsing
+DECODED_CACHE_SIZE = 4096
+
+_DIGIT_MASK = (1 << DIGIT_BITS) - 1
+_DIGIT_VALUES = {
+    **{c: (value, True) for value, c in enumerate(TERMINAL_DIGITS)},
+    **{c: (value, False) for value, c in enumerate(CONTINUATION_DIGITS)},
+}
+
+
+class CallbackAction(Enum):
+    """Action of a button together with its prefix and number of ids.
+
+    Prefixes are upper case, so they never start callback data of the legacy
+    lower case format.
+    """
+
+    RUNNING = ("R", 0)
+    MAIN_MENU = ("M", 0)
+    BACK_TO_PROGRAMS = ("B", 0)
+    GIVE_ACTIVE_WORKOUT = ("A", 0)
+    PROGRAM = ("P", 1)
+    SHOW_PROGRAM = ("S", 1)
+    WORKOUT = ("W", 1)
+    REGISTER_PROGRAM = ("G", 1)
+    END_PROGRAM = ("E", 1)
+    END_WORKOUT = ("F", 2)
+
+    def __init__(self, prefix: str, arity: int) -> None:
+        self.prefix = prefix
+        self.arity = arity
+
+
+_ACTIONS = {action.prefix: action for action in CallbackAction}
+
+# Buttons of messages sent before the compact encoding, decoded until those are gone
+_LEGACY_ACTIONS = {
+    "running": CallbackAction.RUNNING,
+    "main_menu": CallbackAction.MAIN_MENU,
+    "back_to_programs": CallbackAction.BACK_TO_PROGRAMS,
+    "give_active_workout": CallbackAction.GIVE_ACTIVE_WORKOUT,
+}
+_LEGACY_PREFIXES = (
+    ("program_", CallbackAction.PROGRAM),
+    ("show_program_", CallbackAction.SHOW_PROGRAM),
+    ("workout_", CallbackAction.WORKOUT),
+    ("reg_program_", CallbackAction.REGISTER_PROGRAM),
+    ("end_program_", CallbackAction.END_PROGRAM),
+    ("end_workout_", CallbackAction.END_WORKOUT),
+)
+
+
+def encode_callback_data(action: CallbackAction, *ids: int) -> str:
+    """
+    Encode a button action and its ids.
+
+    Raises:
+        ValueError: If the number of ids does not match the action or an id is negative
+    """
+    if len(ids) != action.arity:
+        raise ValueError(f"{action.name} takes {action.arity} ids, got {len(ids)}")
+    parts = [action.prefix]
+    for value in ids:
+        if value < 0:
+            raise ValueError(f"Negative id {value}")
+        while value > _DIGIT_MASK:
+            parts.append(CONTINUATION_DIGITS[value & _DIGIT_MASK])
+            value >>= DIGIT_BITS
+        parts.append(TERMINAL_DIGITS[value])
+    return "".join(parts)
+
+
+@lru_cache(maxsize=DECODED_CACHE_SIZE)
+def decode_callback_data(data: str) -> tuple[CallbackAction, tuple[int, ...]] | None:
+    """Decode button action and ids, None if the data is not valid callback data."""
+    action = _ACTIONS.get(data[:1])
+    if action is None:
+        return _decode_legacy(data)
+
+    ids = []
+    value = shift = 0
+    for c in data[1:]:
+        digit = _DIGIT_VALUES.get(c)
+        if digit is None:
+            return _decode_legacy(data)
+        value |= digit[0] << shift
+        shift += DIGIT_BITS
+        if digit[1]:
+            ids.append(value)
+            value = shift = 0
+    if shift or len(ids) != action.arity:
+        return _decode_legacy(data)
+    return action, tuple(ids)
+
+
+def _decode_legacy(data: str) -> tuple[CallbackAction, tuple[int, ...]] | None:
+    action = _LEGACY_ACTIONS.get(data)
+    if action is not None:
+        return action, ()
+    for prefix, action in _LEGACY_PREFIXES:
+        if data.startswith(prefix):
+            parts = data[len(prefix) :].split("_")
+            if len(parts) == action.arity and all(part.isdigit() for part in parts):
+                return action, tuple(map(int, parts))
+    return None
+
+
+def decode_cache_stats() -> dict[str, int]:
+    """Get size, hit and miss counters of the decoded callback data cache."""
+    info = decode_callback_data.cache_info()
+    return {"size": info.currsize, "hits": info.hits, "misses": info.misses}
@@ -0,0 +1,251 @@
+import asyncio
+import marshal
+import os
+from collections.abc import Iterable
+from dataclasses import dataclass
+from typing import Any
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..logging import get_logger
+from .database import async_session
+from .models.training import TrainingProgram, Workout
+
+logger = get_logger(__name__)
+
+# Snapshots of other layouts or marshal formats are ignored
+SNAPSHOT_VERSION = (3, marshal.version)
+
+# Ids of the programs with the hash of the file each was loaded from, the
+# program loader changes the version of the catalog whenever it changes data
+type CatalogVersion = tuple[tuple[int, str | None], ...]
+
+
+@dataclass(frozen=True)
+class CatalogProgram:
+    """Immutable snapshot of a training program."""
+
+    id: int
+    name: str
+    description: str | None
+
+
+@dataclass(frozen=True)
+class CatalogWorkout:
+    """Immutable snapshot of a workout."""
+
+    id: int
+    program_id: int
+    order: int
+    description: str
+    plan: str
+    warmup: str
+    final_message: str
+
+
+class TrainingCatalog:
+    """Read-through in-memory cache of training programs and their workouts.
+
+    The catalog is loaded from the database on first access (or explicitly at
+    startup) and served from memory afterwards. The program loader runs in
+    another process, call `refresh()` periodically to pick up its changes.
+    The loaded catalog can be dumped to a snapshot file and restored from it
+    without querying the database.
+    """
+
+    def __init__(self) -> None:
+        self._programs: dict[int, CatalogProgram] = {}
+        self._program_workouts: dict[int, tuple[CatalogWorkout, ...]] = {}
+        self._workouts: dict[int, CatalogWorkout] = {}
+        self._workouts_by_order: dict[tuple[int, int], CatalogWorkout] = {}
+        self._version: CatalogVersion = ()
+        self._loaded = False
+        self._lock = asyncio.Lock()
+
+    @property
+    def is_loaded(self) -> bool:
+        """Whether the catalog currently holds loaded data."""
+        return self._loaded
+
+    def _populate(
+        self,
+        version: CatalogVersion,
+        programs: Iterable[CatalogProgram],
+        workouts: Iterable[CatalogWorkout],
+    ) -> None:
+        """Replace cached data, workouts must be ordered by program and position."""
+        self._version = version
+        self._programs = {p.id: p for p in programs}
+        program_workouts: dict[int, list[CatalogWorkout]] = {p_id: [] for p_id in self._programs}
+        self._workouts = {}
+        self._workouts_by_order = {}
+        for workout in workouts:
+            program_workouts.setdefault(workout.program_id, []).append(workout)
+            self._workouts[workout.id] = workout
+            self._workouts_by_order[(workout.program_id, workout.order)] = workout
+        self._program_workouts = {p_id: tuple(ws) for p_id, ws in program_workouts.items()}
+        self._loaded = True
+
+    async def load(self) -> None:
+        """(Re)load the whole catalog from the database."""
+        async with async_session() as session:
+            programs_result = await session.execute(
+                select(TrainingProgram).order_by(TrainingProgram.id)
+            )
+            programs = programs_result.scalars().all()
+            workouts_result = await session.execute(
+                select(Workout).order_by(Workout.program_id, Workout.order)
+            )
+            workouts = workouts_result.scalars().all()
+
+        self._populate(
+            tuple((p.id, p.content_hash) for p in programs),
+            (CatalogProgram(id=p.id, name=p.name, description=p.description) for p in programs),
+            (
+                CatalogWorkout(
+                    id=w.id,
+                    program_id=w.program_id,
+                    order=w.order,
+                    description=w.description,
+                    plan=w.plan,
+                    warmup=w.warmup,
+                    final_message=w.final_message,
+                )
+                for w in workouts
+            ),
+        )
+        logger.info("Training catalog loaded", programs=len(programs), workouts=len(workouts))
+
+    def load_snapshot(self, path: str | os.PathLike[str]) -> bool:
+        """
+        Load the catalog from a snapshot file written by `dump_snapshot`.
+
+        Args:
+            path: Snapshot file
+
+        Returns:
+            bool: Whether the snapshot was loaded, False if it is missing or unusable
+        """
+        snapshot = read_snapshot(path)
+        if snapshot is None:
+            return False
+        programs = snapshot["programs"]
+        workouts = snapshot["workouts"]
+        self._populate(
+            snapshot["catalog_version"],
+            (CatalogProgram(*row) for row in programs),
+            (CatalogWorkout(*row) for row in workouts),
+        )
+        logger.info(
+            "Training catalog loaded from snapshot", programs=len(programs), workouts=len(workouts)
+        )
+        return True
+
+    def dump_snapshot(self, path: str | os.PathLike[str], sources: dict[str, Any]) -> None:
+        """
+        Write the loaded catalog to a snapshot file.
+
+        The file is replaced atomically, so a concurrently starting bot reads
+        either the old or the new snapshot.
+
+        Args:
+            path: Snapshot file
+            sources: Marshallable description of the data the catalog was built from
+        """
+        if not self._loaded:
+            raise RuntimeError("Training catalog is not loaded")
+        snapshot = {
+            "version": SNAPSHOT_VERSION,
+            "sources": sources,
+            "catalog_version": self._version,
+            "programs": [(p.id, p.name, p.description) for p in self._programs.values()],
+            "workouts": [
+                (w.id, w.program_id, w.order, w.description, w.plan, w.warmup, w.final_message)
+                for workouts in self._program_workouts.values()
+                for w in workouts
+            ],
+        }
+        tmp_path = f"{os.fspath(path)}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(marshal.dumps(snapshot))
+        os.replace(tmp_path, path)
+
+    async def refresh(self) -> bool:
+        """
+        Reload the catalog if the programs in the database changed since it was loaded.
+
+        Returns:
+            bool: Whether the catalog was reloaded
+        """
+        async with async_session() as session:
+            version = await fetch_catalog_version(session)
+        if self._loaded and version == self._version:
+            return False
+        await self.load()
+        return True
+
+    def stats(self) -> dict[str, int]:
+        """Get number of cached programs and workouts."""
+        return {
+            "size": len(self._programs) + len(self._workouts),
+            "programs": len(self._programs),
+            "workouts": len(self._workouts),
+        }
+
+    async def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        async with self._lock:
+            if not self._loaded:
+                await self.load()
+
+    async def get_programs(self) -> list[CatalogProgram]:
+        """Get all training programs."""
+        await self._ensure_loaded()
+        return list(self._programs.values())
+
+    async def get_program(self, program_id: int) -> CatalogProgram | None:
+        """Get training program by ID."""
+        await self._ensure_loaded()
+        return self._programs.get(program_id)
+
+    async def get_workouts(self, program_id: int) -> tuple[CatalogWorkout, ...]:
+        """Get workouts of a program ordered by their position."""
+        await self._ensure_loaded()
+        return self._program_workouts.get(program_id, ())
+
+    async def get_workout(self, workout_id: int) -> CatalogWorkout | None:
+        """Get workout by ID."""
+        await self._ensure_loaded()
+        return self._workouts.get(workout_id)
+
+    async def get_workout_by_order(self, program_id: int, order: int) -> CatalogWorkout | None:
+        """Get workout by its position within a program."""
+        await self._ensure_loaded()
+        return self._workouts_by_order.get((program_id, order))
+
+
+async def fetch_catalog_version(session: AsyncSession) -> CatalogVersion:
+    """Get the version of the catalog in the database."""
+    result = await session.execute(
+        select(TrainingProgram.id, TrainingProgram.content_hash).order_by(TrainingProgram.id)
+    )
+    return tuple((program_id, content_hash) for program_id, content_hash in result)
+
+
+def read_snapshot(path: str | os.PathLike[str]) -> dict[str, Any] | None:
+    """Read a catalog snapshot, None if it is missing, unreadable or outdated."""
+    try:
+        with open(path, "rb") as f:
+            # Unmarshalling from a file object is several times slower
+            snapshot = marshal.loads(f.read())
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get("version") != SNAPSHOT_VERSION:
+        return None
+    return snapshot
+
+
+# Process-wide catalog instance
+catalog = TrainingCatalog()
@@ -1,22 +1,101 @@
 import os
+import time
 from collections.abc import AsyncGenerator
+from typing import Any
 
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
-from ..config import get_settings
+from ..config import Settings, get_settings
+from .stats import record_statement
 
 settings = get_settings()
 
-# Create data directory if it doesn't exist
-os.makedirs(settings.DATA_DIR, exist_ok=True)
+if settings.is_sqlite:
+    # Create data directory if it doesn't exist
+    os.makedirs(settings.DATA_DIR, exist_ok=True)
+
+
+def create_db_engine(settings: Settings) -> AsyncEngine:
+    """Create async engine configured from settings."""
+    if not settings.is_sqlite:
+        return create_async_engine(
+            settings.database_url,
+            echo=settings.DB_ECHO,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_pre_ping=settings.DB_POOL_PRE_PING,
+        )
+
+    engine = create_async_engine(
+        settings.database_url,
+        echo=settings.DB_ECHO,
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+    )
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection: Any, connection_record: Any) -> None:
+        """Apply the SQLite engine profile to a new connection."""
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA cache_size={settings.SQLITE_CACHE_SIZE:d}")
+        cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE:d}")
+        cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT:d}")
+        cursor.close()
+
+    return engine
+
+
+def instrument_statements(engine: AsyncEngine) -> None:
+    """Record number and duration of statements executed by the engine in the stats."""
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def start_statement_timer(conn: Any, cursor: Any, *args: Any) -> None:
+        # Statements of a connection are executed one after another
+        conn.info["statement_started"] = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def stop_statement_timer(
+        conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool
+    ) -> None:
+        duration = time.perf_counter() - conn.info.pop("statement_started")
+        # Query budgets are set per kind
+        record_statement(duration, statement_kind(statement, context))
+
+
+def statement_kind(statement: str, context: Any) -> str:
+    """
+    Get the kind of an executed statement, such as "SELECT".
+
+    Compiled statements are classified by what they were compiled from, so
+    that WITH ... UPDATE is an update and INSERT ... SELECT an insert. Text
+    statements fall back to their first keyword.
+    """
+    if context is not None:
+        if context.isinsert:
+            return "INSERT"
+        if context.isupdate:
+            return "UPDATE"
+        if context.isdelete:
+            return "DELETE"
+        if context.compiled is not None and context.compiled.statement.is_select:
+            return "SELECT"
+    return statement.split(None, 1)[0].upper()
+
 
 # Create async engine
-engine = create_async_engine(
-    settings.database_url,
-    echo=True,  # Set to False in production
-    future=True,
-)
+engine = create_db_engine(settings)
+instrument_statements(engine)
+
+# Dialect-specific INSERT that supports ON CONFLICT upserts
+dialect_insert = sqlite.insert if settings.is_sqlite else postgresql.insert
 
 # Create async session factory
 async_session = sessionmaker(
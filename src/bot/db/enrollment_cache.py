@@ -0,0 +1,82 @@
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+
+from ..config import get_settings
+from .repositories import Enrollment
+
+settings = get_settings()
+
+
+class EnrollmentCache:
+    """Bounded in-memory cache of user enrollments with LRU and TTL eviction.
+
+    Users without an unfinished program are cached as `None` as well. Handlers
+    changing an enrollment write the new one through with `set()`. Entries
+    expire after `ttl` seconds, which bounds staleness if another process
+    changes enrollments in the database. A `max_size` of 0 disables caching,
+    for bot instances sharing the database.
+    """
+
+    __slots__ = ("max_size", "ttl", "hits", "misses", "_entries")
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        """
+        Initialize the cache.
+
+        Args:
+            max_size: Maximum number of cached users, 0 to not cache
+            ttl: Seconds an entry is served from the cache
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[int, tuple[float, Enrollment | None]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get_or_load(
+        self, user_id: int, load: Callable[[], Awaitable[Enrollment | None]]
+    ) -> Enrollment | None:
+        """Get enrollment of the user, loading it on a miss."""
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[0] > time.monotonic():
+            self.hits += 1
+            self._entries.move_to_end(user_id)
+            return entry[1]
+
+        self.misses += 1
+        enrollment = await load()
+        self.set(user_id, enrollment)
+        return enrollment
+
+    def set(self, user_id: int, enrollment: Enrollment | None) -> None:
+        """Store enrollment of the user."""
+        if not self.max_size:
+            return
+        self._entries[user_id] = (time.monotonic() + self.ttl, enrollment)
+        self._entries.move_to_end(user_id)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def discard(self, user_id: int) -> None:
+        """Drop enrollment of the user, the next lookup loads it."""
+        self._entries.pop(user_id, None)
+
+    def stats(self) -> dict[str, int | float]:
+        """Get hit and miss counters."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# Process-wide enrollment cache
+enrollment_cache = EnrollmentCache(
+    max_size=settings.enrollment_cache_size, ttl=settings.ENROLLMENT_CACHE_TTL
+)
@@ -1,4 +1,15 @@
-from .training import TrainingProgram, Workout
+from .base import Base
+from .persistence import PersistedConversation, PersistedUserData
+from .training import TrainingProgram, UserTrainingProgram, UserWorkout, Workout
 from .user import User
 
-__all__ = ["User", "TrainingProgram", "Workout"]
+__all__ = [
+    "Base",
+    "User",
+    "TrainingProgram",
+    "Workout",
+    "UserTrainingProgram",
+    "UserWorkout",
+    "PersistedUserData",
+    "PersistedConversation",
+]
@@ -0,0 +1,33 @@
+from typing import Any
+
+from sqlalchemy import JSON, BigInteger, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base
+
+
+class PersistedUserData(Base):
+    """Persisted `context.user_data` of a Telegram user."""
+
+    __tablename__ = "persisted_user_data"
+
+    user_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    data: Mapped[dict[str, Any]] = mapped_column(JSON)
+
+    def __repr__(self) -> str:
+        """String representation of the persisted user data."""
+        return f"<PersistedUserData {self.user_id}>"
+
+
+class PersistedConversation(Base):
+    """Persisted state of a single ConversationHandler conversation."""
+
+    __tablename__ = "persisted_conversations"
+
+    name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    key: Mapped[str] = mapped_column(String(128), primary_key=True)
+    state: Mapped[Any] = mapped_column(JSON)
+
+    def __repr__(self) -> str:
+        """String representation of the persisted conversation."""
+        return f"<PersistedConversation {self.name} {self.key}>"
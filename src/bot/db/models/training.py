@@ -5,10 +5,12 @@ from sqlalchemy import (
     BigInteger,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     String,
     Text,
     UniqueConstraint,
+    text,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -26,6 +28,8 @@ class TrainingProgram(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     name: Mapped[str] = mapped_column(String(100))
     description: Mapped[str] = mapped_column(Text, nullable=True)
+    # SHA-256 of the source file the program was last loaded from
+    content_hash: Mapped[str | None] = mapped_column(String(64), nullable=True)
 
     # Relationships
     workouts: Mapped[list["Workout"]] = relationship(
@@ -56,6 +60,11 @@ class Workout(Base):
     final_message: Mapped[str] = mapped_column(Text, nullable=False)
     order: Mapped[int] = mapped_column(nullable=False)
 
+    __table_args__ = (
+        # Workouts are looked up and upserted by their position within a program
+        Index("uix_workouts_program_order", "program_id", "order", unique=True),
+    )
+
     # Relationships
     program: Mapped["TrainingProgram"] = relationship(
         back_populates="workouts",
@@ -78,11 +87,25 @@ class UserTrainingProgram(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.id"))
     program_id: Mapped[int] = mapped_column(Integer, ForeignKey("training_programs.id"))
-    start_date: Mapped[datetime] = mapped_column(DateTime, default=lambda: datetime.now(UTC))
+    start_date: Mapped[datetime] = mapped_column(
+        DateTime, default=lambda: datetime.now(UTC).replace(tzinfo=None)
+    )
     end_date: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
 
+    # Progress cursor, advanced together with every finished workout
+    next_workout_order: Mapped[int] = mapped_column(Integer, default=1, server_default="1")
+    completed_workouts: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+
     __table_args__ = (
         UniqueConstraint("user_id", "program_id", "start_date", name="uix_user_program_start"),
+        # A user has at most one unfinished program, the index serves its lookups
+        Index(
+            "uix_user_training_programs_user_active",
+            "user_id",
+            unique=True,
+            sqlite_where=text("end_date IS NULL"),
+            postgresql_where=text("end_date IS NULL"),
+        ),
     )
 
     # Relationships
@@ -109,6 +132,8 @@ class UserWorkout(Base):
         UniqueConstraint(
             "user_id", "workout_id", "user_program_id", name="uix_user_workout_program"
         ),
+        # Covering index for the "last finished workout of a user program" lookup
+        Index("ix_user_workouts_program_finished", "user_program_id", "finished_at", "workout_id"),
     )
 
     # Relationships
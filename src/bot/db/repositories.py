@@ -1,7 +1,12 @@
-from sqlalchemy import select
+from dataclasses import dataclass, replace
+from datetime import UTC, datetime
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from .models import User
+from .models.training import UserTrainingProgram, UserWorkout
 
 
 class UserRepository:
@@ -60,3 +65,114 @@ class UserRepository:
                 is_bot=is_bot,
             )
         return user
+
+
+@dataclass(frozen=True, slots=True)
+class Enrollment:
+    """Unfinished program of a user and the progress through it."""
+
+    user_program_id: int
+    program_id: int
+    next_workout_order: int
+    completed_workouts: int
+
+
+class TrainingRepository:
+    """Repository for training progress operations."""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get_enrollment(self, user_id: int) -> Enrollment | None:
+        """Get unfinished program of a user and its progress cursor."""
+        stmt = select(
+            UserTrainingProgram.id,
+            UserTrainingProgram.program_id,
+            UserTrainingProgram.next_workout_order,
+            UserTrainingProgram.completed_workouts,
+        ).where(
+            UserTrainingProgram.user_id == user_id,
+            UserTrainingProgram.end_date.is_(None),
+        )
+        result = await self.session.execute(stmt)
+        row = result.one_or_none()
+        return None if row is None else Enrollment(*row)
+
+    async def start_program(self, user_id: int, program_id: int) -> Enrollment | None:
+        """Enroll a user into a program.
+
+        The database allows a single unfinished program per user, enrolling a
+        user who has one changes nothing.
+
+        Returns:
+            Enrollment | None: New enrollment, None if the user already has an
+                unfinished program
+        """
+        user_program = UserTrainingProgram(user_id=user_id, program_id=program_id)
+        self.session.add(user_program)
+        try:
+            await self.session.commit()
+        except IntegrityError:
+            await self.session.rollback()
+            if await self.get_enrollment(user_id) is None:
+                raise
+            return None
+        return Enrollment(
+            user_program_id=user_program.id,
+            program_id=program_id,
+            next_workout_order=user_program.next_workout_order,
+            completed_workouts=user_program.completed_workouts,
+        )
+
+    async def end_program(self, enrollment: Enrollment) -> None:
+        """Finish the enrolled program."""
+        await self.session.execute(
+            update(UserTrainingProgram)
+            .where(UserTrainingProgram.id == enrollment.user_program_id)
+            .values(end_date=datetime.now(UTC).replace(tzinfo=None))
+        )
+        await self.session.commit()
+
+    async def finish_workout(
+        self, user_id: int, enrollment: Enrollment, workout_id: int, workout_order: int
+    ) -> Enrollment | None:
+        """Record a finished workout and advance the program progress cursor.
+
+        The cursor only advances past the workout it points at, so a stale or
+        replayed button of another workout changes nothing.
+
+        Returns:
+            Enrollment | None: Enrollment with the advanced progress, None if the
+                workout is not the next one of the unfinished program
+        """
+        result = await self.session.execute(
+            update(UserTrainingProgram)
+            .where(
+                UserTrainingProgram.id == enrollment.user_program_id,
+                UserTrainingProgram.next_workout_order == workout_order,
+                UserTrainingProgram.end_date.is_(None),
+            )
+            .values(
+                next_workout_order=workout_order + 1,
+                completed_workouts=UserTrainingProgram.completed_workouts + 1,
+            )
+            .returning(UserTrainingProgram.completed_workouts)
+        )
+        completed_workouts = result.scalar_one_or_none()
+        if completed_workouts is None:
+            await self.session.rollback()
+            return None
+        self.session.add(
+            UserWorkout(
+                user_id=user_id,
+                workout_id=workout_id,
+                user_program_id=enrollment.user_program_id,
+                finished_at=datetime.now(UTC),
+            )
+        )
+        await self.session.commit()
+        return replace(
+            enrollment,
+            next_workout_order=workout_order + 1,
+            completed_workouts=completed_workouts,
+        )
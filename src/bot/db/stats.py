@@ -0,0 +1,80 @@
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+
+@dataclass(slots=True)
+class StatementStats:
+    """Number, duration and kinds of executed SQL statements."""
+
+    db_statements: int = 0
+    db_duration: float = 0.0
+    # Statements by kind, such as "SELECT"
+    statements: dict[str, int] = field(default_factory=dict)
+
+    def add(self, duration: float, kind: str) -> None:
+        """Add an executed statement."""
+        self.db_statements += 1
+        self.db_duration += duration
+        self.statements[kind] = self.statements.get(kind, 0) + 1
+
+
+class StatementCount:
+    """SQL statements executed since the count was started."""
+
+    __slots__ = ("_stats", "_started")
+
+    def __init__(self, stats: StatementStats) -> None:
+        self._stats = stats
+        self._started = dict(stats.statements)
+
+    def by_kind(self) -> dict[str, int]:
+        """Get the number of statements by kind."""
+        started = self._started
+        return {
+            kind: count - started.get(kind, 0)
+            for kind, count in self._stats.statements.items()
+            if count > started.get(kind, 0)
+        }
+
+
+# Statements of the process, read by the metrics on every scrape
+process_stats = StatementStats()
+_current_stats: ContextVar[StatementStats | None] = ContextVar("statement_stats", default=None)
+
+
+@contextmanager
+def collect_statements() -> Iterator[StatementStats]:
+    """Collect SQL statements executed within the block on stats of their own."""
+    stats = StatementStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+@contextmanager
+def count_statements() -> Iterator[StatementCount]:
+    """
+    Count SQL statements executed within the block.
+
+    Statements are counted on the stats of the current update, outside of
+    updates (in tests, at startup) the block gets stats of its own.
+    """
+    stats = _current_stats.get()
+    if stats is not None:
+        yield StatementCount(stats)
+        return
+
+    with collect_statements() as stats:
+        yield StatementCount(stats)
+
+
+def record_statement(duration: float, kind: str) -> None:
+    """Record an executed SQL statement, also for the current update if there is one."""
+    process_stats.add(duration, kind)
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.add(duration, kind)
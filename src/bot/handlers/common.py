@@ -1,15 +1,37 @@
+from collections.abc import Sequence
+
 from bot.keyboards import get_main_keyboard
-from telegram import Update
+from telegram import CallbackQuery, InlineKeyboardMarkup, Update
+from telegram.error import TelegramError
 from telegram.ext import ContextTypes
 
 from ..db.database import async_session
 from ..db.repositories import UserRepository
 from ..logging import get_logger
+from ..query_budget import query_budget
 from ..user_state import UserDataManager
 
 logger = get_logger(__name__)
 
 
+async def _answer_quietly(query: CallbackQuery) -> None:
+    try:
+        await query.answer()
+    except TelegramError as e:
+        logger.warning("Failed to answer callback query", query_id=query.id, error=str(e))
+
+
+def answer_callback_query(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Answer the callback query of the update in the background.
+
+    The answer only stops the loading indicator of the pressed button, so the
+    handler continues right away and a failed answer does not affect it.
+    """
+    if update.callback_query:
+        context.application.create_task(_answer_quietly(update.callback_query), update=update)
+
+
+@query_budget(select=2, insert=1)
 async def show_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Show main menu, handling /start and main_menu callbacks."""
     user_state = UserDataManager(context)
@@ -44,8 +66,7 @@ async def show_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
     # Handle main_menu callback: edit existing message
     elif update.callback_query:
-        query = update.callback_query
-        await query.answer()
+        answer_callback_query(update, context)
 
         last_bot_message = user_state.get_active_message()
         msg_text = "Главное меню\nВыбери тип тренировки:"
@@ -73,3 +94,42 @@ async def show_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         context.user_data["conversation"] = None
 
     return 0  # MAIN_MENU state
+
+
+async def show_message_parts(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    parts: Sequence[str],
+    reply_markup: InlineKeyboardMarkup,
+) -> None:
+    """Show pre-split text in the active bot message.
+
+    The first part replaces the active message text. Any further parts are sent
+    as new messages, and the last one carries the keyboard and becomes active.
+    """
+    user_state = UserDataManager(context)
+    last_bot_message = user_state.get_active_message()
+    first, *rest = parts
+    first_markup = None if rest else reply_markup
+
+    if last_bot_message:
+        await context.bot.edit_message_text(
+            chat_id=last_bot_message.chat_id,
+            message_id=last_bot_message.message_id,
+            text=first,
+            reply_markup=first_markup,
+        )
+        chat_id = last_bot_message.chat_id
+    else:
+        message = await update.effective_chat.send_message(first, reply_markup=first_markup)
+        chat_id = message.chat_id
+        user_state.update_message(chat_id=chat_id, message_id=message.message_id)
+
+    for i, part in enumerate(rest, start=1):
+        message = await context.bot.send_message(
+            chat_id=chat_id,
+            text=part,
+            reply_markup=reply_markup if i == len(rest) else None,
+        )
+        if i == len(rest):
+            user_state.update_message(chat_id=chat_id, message_id=message.message_id)
@@ -1,30 +1,32 @@
 from telegram.ext import (
-    CallbackQueryHandler,
     CommandHandler,
     ConversationHandler,
 )
 
+from ..callback_data import CallbackAction
 from .common import show_main_menu
+from .routing import CallbackRouter
 from .running import get_running_conversation_handler
 
 # States
 MAIN_MENU = 0
 
 
-def get_main_menu_conversation_handler() -> ConversationHandler:
-    """Get conversation handler for main menu."""
+def get_main_menu_conversation_handler(persistent: bool = True) -> ConversationHandler:
+    """Get conversation handler for main menu, persistent if the bot has persistence."""
     return ConversationHandler(
         entry_points=[
             CommandHandler("start", show_main_menu),
-            CallbackQueryHandler(show_main_menu, pattern="^main_menu$"),
+            CallbackRouter({CallbackAction.MAIN_MENU: show_main_menu}),
         ],
         states={
             MAIN_MENU: [
                 CommandHandler("start", show_main_menu),
-                CallbackQueryHandler(show_main_menu, pattern="^main_menu$"),
-                get_running_conversation_handler(),
+                CallbackRouter({CallbackAction.MAIN_MENU: show_main_menu}),
+                get_running_conversation_handler(persistent),
             ],
         },
         fallbacks=[],
         name="main_menu_conversation",
+        persistent=persistent,
     )
@@ -0,0 +1,61 @@
+from collections.abc import Callable, Coroutine, Mapping
+from typing import Any, cast
+
+from telegram import Update
+from telegram.ext import Application, BaseHandler, ContextTypes
+
+from ..callback_data import CallbackAction, decode_callback_data
+
+# Route callbacks take the decoded ids of the button after update and context
+RouteCallback = Callable[..., Coroutine[Any, Any, object]]
+RouteMatch = tuple[RouteCallback, tuple[int, ...]]
+
+
+class CallbackRouter(BaseHandler[Update, ContextTypes.DEFAULT_TYPE, object]):
+    """Handler routing callback queries by the action of their callback data.
+
+    One router replaces the list of pattern handlers of a conversation state:
+    the action is found with a single dict lookup, and the route callback is
+    called with the ids decoded from the callback data, e.g.
+    `show_program_menu(update, context, program_id)`.
+    """
+
+    __slots__ = ("routes",)
+
+    def __init__(self, routes: Mapping[CallbackAction, RouteCallback]) -> None:
+        super().__init__(self._not_routed)
+        self.routes = dict(routes)
+
+    def map_routes(self, wrap: Callable[[RouteCallback], RouteCallback]) -> "CallbackRouter":
+        """Get a router with the same actions calling the wrapped route callbacks."""
+        return CallbackRouter({action: wrap(route) for action, route in self.routes.items()})
+
+    def check_update(self, update: object) -> RouteMatch | None:
+        """Match callback queries with an action of one of the routes."""
+        if not isinstance(update, Update) or update.callback_query is None:
+            return None
+        data = update.callback_query.data
+        decoded = decode_callback_data(data) if data else None
+        if decoded is None:
+            return None
+        route = self.routes.get(decoded[0])
+        if route is None:
+            return None
+        return route, decoded[1]
+
+    async def handle_update(
+        self,
+        update: Update,
+        application: Application[Any, ContextTypes.DEFAULT_TYPE, Any, Any, Any, Any],
+        check_result: object,
+        context: ContextTypes.DEFAULT_TYPE,
+    ) -> object:
+        """Call the route callback with the decoded ids."""
+        self.collect_additional_context(context, update, application, check_result)
+        # The result of check_update, called with the same update before
+        route, ids = cast(RouteMatch, check_result)
+        return await route(update, context, *ids)
+
+    @staticmethod
+    async def _not_routed(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        raise RuntimeError("CallbackRouter calls its route callbacks from handle_update")
@@ -1,23 +1,31 @@
-import logging
-from datetime import datetime
-from itertools import islice
-
-from bot.keyboards import get_main_keyboard
+from bot.keyboards import (
+    create_accept_program_keyboard,
+    create_end_workout_keyboard,
+    create_program_menu_keyboard,
+    create_programs_keyboard,
+    create_workout_details_keyboard,
+    create_workouts_keyboard,
+    get_back_to_running_keyboard,
+    get_main_keyboard,
+)
 from bot.user_state import UserDataManager
-from sqlalchemy import select
-from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
-from telegram.error import BadRequest
+from telegram import Update
 from telegram.ext import (
-    CallbackQueryHandler,
     ContextTypes,
     ConversationHandler,
 )
 
-from ..db.database import async_session
-from ..db.models.training import TrainingProgram, UserTrainingProgram, UserWorkout, Workout
-from .common import show_main_menu
+from ..callback_data import CallbackAction
+from ..db.catalog import catalog
+from ..db.repositories import Enrollment, TrainingRepository
+from ..logging import get_logger
+from ..messages import render_workout_details, render_workout_finished
+from ..query_budget import query_budget
+from ..request_context import get_request_context, with_request_context
+from .common import answer_callback_query, show_main_menu, show_message_parts
+from .routing import CallbackRouter
 
-logger = logging.getLogger(__name__)
+logger = get_logger(__name__)
 
 # States
 (
@@ -29,144 +37,22 @@ logger = logging.getLogger(__name__)
     SHOW_END_WORKOUT,
 ) = range(6)
 
-# Callback data patterns
-CALLBACK_PATTERNS = {
-    "running": "^running$",
-    "program": "^program_",
-    "show_program": "^show_program_",
-    "workout": "^workout_",
-    "back_to_programs": "^back_to_programs$",
-    "main_menu": "^main_menu$",
-    "reg_program": "^reg_program_",
-    "end_program": "^end_program_",
-    "give_active_workout": "^give_active_workout$",
-    "end_workout": "^end_workout_",
-}
-
-
-def create_programs_keyboard(
-    programs: list[TrainingProgram], active_programs_ids: list[int]
-) -> list[list[InlineKeyboardButton]]:
-    """Create keyboard for programs list."""
-    id_to_name = {
-        p.id: p.name if p.id not in active_programs_ids else f"✅ {p.name} (продолжить)"
-        for p in programs
-    }
-    keyboard = [
-        [InlineKeyboardButton(name, callback_data=f"program_{id}")]
-        for id, name in id_to_name.items()
-    ]
-    keyboard.append([InlineKeyboardButton("⬅️ Назад", callback_data="main_menu")])
-    return keyboard
-
-
-def create_accept_program_keyboard(program_id: int) -> list[list[InlineKeyboardButton]]:
-    return [
-        [InlineKeyboardButton("Начать тренировку", callback_data="give_active_workout")],
-        [InlineKeyboardButton("⬅️ К описанию программы", callback_data=f"program_{program_id}")],
-    ]
-
-
-def create_program_menu_keyboard(
-    program_id: int, active_program: bool
-) -> list[list[InlineKeyboardButton]]:
-    """Create keyboard for program menu."""
-    if active_program:
-        return [
-            [
-                InlineKeyboardButton("Продолжить тренировки", callback_data="give_active_workout"),
-                InlineKeyboardButton(
-                    "Список тренировок", callback_data=f"show_program_{program_id}"
-                ),
-            ],
-            [
-                InlineKeyboardButton(
-                    "Завершить программу", callback_data=f"end_program_{program_id}"
-                )
-            ],
-            [InlineKeyboardButton("⬅️ В главное меню", callback_data="main_menu")],
-        ]
-
-    return [
-        [
-            InlineKeyboardButton("Я в деле", callback_data=f"reg_program_{program_id}"),
-            InlineKeyboardButton("Список тренировок", callback_data=f"show_program_{program_id}"),
-        ],
-        [InlineKeyboardButton("⬅️ Назад", callback_data="back_to_programs")],
-    ]
-
-
-def create_workouts_keyboard(
-    workouts: list[Workout], program_id: int
-) -> list[list[InlineKeyboardButton]]:
-    """Create keyboard for workouts list."""
-    buttons = [
-        InlineKeyboardButton(str(w.order), callback_data=f"workout_{w.id}") for w in workouts
-    ]
-    keyboard = []
-    it = iter(buttons)
-    keyboard.extend([list(islice(it, 5)) for _ in range(0, len(buttons), 5)])
-    keyboard.append([InlineKeyboardButton("⬅️ Назад", callback_data=f"program_{program_id}")])
-    return keyboard
-
-
-def create_workout_details_keyboard(
-    program_id: int, workout_id: int, is_active_workout: bool = False
-) -> list[list[InlineKeyboardButton]]:
-    """Create keyboard for workout details."""
-    if is_active_workout:
-        return [
-            [
-                InlineKeyboardButton(
-                    "✅ Завершить тренировку",
-                    callback_data=f"end_workout_{program_id}_{workout_id}",
-                )
-            ],
-            [InlineKeyboardButton("⬅️ К описанию программы", callback_data=f"program_{program_id}")],
-            [InlineKeyboardButton("⬅️ Главное меню", callback_data="main_menu")],
-        ]
-    else:
-        return [
-            [
-                InlineKeyboardButton(
-                    "⬅️ К списку тренировок", callback_data=f"show_program_{program_id}"
-                )
-            ],
-            [InlineKeyboardButton("⬅️ К описанию программы", callback_data=f"program_{program_id}")],
-        ]
-
-
-def create_end_workout_keyboard(program_id: int) -> list[list[InlineKeyboardButton]]:
-    """Create keyboard for end workout."""
-    return [
-        [InlineKeyboardButton("Следующая тренировка", callback_data="give_active_workout")],
-        [InlineKeyboardButton("Список тренировок", callback_data=f"show_program_{program_id}")],
-        [InlineKeyboardButton("⬅️ Главное меню", callback_data="main_menu")],
-    ]
-
 
+@query_budget(select=1, total=1)
+@with_request_context
 async def running_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Show running programs menu."""
-    user_id = update.effective_user.id
-    active_program = await get_active_program(user_id)
-    if active_program:
-        return await give_active_workout(update, context)
-
     query = update.callback_query
-    if query:
-        await query.answer()
+    answer_callback_query(update, context)
 
     try:
-        async with async_session() as session:
-            # Get all training programs
-            programs = await session.execute(TrainingProgram.__table__.select())
-            programs = programs.fetchall()
-
-            active_programs = await get_unfinished_programs(update.effective_user.id)
-            active_programs_ids = [p.id for p in active_programs]
+        enrollment = await get_request_context().enrollment()
+        if enrollment:
+            return await give_active_workout(update, context, enrollment)
 
-        keyboard = create_programs_keyboard(programs, active_programs_ids)
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        programs = await catalog.get_programs()
+        # Users without an unfinished program have no active programs to mark
+        reply_markup = create_programs_keyboard(programs, [])
         text = "Выберите программу тренировок:"
 
         if query:
@@ -175,8 +61,8 @@ async def running_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
             await update.message.reply_text(text=text, reply_markup=reply_markup)
 
         return SHOW_PROGRAMS
-    except Exception as e:
-        logger.error(f"Error in running_menu: {e}", exc_info=True)
+    except Exception:
+        logger.exception("Handler failed", handler="running_menu", user_id=update.effective_user.id)
         await query.edit_message_text(
             text="Произошла ошибка. Попробуйте позже.",
             reply_markup=get_main_keyboard(),
@@ -184,18 +70,17 @@ async def running_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
         return int(ConversationHandler.END)
 
 
-async def show_program_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+@query_budget(select=1, total=1)
+@with_request_context
+async def show_program_menu(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, program_id: int
+) -> int:
     """Show program menu."""
     query = update.callback_query
-    await query.answer()
-
-    user_id = update.effective_user.id
+    answer_callback_query(update, context)
 
     try:
-        program_id = int(query.data.split("_")[1])
-        async with async_session() as session:
-            # Get program
-            program = await session.get(TrainingProgram, program_id)
+        program = await catalog.get_program(program_id)
 
         if not program:
             await query.edit_message_text(
@@ -205,25 +90,19 @@ async def show_program_menu(update: Update, context: ContextTypes.DEFAULT_TYPE)
             return int(ConversationHandler.END)
 
         # Check if user has active program
-        registered = await get_unfinished_programs(user_id)
-        active_program = False
-        if len(registered) == 1:
-            active_program = registered[0].id == program_id
+        enrollment = await get_request_context().enrollment()
+        active_program = enrollment is not None and enrollment.program_id == program_id
 
         keyboard = create_program_menu_keyboard(program_id, active_program)
         text = f"Программа: {program.name}\n{program.description}\nВыберите действие:"
 
-        try:
-            await query.edit_message_text(text=text, reply_markup=InlineKeyboardMarkup(keyboard))
-        except BadRequest as e:
-            if "Message is not modified" in str(e):
-                pass
-            else:
-                raise
+        await query.edit_message_text(text=text, reply_markup=keyboard)
 
         return SHOW_PROGRAM_MENU
-    except Exception as e:
-        logger.error(f"Error in show_program_menu: {e}", exc_info=True)
+    except Exception:
+        logger.exception(
+            "Handler failed", handler="show_program_menu", user_id=update.effective_user.id
+        )
         await query.edit_message_text(
             text="Произошла ошибка. Попробуйте позже.",
             reply_markup=get_main_keyboard(),
@@ -231,38 +110,34 @@ async def show_program_menu(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return int(ConversationHandler.END)
 
 
-async def show_program_workouts(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+@query_budget(total=0)
+async def show_program_workouts(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, program_id: int
+) -> int:
     """Show workouts for selected program."""
     query = update.callback_query
-    await query.answer()
+    answer_callback_query(update, context)
 
     try:
-        program_id = int(query.data.split("_")[-1])
-
-        async with async_session() as session:
-            # Get program and its workouts
-            program = await session.get(TrainingProgram, program_id)
-            if not program:
-                await query.edit_message_text(
-                    text="Программа не найдена. Попробуйте еще раз.",
-                    reply_markup=get_main_keyboard(),
-                )
-                return int(ConversationHandler.END)
-
-            workouts = await session.execute(
-                Workout.__table__.select()
-                .where(Workout.program_id == program_id)
-                .order_by(Workout.order)
+        program = await catalog.get_program(program_id)
+        if not program:
+            await query.edit_message_text(
+                text="Программа не найдена. Попробуйте еще раз.",
+                reply_markup=get_main_keyboard(),
             )
-            workouts = workouts.fetchall()
+            return int(ConversationHandler.END)
+
+        workouts = await catalog.get_workouts(program_id)
 
         keyboard = create_workouts_keyboard(workouts, program_id)
         text = f"Программа: {program.name}\n{program.description}\nВыберите тренировку:"
 
-        await query.edit_message_text(text=text, reply_markup=InlineKeyboardMarkup(keyboard))
+        await query.edit_message_text(text=text, reply_markup=keyboard)
         return SHOW_WORKOUTS
-    except Exception as e:
-        logger.error(f"Error in show_program_workouts: {e}", exc_info=True)
+    except Exception:
+        logger.exception(
+            "Handler failed", handler="show_program_workouts", user_id=update.effective_user.id
+        )
         await query.edit_message_text(
             text="Произошла ошибка. Попробуйте позже.",
             reply_markup=get_main_keyboard(),
@@ -281,43 +156,29 @@ async def show_workout_details(
     last_bot_message = user_state.get_active_message()
 
     try:
-        async with async_session() as session:
-            # Get workout and its program
-            workout = await session.get(Workout, workout_id)
-            if not workout:
-                text = "Тренировка не найдена. Попробуйте еще раз."
-                keyboard = get_main_keyboard()
-                await context.bot.edit_message_text(
-                    chat_id=last_bot_message.chat_id,
-                    message_id=last_bot_message.message_id,
-                    text=text,
-                    reply_markup=keyboard,
-                )
-                return int(ConversationHandler.END)
-
-            program = await session.get(TrainingProgram, workout.program_id)
-
-        keyboard = create_workout_details_keyboard(program.id, workout.id, is_active_workout)
-        text = (
-            f"Программа: {program.name}\n"
-            f"Тренировка: {workout.order}\n\n"
-            f"🎯 Описание:\n{workout.description}\n\n"
-            f"🏃‍♂️ План тренировки:\n{workout.plan}\n\n"
-            f"🔥 СБУ:\n{workout.warmup}\n\n"
-        )
-        if last_bot_message:
+        workout = await catalog.get_workout(workout_id)
+        if not workout:
+            text = "Тренировка не найдена. Попробуйте еще раз."
+            keyboard = get_main_keyboard()
             await context.bot.edit_message_text(
                 chat_id=last_bot_message.chat_id,
                 message_id=last_bot_message.message_id,
                 text=text,
-                reply_markup=InlineKeyboardMarkup(keyboard),
+                reply_markup=keyboard,
             )
-        else:
-            await update.message.reply_text(text=text, reply_markup=InlineKeyboardMarkup(keyboard))
+            return int(ConversationHandler.END)
+
+        program = await catalog.get_program(workout.program_id)
+
+        keyboard = create_workout_details_keyboard(program.id, workout.id, is_active_workout)
+        parts = render_workout_details(program, workout)
+        await show_message_parts(update, context, parts, keyboard)
         return SHOW_WORKOUT_DETAILS
 
-    except Exception as e:
-        logger.error(f"Error in show_workout_details: {e}", exc_info=True)
+    except Exception:
+        logger.exception(
+            "Handler failed", handler="show_workout_details", user_id=update.effective_user.id
+        )
         text = "Произошла ошибка. Попробуйте позже."
         keyboard = get_main_keyboard()
         await context.bot.edit_message_text(
@@ -329,69 +190,55 @@ async def show_workout_details(
         return int(ConversationHandler.END)
 
 
-async def handle_workout_details(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+@query_budget(total=0)
+async def handle_workout_details(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, workout_id: int
+) -> int:
     """Show details for selected workout."""
-    query = update.callback_query
-    await query.answer()
-    workout_id = int(query.data.split("_")[1])
-
+    answer_callback_query(update, context)
     return await show_workout_details(update, context, workout_id)
 
 
-async def get_unfinished_programs(user_id: int) -> list[TrainingProgram]:
-    """Get unfinished programs for user."""
-    async with async_session() as session:
-        stmt = (
-            select(TrainingProgram)
-            .join(UserTrainingProgram)
-            .where(
-                UserTrainingProgram.user_id == user_id,
-                UserTrainingProgram.end_date.is_(None),
-            )
-        )
-        result = await session.execute(stmt)
-        return list(result.scalars().all())
-
-
-async def register_program(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+@query_budget(select=1, insert=1, total=2)
+@with_request_context
+async def register_program(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, program_id: int
+) -> int:
     """Register program."""
     query = update.callback_query
-    await query.answer()
+    answer_callback_query(update, context)
 
     try:
-        program_id = int(query.data.split("_")[-1])
-        async with async_session() as session:
-            # Get program
-            user_id = update.effective_user.id
-
-            # Check for unfinished programs
-            unfinished_programs = await get_unfinished_programs(user_id)
-
-            if unfinished_programs:
+        request = get_request_context()
+
+        # Check for unfinished programs, the database rejects a second one in
+        # case the cached enrollment is stale
+        if await request.enrollment() is None:
+            training_repo = TrainingRepository(await request.session())
+            enrollment = await training_repo.start_program(request.user_id, program_id)
+            if enrollment is not None:
+                request.set_enrollment(enrollment)
+                keyboard = create_accept_program_keyboard(program_id)
                 await query.edit_message_text(
-                    text=(
-                        "У вас уже есть незавершенная программа тренировок.\n"
-                        "Завершите ее, прежде чем начать новую."
-                    ),
-                    reply_markup=InlineKeyboardMarkup(
-                        [[InlineKeyboardButton("⬅️ Назад", callback_data="running")]]
-                    ),
+                    text="Программа успешно зарегистрирована. Начинайте тренировки!",
+                    reply_markup=keyboard,
                 )
-                return SHOW_PROGRAMS
+                return ACCEPT_PROGRAM_MENU
+            request.discard_enrollment()
+            await request.enrollment()
 
-            # Register program
-            user_program = UserTrainingProgram(user_id=user_id, program_id=program_id)
-            session.add(user_program)
-            await session.commit()
-
-            keyboard = create_accept_program_keyboard(program_id)
-            await query.edit_message_text(
-                text="Программа успешно зарегистрирована. Начинайте тренировки!",
-                reply_markup=InlineKeyboardMarkup(keyboard),
-            )
-            return ACCEPT_PROGRAM_MENU
-    except Exception as e:
-        logger.error(f"Error in register_program: {e}", exc_info=True)
+        await query.edit_message_text(
+            text=(
+                "У вас уже есть незавершенная программа тренировок.\n"
+                "Завершите ее, прежде чем начать новую."
+            ),
+            reply_markup=get_back_to_running_keyboard(),
+        )
+        return SHOW_PROGRAMS
+    except Exception:
+        logger.exception(
+            "Handler failed", handler="register_program", user_id=update.effective_user.id
+        )
         await query.edit_message_text(
             text="Произошла ошибка. Попробуйте позже.",
             reply_markup=get_main_keyboard(),
@@ -399,34 +246,29 @@ async def register_program(update: Update, context: ContextTypes.DEFAULT_TYPE) -
         return int(ConversationHandler.END)
 
 
-async def end_program(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+@query_budget(select=1, update=1, total=2)
+@with_request_context
+async def end_program(update: Update, context: ContextTypes.DEFAULT_TYPE, program_id: int) -> int:
     """End program."""
     query = update.callback_query
-    await query.answer()
-    user_id = update.effective_user.id
+    answer_callback_query(update, context)
 
     try:
-        program_id = int(query.data.split("_")[-1])
-        async with async_session() as session:
-            stmt = select(UserTrainingProgram).where(
-                UserTrainingProgram.user_id == user_id,
-                UserTrainingProgram.program_id == program_id,
-                UserTrainingProgram.end_date.is_(None),
-            )
-            result = await session.execute(stmt)
-            user_program = result.scalar_one()
-            user_program.end_date = datetime.now()
-            await session.commit()
+        request = get_request_context()
+        enrollment = await request.enrollment()
+        if enrollment is None or enrollment.program_id != program_id:
+            raise LookupError(f"Program {program_id} is not active for user {request.user_id}")
+
+        await TrainingRepository(await request.session()).end_program(enrollment)
+        request.set_enrollment(None)
 
         await query.edit_message_text(
             text="Программа успешно завершена.",
-            reply_markup=InlineKeyboardMarkup(
-                [[InlineKeyboardButton("⬅️ Назад", callback_data="running")]]
-            ),
+            reply_markup=get_back_to_running_keyboard(),
         )
         return SHOW_PROGRAMS
-    except Exception as e:
-        logger.error(f"Error in end_program: {e}", exc_info=True)
+    except Exception:
+        logger.exception("Handler failed", handler="end_program", user_id=update.effective_user.id)
         await query.edit_message_text(
             text="Произошла ошибка. Попробуйте позже.",
             reply_markup=get_main_keyboard(),
@@ -434,187 +276,154 @@ async def end_program(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
         return int(ConversationHandler.END)
 
 
-async def get_active_program(user_id: int) -> UserTrainingProgram | None:
-    """Get active program for user."""
-    try:
-        async with async_session() as session:
-            stmt = select(UserTrainingProgram).where(
-                UserTrainingProgram.user_id == user_id,
-                UserTrainingProgram.end_date.is_(None),
-            )
-            result = await session.execute(stmt)
-            return result.scalar_one_or_none()  # type: ignore[no-any-return]
-    except Exception as e:
-        logger.error(f"Error in get_active_program: {e}", exc_info=True)
-        return None
-
-
-async def get_last_workout_id(user_id: int, user_program: UserTrainingProgram) -> int | None:
-    """Get last workout for user."""
-    try:
-        async with async_session() as session:
-            stmt = (
-                select(UserWorkout)
-                .where(
-                    UserWorkout.user_id == user_id,
-                    UserWorkout.user_program_id == user_program.id,
-                )
-                .order_by(UserWorkout.finished_at.desc())
-                .limit(1)
-            )
-            result = await session.execute(stmt)
-            last_workout = result.scalar_one_or_none()
-            return last_workout.workout_id if last_workout else None
-    except Exception as e:
-        logger.error(f"Error in get_last_workout: {e}", exc_info=True)
-        return None
-
-
-async def give_active_workout(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+@query_budget(select=1, total=1)
+@with_request_context
+async def give_active_workout(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    enrollment: Enrollment | None = None,
+) -> int:
     """Give active workout."""
     query = update.callback_query
-    await query.answer()
 
-    user_id = update.effective_user.id
-    active_program = await get_active_program(user_id)
-    if not active_program:
+    if enrollment is None:
+        # Called as a handler rather than from running_menu
+        answer_callback_query(update, context)
+        try:
+            enrollment = await get_request_context().enrollment()
+        except Exception:
+            logger.exception(
+                "Handler failed", handler="give_active_workout", user_id=update.effective_user.id
+            )
+    if not enrollment:
         await query.edit_message_text(
             text="У вас нет активной программы тренировок.",
             reply_markup=get_main_keyboard(),
         )
         return int(ConversationHandler.END)
 
-    last_workout_id = await get_last_workout_id(user_id, active_program)
-    active_workout_order = 1
-    if last_workout_id:
-        try:
-            async with async_session() as session:
-                workout = await session.get(Workout, last_workout_id)
-                active_workout_order = workout.order + 1
-        except Exception as e:
-            logger.error(f"Error in get_active_workout: {e}", exc_info=True)
-            return int(ConversationHandler.END)
-
-    async with async_session() as session:
-        try:
-            stmt = select(Workout).where(
-                Workout.program_id == active_program.program_id,
-                Workout.order == active_workout_order,
-            )
-            result = await session.execute(stmt)
-            workout = result.scalar_one_or_none()
-
-            if not workout:
-                await query.edit_message_text(
-                    text="Тренировка не найдена. Возможно, вы уже завершили программу.",
-                    reply_markup=get_main_keyboard(),
-                )
-                return int(ConversationHandler.END)
-        except Exception as e:
-            logger.error(f"Error in give_active_workout: {e}", exc_info=True)
-            return int(ConversationHandler.END)
+    workout = await catalog.get_workout_by_order(
+        enrollment.program_id, enrollment.next_workout_order
+    )
+    if not workout:
+        await query.edit_message_text(
+            text="Тренировка не найдена. Возможно, вы уже завершили программу.",
+            reply_markup=get_main_keyboard(),
+        )
+        return int(ConversationHandler.END)
 
     return await show_workout_details(update, context, workout.id, True)
 
 
-async def end_workout(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+@query_budget(select=1, insert=1, update=1, total=3)
+@with_request_context
+async def end_workout(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, program_id: int, workout_id: int
+) -> int:
     """End workout."""
     query = update.callback_query
-    await query.answer()
-    user_id = update.effective_user.id
-    program_id, workout_id = map(int, query.data.split("_")[-2:])
+    answer_callback_query(update, context)
 
     try:
-        async with async_session() as session:
-            # Get active program
-            active_program = await get_active_program(user_id)
-            if not active_program:
-                await query.edit_message_text(
-                    text="У вас нет активной программы тренировок.",
-                    reply_markup=get_main_keyboard(),
-                )
-                return int(ConversationHandler.END)
+        request = get_request_context()
 
-            # Get workout
-            workout = await session.get(Workout, workout_id)
-            if not workout:
-                await query.edit_message_text(
-                    text="Тренировка не найдена.",
-                    reply_markup=get_main_keyboard(),
-                )
-                return int(ConversationHandler.END)
-
-            # Create user workout record
-            user_workout = UserWorkout(
-                user_id=user_id,
-                workout_id=workout_id,
-                user_program_id=active_program.id,
-                finished_at=datetime.now(),
+        # Get active program
+        enrollment = await request.enrollment()
+        if not enrollment:
+            await query.edit_message_text(
+                text="У вас нет активной программы тренировок.",
+                reply_markup=get_main_keyboard(),
+            )
+            return int(ConversationHandler.END)
+
+        # Get workout, the button may be of another program
+        workout = await catalog.get_workout(workout_id)
+        if not workout or workout.program_id != enrollment.program_id:
+            await query.edit_message_text(
+                text="Тренировка не найдена.",
+                reply_markup=get_main_keyboard(),
+            )
+            return int(ConversationHandler.END)
+
+        # Create user workout record and advance progress in one transaction
+        training_repo = TrainingRepository(await request.session())
+        finished = await training_repo.finish_workout(
+            request.user_id, enrollment, workout.id, workout.order
+        )
+        if finished is None:
+            # Stale or replayed button, the workout is not the next one anymore
+            request.discard_enrollment()
+            await query.edit_message_text(
+                text="Эта тренировка уже завершена.",
+                reply_markup=get_back_to_running_keyboard(),
             )
-            session.add(user_workout)
-            await session.commit()
+            return SHOW_PROGRAMS
+        request.set_enrollment(finished)
 
-            text = f"🎉 Тренировка завершена!\n\n{workout.final_message}"
-            keyboard = create_end_workout_keyboard(program_id)
-            await query.edit_message_text(text=text, reply_markup=InlineKeyboardMarkup(keyboard))
+        keyboard = create_end_workout_keyboard(program_id)
+        parts = render_workout_finished(workout)
+        await show_message_parts(update, context, parts, keyboard)
 
-            return SHOW_END_WORKOUT
-    except Exception as e:
-        logger.error(f"Error in end_workout: {e}", exc_info=True)
+        return SHOW_END_WORKOUT
+    except Exception:
+        logger.exception("Handler failed", handler="end_workout", user_id=update.effective_user.id)
         return int(ConversationHandler.END)
 
 
-def get_running_conversation_handler() -> ConversationHandler:
-    """Get conversation handler for running training."""
+def get_running_conversation_handler(persistent: bool = True) -> ConversationHandler:
+    """Get conversation handler for running training, persistent if the bot has persistence."""
     return ConversationHandler(
-        entry_points=[CallbackQueryHandler(running_menu, pattern=CALLBACK_PATTERNS["running"])],
+        entry_points=[CallbackRouter({CallbackAction.RUNNING: running_menu})],
         states={
-            SHOW_PROGRAMS: [
-                CallbackQueryHandler(show_program_menu, pattern=CALLBACK_PATTERNS["program"]),
-            ],
+            SHOW_PROGRAMS: [CallbackRouter({CallbackAction.PROGRAM: show_program_menu})],
             ACCEPT_PROGRAM_MENU: [
-                CallbackQueryHandler(show_program_menu, pattern=CALLBACK_PATTERNS["program"]),
-                CallbackQueryHandler(
-                    give_active_workout, pattern=CALLBACK_PATTERNS["give_active_workout"]
+                CallbackRouter(
+                    {
+                        CallbackAction.PROGRAM: show_program_menu,
+                        CallbackAction.GIVE_ACTIVE_WORKOUT: give_active_workout,
+                    }
                 ),
             ],
             SHOW_PROGRAM_MENU: [
-                CallbackQueryHandler(
-                    show_program_workouts, pattern=CALLBACK_PATTERNS["show_program"]
-                ),
-                CallbackQueryHandler(running_menu, pattern=CALLBACK_PATTERNS["back_to_programs"]),
-                CallbackQueryHandler(register_program, pattern=CALLBACK_PATTERNS["reg_program"]),
-                CallbackQueryHandler(end_program, pattern=CALLBACK_PATTERNS["end_program"]),
-                CallbackQueryHandler(
-                    give_active_workout, pattern=CALLBACK_PATTERNS["give_active_workout"]
+                CallbackRouter(
+                    {
+                        CallbackAction.SHOW_PROGRAM: show_program_workouts,
+                        CallbackAction.BACK_TO_PROGRAMS: running_menu,
+                        CallbackAction.REGISTER_PROGRAM: register_program,
+                        CallbackAction.END_PROGRAM: end_program,
+                        CallbackAction.GIVE_ACTIVE_WORKOUT: give_active_workout,
+                    }
                 ),
             ],
             SHOW_WORKOUTS: [
-                CallbackQueryHandler(handle_workout_details, pattern=CALLBACK_PATTERNS["workout"]),
-                CallbackQueryHandler(show_program_menu, pattern=CALLBACK_PATTERNS["program"]),
-                CallbackQueryHandler(
-                    show_program_workouts, pattern=CALLBACK_PATTERNS["show_program"]
+                CallbackRouter(
+                    {
+                        CallbackAction.WORKOUT: handle_workout_details,
+                        CallbackAction.PROGRAM: show_program_menu,
+                        CallbackAction.SHOW_PROGRAM: show_program_workouts,
+                    }
                 ),
             ],
             SHOW_WORKOUT_DETAILS: [
-                CallbackQueryHandler(
-                    show_program_workouts, pattern=CALLBACK_PATTERNS["show_program"]
+                CallbackRouter(
+                    {
+                        CallbackAction.SHOW_PROGRAM: show_program_workouts,
+                        CallbackAction.PROGRAM: show_program_menu,
+                        CallbackAction.END_WORKOUT: end_workout,
+                    }
                 ),
-                CallbackQueryHandler(show_program_menu, pattern=CALLBACK_PATTERNS["program"]),
-                CallbackQueryHandler(end_workout, pattern=CALLBACK_PATTERNS["end_workout"]),
             ],
             SHOW_END_WORKOUT: [
-                CallbackQueryHandler(
-                    give_active_workout, pattern=CALLBACK_PATTERNS["give_active_workout"]
-                ),
-                CallbackQueryHandler(
-                    show_program_workouts, pattern=CALLBACK_PATTERNS["show_program"]
+                CallbackRouter(
+                    {
+                        CallbackAction.GIVE_ACTIVE_WORKOUT: give_active_workout,
+                        CallbackAction.SHOW_PROGRAM: show_program_workouts,
+                    }
                 ),
             ],
         },
-        fallbacks=[
-            CallbackQueryHandler(show_main_menu, pattern=CALLBACK_PATTERNS["main_menu"]),
-        ],
+        fallbacks=[CallbackRouter({CallbackAction.MAIN_MENU: show_main_menu})],
         name="running_conversation",
+        persistent=persistent,
         allow_reentry=True,
     )
@@ -1,13 +1,252 @@
+from collections.abc import Iterable, Sequence
+from functools import lru_cache
+from itertools import islice
+from typing import TYPE_CHECKING
+
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
+from .callback_data import CallbackAction, encode_callback_data
+
+if TYPE_CHECKING:
+    from .db.catalog import CatalogProgram, CatalogWorkout
+
+# Keyboards are immutable once built, so every factory below returns a shared
+# cached instance. Per-program keyboards are bounded by LRU eviction.
+PROGRAM_KEYBOARDS_CACHE_SIZE = 256
+WORKOUT_KEYBOARDS_CACHE_SIZE = 1024
 
+
+@lru_cache(maxsize=1)
 def get_main_keyboard() -> InlineKeyboardMarkup:
     """Get main menu keyboard."""
     keyboard = [
         [
-            InlineKeyboardButton("🏃 Беговая", callback_data="running"),
+            InlineKeyboardButton(
+                "🏃 Беговая", callback_data=encode_callback_data(CallbackAction.RUNNING)
+            ),
             InlineKeyboardButton("💪 Силовая", callback_data="strength"),
         ],
     ]
 
     return InlineKeyboardMarkup(keyboard)
+
+
+@lru_cache(maxsize=1)
+def get_back_to_running_keyboard() -> InlineKeyboardMarkup:
+    """Get keyboard leading back to the running programs list."""
+    return InlineKeyboardMarkup(
+        [
+            [
+                InlineKeyboardButton(
+                    "⬅️ Назад", callback_data=encode_callback_data(CallbackAction.RUNNING)
+                )
+            ]
+        ]
+    )
+
+
+def create_programs_keyboard(
+    programs: Sequence["CatalogProgram"], active_programs_ids: Iterable[int]
+) -> InlineKeyboardMarkup:
+    """Create keyboard for programs list."""
+    return _create_programs_keyboard(tuple(programs), frozenset(active_programs_ids))
+
+
+@lru_cache(maxsize=PROGRAM_KEYBOARDS_CACHE_SIZE)
+def _create_programs_keyboard(
+    programs: tuple["CatalogProgram", ...], active_programs_ids: frozenset[int]
+) -> InlineKeyboardMarkup:
+    id_to_name = {
+        p.id: p.name if p.id not in active_programs_ids else f"✅ {p.name} (продолжить)"
+        for p in programs
+    }
+    keyboard = [
+        [InlineKeyboardButton(name, callback_data=encode_callback_data(CallbackAction.PROGRAM, id))]
+        for id, name in id_to_name.items()
+    ]
+    keyboard.append(
+        [
+            InlineKeyboardButton(
+                "⬅️ Назад", callback_data=encode_callback_data(CallbackAction.MAIN_MENU)
+            )
+        ]
+    )
+    return InlineKeyboardMarkup(keyboard)
+
+
+@lru_cache(maxsize=PROGRAM_KEYBOARDS_CACHE_SIZE)
+def create_accept_program_keyboard(program_id: int) -> InlineKeyboardMarkup:
+    """Create keyboard shown after program registration."""
+    return InlineKeyboardMarkup(
+        [
+            [
+                InlineKeyboardButton(
+                    "Начать тренировку",
+                    callback_data=encode_callback_data(CallbackAction.GIVE_ACTIVE_WORKOUT),
+                )
+            ],
+            [
+                InlineKeyboardButton(
+                    "⬅️ К описанию программы",
+                    callback_data=encode_callback_data(CallbackAction.PROGRAM, program_id),
+                )
+            ],
+        ]
+    )
+
+
+@lru_cache(maxsize=PROGRAM_KEYBOARDS_CACHE_SIZE)
+def create_program_menu_keyboard(program_id: int, active_program: bool) -> InlineKeyboardMarkup:
+    """Create keyboard for program menu."""
+    if active_program:
+        return InlineKeyboardMarkup(
+            [
+                [
+                    InlineKeyboardButton(
+                        "Продолжить тренировки",
+                        callback_data=encode_callback_data(CallbackAction.GIVE_ACTIVE_WORKOUT),
+                    ),
+                    InlineKeyboardButton(
+                        "Список тренировок",
+                        callback_data=encode_callback_data(CallbackAction.SHOW_PROGRAM, program_id),
+                    ),
+                ],
+                [
+                    InlineKeyboardButton(
+                        "Завершить программу",
+                        callback_data=encode_callback_data(CallbackAction.END_PROGRAM, program_id),
+                    )
+                ],
+                [
+                    InlineKeyboardButton(
+                        "⬅️ В главное меню",
+                        callback_data=encode_callback_data(CallbackAction.MAIN_MENU),
+                    )
+                ],
+            ]
+        )
+
+    return InlineKeyboardMarkup(
+        [
+            [
+                InlineKeyboardButton(
+                    "Я в деле",
+                    callback_data=encode_callback_data(CallbackAction.REGISTER_PROGRAM, program_id),
+                ),
+                InlineKeyboardButton(
+                    "Список тренировок",
+                    callback_data=encode_callback_data(CallbackAction.SHOW_PROGRAM, program_id),
+                ),
+            ],
+            [
+                InlineKeyboardButton(
+                    "⬅️ Назад", callback_data=encode_callback_data(CallbackAction.BACK_TO_PROGRAMS)
+                )
+            ],
+        ]
+    )
+
+
+def create_workouts_keyboard(
+    workouts: Sequence["CatalogWorkout"], program_id: int
+) -> InlineKeyboardMarkup:
+    """Create keyboard for workouts list."""
+    return _create_workouts_keyboard(tuple((w.id, w.order) for w in workouts), program_id)
+
+
+@lru_cache(maxsize=PROGRAM_KEYBOARDS_CACHE_SIZE)
+def _create_workouts_keyboard(
+    workouts: tuple[tuple[int, int], ...], program_id: int
+) -> InlineKeyboardMarkup:
+    buttons = [
+        InlineKeyboardButton(
+            str(order), callback_data=encode_callback_data(CallbackAction.WORKOUT, id)
+        )
+        for id, order in workouts
+    ]
+    keyboard = []
+    it = iter(buttons)
+    keyboard.extend([list(islice(it, 5)) for _ in range(0, len(buttons), 5)])
+    keyboard.append(
+        [
+            InlineKeyboardButton(
+                "⬅️ Назад", callback_data=encode_callback_data(CallbackAction.PROGRAM, program_id)
+            )
+        ]
+    )
+    return InlineKeyboardMarkup(keyboard)
+
+
+@lru_cache(maxsize=WORKOUT_KEYBOARDS_CACHE_SIZE)
+def create_workout_details_keyboard(
+    program_id: int, workout_id: int, is_active_workout: bool = False
+) -> InlineKeyboardMarkup:
+    """Create keyboard for workout details."""
+    if is_active_workout:
+        return InlineKeyboardMarkup(
+            [
+                [
+                    InlineKeyboardButton(
+                        "✅ Завершить тренировку",
+                        callback_data=encode_callback_data(
+                            CallbackAction.END_WORKOUT, program_id, workout_id
+                        ),
+                    )
+                ],
+                [
+                    InlineKeyboardButton(
+                        "⬅️ К описанию программы",
+                        callback_data=encode_callback_data(CallbackAction.PROGRAM, program_id),
+                    )
+                ],
+                [
+                    InlineKeyboardButton(
+                        "⬅️ Главное меню",
+                        callback_data=encode_callback_data(CallbackAction.MAIN_MENU),
+                    )
+                ],
+            ]
+        )
+    else:
+        return InlineKeyboardMarkup(
+            [
+                [
+                    InlineKeyboardButton(
+                        "⬅️ К списку тренировок",
+                        callback_data=encode_callback_data(CallbackAction.SHOW_PROGRAM, program_id),
+                    )
+                ],
+                [
+                    InlineKeyboardButton(
+                        "⬅️ К описанию программы",
+                        callback_data=encode_callback_data(CallbackAction.PROGRAM, program_id),
+                    )
+                ],
+            ]
+        )
+
+
+@lru_cache(maxsize=PROGRAM_KEYBOARDS_CACHE_SIZE)
+def create_end_workout_keyboard(program_id: int) -> InlineKeyboardMarkup:
+    """Create keyboard for end workout."""
+    return InlineKeyboardMarkup(
+        [
+            [
+                InlineKeyboardButton(
+                    "Следующая тренировка",
+                    callback_data=encode_callback_data(CallbackAction.GIVE_ACTIVE_WORKOUT),
+                )
+            ],
+            [
+                InlineKeyboardButton(
+                    "Список тренировок",
+                    callback_data=encode_callback_data(CallbackAction.SHOW_PROGRAM, program_id),
+                )
+            ],
+            [
+                InlineKeyboardButton(
+                    "⬅️ Главное меню", callback_data=encode_callback_data(CallbackAction.MAIN_MENU)
+                )
+            ],
+        ]
+    )
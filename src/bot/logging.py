@@ -1,36 +1,244 @@
+import atexit
+import json
 import logging
+import queue
+import random
 import sys
+import threading
+from collections.abc import Callable, Mapping
+from typing import Any, TextIO
 
 import structlog
-from structlog.types import Processor
+from structlog.types import EventDict, Processor, WrappedLogger
+
+from .config import get_settings
+
+try:
+    # Optional dependency, installed with the "speedups" extra
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore[assignment]
+
+# Lines written to the stream at once by the writer thread
+WRITE_BATCH_SIZE = 256
+# Seconds the writer thread gets to write queued lines at exit
+CLOSE_TIMEOUT = 5.0
+# Levels of events that are never sampled
+UNSAMPLED_LEVELS = frozenset({"warning", "error", "critical", "exception"})
+
+
+def _orjson_dumps(obj: Any, **kwargs: Any) -> str:
+    return orjson.dumps(obj, default=kwargs.get("default")).decode()
+
+
+def _json_dumps(obj: Any, **kwargs: Any) -> str:
+    return json.dumps(obj, separators=(",", ":"), **kwargs)
+
+
+# Serialize events with orjson if it is installed, it is several times faster
+_dumps = _json_dumps if orjson is None else _orjson_dumps
+
+
+class LogWriter:
+    """Writes log lines to a stream from a background thread.
+
+    Callers only put lines into a bounded queue, so logging never waits for
+    the stream. Lines are dropped when the queue is full, and the number of
+    dropped lines is logged once the writer catches up.
+    """
+
+    def __init__(
+        self, stream: TextIO, max_queued: int, render_dropped: Callable[[int], str]
+    ) -> None:
+        """
+        Initialize the writer and start its thread.
+
+        Args:
+            stream: Stream receiving the lines
+            max_queued: Maximum number of lines waiting to be written
+            render_dropped: Renders the line reporting the number of dropped lines
+        """
+        self.stream = stream
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+        self._render_dropped = render_dropped
+        self._queue: queue.Queue[str | None] = queue.Queue(max_queued)
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, line: str) -> None:
+        """Queue a line for writing."""
+        try:
+            self._queue.put_nowait(line)
+        except queue.Full:
+            # Lines are written from any thread logging
+            with self._dropped_lock:
+                self.dropped += 1
+
+    def close(self, timeout: float = CLOSE_TIMEOUT) -> None:
+        """Write the queued lines and stop the thread."""
+        if not self._thread.is_alive():
+            return
+        try:
+            # Wait for room rather than drop the stop signal
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while True:
+            line = self._queue.get()
+            batch = []
+            while line is not None:
+                batch.append(line)
+                if len(batch) >= WRITE_BATCH_SIZE:
+                    break
+                try:
+                    line = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            with self._dropped_lock:
+                dropped, self.dropped = self.dropped, 0
+            if dropped:
+                try:
+                    batch.append(self._render_dropped(dropped))
+                except Exception:
+                    # Nowhere left to report the failure
+                    pass
+            if batch:
+                try:
+                    self.stream.write("\n".join(batch) + "\n")
+                    self.stream.flush()
+                except (OSError, ValueError):
+                    # Nowhere left to report the failure
+                    pass
+            if line is None:
+                return
+
+
+class QueueLogger:
+    """structlog logger passing rendered events to a log writer."""
+
+    __slots__ = ("_writer",)
+
+    def __init__(self, writer: LogWriter) -> None:
+        self._writer = writer
+
+    def msg(self, message: str) -> None:
+        self._writer.write(message)
+
+    log = debug = info = warn = warning = msg
+    error = critical = exception = fatal = failure = msg
+
+
+class RenderedLine:
+    """structlog logger returning the rendered event instead of writing it."""
+
+    __slots__ = ()
+
+    def msg(self, message: str) -> str:
+        return message
+
+    log = debug = info = warn = warning = msg
+    error = critical = exception = fatal = failure = msg
+
+
+class QueueHandler(logging.Handler):
+    """Standard library handler passing formatted records to a log writer."""
+
+    def __init__(self, writer: LogWriter) -> None:
+        super().__init__()
+        self.writer = writer
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self.writer.write(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+
+class EventSampler:
+    """Processor logging only a fraction of high-volume events.
+
+    Rates are keyed by event name, events without a rate are always logged.
+    Warnings and errors are never dropped. Kept events carry their
+    `sample_rate`, so counts derived from logs can be scaled back.
+    """
+
+    __slots__ = ("rates", "_random")
+
+    def __init__(
+        self, rates: Mapping[str, float], random_: Callable[[], float] = random.random
+    ) -> None:
+        self.rates = dict(rates)
+        self._random = random_
+
+    def __call__(self, logger: WrappedLogger, method_name: str, event_dict: EventDict) -> EventDict:
+        rate = self.rates.get(event_dict.get("event"))  # type: ignore[arg-type]
+        if rate is None or rate >= 1 or event_dict.get("level") in UNSAMPLED_LEVELS:
+            return event_dict
+        if self._random() >= rate:
+            raise structlog.DropEvent
+        event_dict["sample_rate"] = rate
+        return event_dict
 
 
 def setup_logging() -> None:
-    """Configure structured logging."""
-    # Configure standard logging
-    logging.basicConfig(
-        format="%(message)s",
-        level=logging.INFO,
-        stream=sys.stdout,
-    )
+    """Configure structured logging written to stdout by a background thread."""
+    settings = get_settings()
 
-    # Configure structlog processors
-    processors: list[Processor] = [
+    # Processors shared by structlog and standard library records
+    shared_processors: list[Processor] = [
         structlog.contextvars.merge_contextvars,
         structlog.processors.add_log_level,
+        EventSampler(settings.LOG_SAMPLE_RATES),
         structlog.processors.TimeStamper(fmt="iso"),
+    ]
+    renderer = structlog.processors.JSONRenderer(serializer=_dumps)
+
+    # Configure structlog processors
+    processors: list[Processor] = [
+        *shared_processors,
         structlog.processors.StackInfoRenderer(),
         structlog.processors.format_exc_info,
         structlog.processors.UnicodeDecoder(),
-        structlog.processors.JSONRenderer(),
+        renderer,
     ]
 
+    # The writer thread reports dropped lines through the same processors
+    dropped_logger = structlog.wrap_logger(
+        RenderedLine(), processors=processors, context_class=dict
+    ).bind(logger=__name__)
+
+    def render_dropped(count: int) -> str:
+        line: str = dropped_logger.warning("Log lines dropped", count=count)
+        return line
+
+    writer = LogWriter(sys.stdout, settings.LOG_QUEUE_SIZE, render_dropped)
+    atexit.register(writer.close)
+
+    # Configure standard logging, used by the libraries
+    handler = QueueHandler(writer)
+    handler.setFormatter(
+        structlog.stdlib.ProcessorFormatter(
+            foreign_pre_chain=[
+                structlog.stdlib.add_logger_name,
+                *shared_processors,
+                structlog.processors.format_exc_info,
+            ],
+            processors=[structlog.stdlib.ProcessorFormatter.remove_processors_meta, renderer],
+        )
+    )
+    logging.basicConfig(level=logging.INFO, handlers=[handler], force=True)
+
     # Configure structlog
     structlog.configure(
         processors=processors,
         wrapper_class=structlog.make_filtering_bound_logger(logging.INFO),
         context_class=dict,
-        logger_factory=structlog.PrintLoggerFactory(),
+        logger_factory=lambda *args: QueueLogger(writer),
         cache_logger_on_first_use=True,
     )
 
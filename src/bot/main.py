@@ -1,4 +1,22 @@
+import asyncio
+from contextlib import suppress
+
+from bot.callback_data import decode_cache_stats
+from bot.db.catalog import catalog
+from bot.db.enrollment_cache import enrollment_cache
 from bot.handlers.main_menu import get_main_menu_conversation_handler
+from bot.messages import prerender_catalog_messages
+from bot.metrics import (
+    MetricsServer,
+    instrument_handlers,
+    observe_application,
+    observe_cache,
+    registry,
+)
+from bot.persistence import DatabasePersistence
+from bot.rate_limiter import TelegramRateLimiter
+from bot.update_filter import install_update_filter
+from bot.update_processor import PerUserUpdateProcessor
 from telegram import Update
 from telegram.ext import (
     Application,
@@ -16,6 +34,10 @@ logger = get_logger(__name__)
 # Initialize settings
 settings = get_settings()
 
+metrics_server = MetricsServer(registry)
+# Tasks running alongside the bot, cancelled when it stops
+background_tasks: set[asyncio.Task[None]] = set()
+
 
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Sends a help message when the /help command is received."""
@@ -23,17 +45,97 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     await update.message.reply_text("I just repeat your messages. Send me some text!")
 
 
+async def refresh_catalog(interval: float) -> None:
+    """Reload the catalog whenever the program loader changed it."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if await catalog.refresh():
+                await prerender_catalog_messages(catalog)
+        except Exception:
+            logger.exception("Catalog refresh failed")
+
+
+async def post_init(application: Application) -> None:
+    """Warm up in-memory caches before the bot starts processing updates."""
+    # The snapshot is refreshed by the program loader run before the bot
+    snapshot_path = settings.catalog_snapshot_path
+    if snapshot_path is None or not catalog.load_snapshot(snapshot_path):
+        await catalog.load()
+    await prerender_catalog_messages(catalog)
+    if settings.CATALOG_REFRESH_INTERVAL is not None:
+        background_tasks.add(
+            asyncio.create_task(refresh_catalog(settings.CATALOG_REFRESH_INTERVAL))
+        )
+
+    observe_application(application)
+    observe_cache("catalog", catalog.stats)
+    observe_cache("enrollment", enrollment_cache.stats)
+    observe_cache("callback_data", decode_cache_stats)
+    if settings.METRICS_PORT is not None:
+        metrics_server.start(settings.METRICS_HOST, settings.METRICS_PORT)
+
+
+async def post_stop(application: Application) -> None:
+    """Report cache effectiveness after the bot stopped processing updates."""
+    for task in background_tasks:
+        task.cancel()
+    background_tasks.clear()
+    metrics_server.stop()
+    logger.info("Enrollment cache stats", **enrollment_cache.stats())
+
+
 def main() -> None:
     """Start the bot."""
 
     # Create the Application and pass it your bot's token
-    application = Application.builder().token(settings.TELEGRAM_TOKEN).build()
+    builder = Application.builder().token(settings.TELEGRAM_TOKEN)
+    if settings.PERSISTENCE_ENABLED:
+        builder.persistence(
+            DatabasePersistence(
+                update_interval=settings.PERSISTENCE_UPDATE_INTERVAL,
+                flush_delay=settings.PERSISTENCE_FLUSH_DELAY,
+            )
+        )
+    application = (
+        builder.rate_limiter(
+            TelegramRateLimiter(
+                overall_per_second=settings.RATE_LIMIT_OVERALL,
+                chat_per_second=settings.RATE_LIMIT_CHAT,
+                chat_burst=settings.RATE_LIMIT_CHAT_BURST,
+                group_per_minute=settings.RATE_LIMIT_GROUP_PER_MINUTE,
+                max_retries=settings.RATE_LIMIT_MAX_RETRIES,
+                # Other instances may edit the messages too
+                skip_unchanged_edits=settings.BOT_INSTANCES == 1,
+            )
+        )
+        .concurrent_updates(
+            PerUserUpdateProcessor(
+                max_running_updates=settings.max_concurrent_updates,
+                max_pending_updates=settings.MAX_PENDING_UPDATES,
+            )
+        )
+        .post_init(post_init)
+        .post_stop(post_stop)
+        .build()
+    )
 
     # Add handlers
     application.add_handler(CommandHandler("help", help_command))
-    application.add_handler(get_main_menu_conversation_handler())
+    application.add_handler(get_main_menu_conversation_handler(settings.PERSISTENCE_ENABLED))
+    for handlers in application.handlers.values():
+        instrument_handlers(handlers)
+    allowed_updates = install_update_filter(application)
+
+    if settings.BOT_MODE == "webhook":
+        # Optional dependencies, installed with the "webhook" extra
+        from bot.webhook import run_webhook
 
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+        # The server re-raises the termination signal after a graceful shutdown
+        with suppress(KeyboardInterrupt):
+            asyncio.run(run_webhook(application, settings, allowed_updates=allowed_updates))
+    else:
+        application.run_polling(allowed_updates=allowed_updates)
 
 
 if __name__ == "__main__":
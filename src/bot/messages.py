@@ -0,0 +1,53 @@
+from functools import lru_cache
+
+from telegram.constants import MessageLimit
+
+from .db.catalog import CatalogProgram, CatalogWorkout, TrainingCatalog
+
+MAX_MESSAGE_LENGTH = int(MessageLimit.MAX_TEXT_LENGTH)
+
+# Rendered texts are keyed by immutable catalog snapshots, so a catalog reload
+# with changed workouts naturally misses the cache and old entries age out.
+RENDERED_MESSAGES_CACHE_SIZE = 1024
+
+
+def split_message(text: str, limit: int = MAX_MESSAGE_LENGTH) -> tuple[str, ...]:
+    """Split text into Telegram-sized parts, preferring paragraph and line breaks."""
+    parts: list[str] = []
+    while len(text) > limit:
+        cut = text.rfind("\n\n", 0, limit)
+        if cut <= 0:
+            cut = text.rfind("\n", 0, limit)
+        if cut <= 0:
+            cut = limit
+        parts.append(text[:cut].rstrip())
+        text = text[cut:].lstrip("\n")
+    parts.append(text)
+    return tuple(parts)
+
+
+@lru_cache(maxsize=RENDERED_MESSAGES_CACHE_SIZE)
+def render_workout_details(program: CatalogProgram, workout: CatalogWorkout) -> tuple[str, ...]:
+    """Render workout details message parts."""
+    text = (
+        f"Программа: {program.name}\n"
+        f"Тренировка: {workout.order}\n\n"
+        f"🎯 Описание:\n{workout.description}\n\n"
+        f"🏃‍♂️ План тренировки:\n{workout.plan}\n\n"
+        f"🔥 СБУ:\n{workout.warmup}\n\n"
+    )
+    return split_message(text)
+
+
+@lru_cache(maxsize=RENDERED_MESSAGES_CACHE_SIZE)
+def render_workout_finished(workout: CatalogWorkout) -> tuple[str, ...]:
+    """Render finished workout message parts."""
+    return split_message(f"🎉 Тренировка завершена!\n\n{workout.final_message}")
+
+
+async def prerender_catalog_messages(catalog: TrainingCatalog) -> None:
+    """Pre-render messages of all catalog workouts."""
+    for program in await catalog.get_programs():
+        for workout in await catalog.get_workouts(program.id):
+            render_workout_details(program, workout)
+            render_workout_finished(workout)
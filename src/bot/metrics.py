@@ -0,0 +1,247 @@
+import functools
+import threading
+import time
+from collections.abc import Callable, Coroutine, Iterator, Mapping
+from contextlib import contextmanager
+from typing import Any
+from wsgiref.simple_server import WSGIServer
+
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    PlatformCollector,
+    ProcessCollector,
+    start_http_server,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, Metric
+from telegram.ext import Application, ApplicationHandlerStop, BaseHandler, ConversationHandler
+
+from .db.stats import StatementStats, collect_statements, process_stats
+from .handlers.routing import CallbackRouter
+from .logging import get_logger
+
+logger = get_logger(__name__)
+
+# Seconds, from a cached callback answer to a slow database write
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Statements per update, an N+1 query shows up in the upper buckets
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34)
+
+
+class CacheCollector:
+    """Collector reading size, hits and misses of in-memory caches on every scrape."""
+
+    def __init__(self) -> None:
+        self._caches: dict[str, Callable[[], Mapping[str, float]]] = {}
+
+    def observe(self, name: str, stats: Callable[[], Mapping[str, float]]) -> None:
+        """Add a cache, stats return its "size" and optionally "hits" and "misses"."""
+        self._caches[name] = stats
+
+    def describe(self) -> Iterator[Metric]:
+        return self._families()
+
+    def collect(self) -> Iterator[Metric]:
+        return self._families({name: stats() for name, stats in self._caches.items()})
+
+    @staticmethod
+    def _families(caches: Mapping[str, Mapping[str, float]] | None = None) -> Iterator[Metric]:
+        entries = GaugeMetricFamily(
+            "bot_cache_entries", "Entries of in-memory caches", labels=["cache"]
+        )
+        hits = CounterMetricFamily(
+            "bot_cache_hits", "Lookups answered by in-memory caches", labels=["cache"]
+        )
+        misses = CounterMetricFamily(
+            "bot_cache_misses", "Lookups in-memory caches had to load", labels=["cache"]
+        )
+        for name, stats in (caches or {}).items():
+            entries.add_metric([name], stats["size"])
+            if "hits" in stats:
+                hits.add_metric([name], stats["hits"])
+            if "misses" in stats:
+                misses.add_metric([name], stats["misses"])
+        yield from (entries, hits, misses)
+
+
+class StatementCollector:
+    """Collector reading the SQL statements of the process on every scrape."""
+
+    def collect(self) -> Iterator[Metric]:
+        statements = CounterMetricFamily("bot_db_statements", "SQL statements executed")
+        statements.add_metric([], process_stats.db_statements)
+        duration = CounterMetricFamily(
+            "bot_db_duration_seconds", "Time spent executing SQL statements"
+        )
+        duration.add_metric([], process_stats.db_duration)
+        yield from (statements, duration)
+
+
+# Process-wide registry of the bot's metrics
+registry = CollectorRegistry()
+ProcessCollector(registry=registry)
+PlatformCollector(registry=registry)
+
+handler_duration = Histogram(
+    "bot_handler_duration_seconds",
+    "Duration of handler callbacks",
+    ["handler"],
+    buckets=LATENCY_BUCKETS,
+    registry=registry,
+)
+handler_errors = Counter(
+    "bot_handler_errors_total",
+    "Handler callbacks that raised an exception",
+    ["handler"],
+    registry=registry,
+)
+update_duration = Histogram(
+    "bot_update_duration_seconds",
+    "Duration of processing an update by all handlers",
+    buckets=LATENCY_BUCKETS,
+    registry=registry,
+)
+update_db_statements = Histogram(
+    "bot_update_db_statements",
+    "SQL statements executed per update",
+    buckets=STATEMENT_BUCKETS,
+    registry=registry,
+)
+update_db_duration = Histogram(
+    "bot_update_db_duration_seconds",
+    "Time spent executing SQL statements per update",
+    buckets=LATENCY_BUCKETS,
+    registry=registry,
+)
+api_request_duration = Histogram(
+    "bot_api_request_duration_seconds",
+    "Duration of Bot API requests, excluding rate limit waits",
+    ["endpoint"],
+    buckets=LATENCY_BUCKETS,
+    registry=registry,
+)
+api_request_errors = Counter(
+    "bot_api_request_errors_total",
+    "Bot API requests that failed",
+    ["endpoint", "error"],
+    registry=registry,
+)
+updates_queued = Gauge(
+    "bot_updates_queued", "Updates received and waiting in the update queue", registry=registry
+)
+updates_processing = Gauge(
+    "bot_updates_processing",
+    "Updates accepted for processing, including ones waiting for an earlier update of the user",
+    registry=registry,
+)
+updates_running = Gauge(
+    "bot_updates_running", "Updates being processed by handlers", registry=registry
+)
+caches = CacheCollector()
+registry.register(caches)
+registry.register(StatementCollector())
+query_budget_overruns = Counter(
+    "bot_query_budget_overruns_total",
+    "Handler calls that executed more SQL statements than their budget",
+    ["handler"],
+    registry=registry,
+)
+
+
+@contextmanager
+def track_update() -> Iterator[StatementStats]:
+    """Record duration and database work of the update processed within the block."""
+    updates_running.inc()
+    started = time.perf_counter()
+    with collect_statements() as stats:
+        try:
+            yield stats
+        finally:
+            update_duration.observe(time.perf_counter() - started)
+            updates_running.dec()
+            update_db_statements.observe(stats.db_statements)
+            update_db_duration.observe(stats.db_duration)
+
+
+def observe_cache(name: str, stats: Callable[[], Mapping[str, float]]) -> None:
+    """Read size, hits and misses of a cache from its stats on every scrape."""
+    caches.observe(name, stats)
+
+
+def observe_application(application: Application) -> None:
+    """Read update queue depths of the application on every scrape."""
+    processor = application.update_processor
+    updates_queued.set_function(application.update_queue.qsize)
+    updates_processing.set_function(lambda: processor.current_concurrent_updates)
+
+
+def _timed_callback[**P, R](
+    name: str, callback: Callable[P, Coroutine[Any, Any, R]]
+) -> Callable[P, Coroutine[Any, Any, R]]:
+    duration = handler_duration.labels(name)
+    errors = handler_errors.labels(name)
+
+    @functools.wraps(callback)
+    async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+        started = time.perf_counter()
+        try:
+            return await callback(*args, **kwargs)
+        except ApplicationHandlerStop:
+            raise
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            duration.observe(time.perf_counter() - started)
+
+    return wrapper
+
+
+def instrument_handlers(handlers: list[BaseHandler[Any, Any, Any]]) -> None:
+    """
+    Record latency and errors of the handlers' callbacks, labeled by callback name.
+
+    Callbacks of nested conversation handlers are instrumented as well. Callback
+    routers are replaced in the list by routers calling the instrumented routes.
+    """
+    for index, handler in enumerate(handlers):
+        if isinstance(handler, ConversationHandler):
+            instrument_handlers(handler.entry_points)
+            instrument_handlers(handler.fallbacks)
+            for state_handlers in handler.states.values():
+                instrument_handlers(state_handlers)
+        elif isinstance(handler, CallbackRouter):
+            handlers[index] = handler.map_routes(
+                lambda route: _timed_callback(route.__name__, route)
+            )
+        else:
+            handler.callback = _timed_callback(handler.callback.__name__, handler.callback)
+
+
+class MetricsServer:
+    """HTTP server exposing a registry to Prometheus scrapes from a daemon thread.
+
+    Bind it to a local or internal address.
+    """
+
+    __slots__ = ("registry", "_server", "_thread")
+
+    def __init__(self, registry: CollectorRegistry) -> None:
+        self.registry = registry
+        self._server: WSGIServer | None = None
+        self._thread: threading.Thread | None = None
+
+    def start(self, host: str, port: int) -> None:
+        """Start accepting scrapes."""
+        self._server, self._thread = start_http_server(port, host, registry=self.registry)
+        logger.info("Metrics server started", host=host, port=port)
+
+    def stop(self) -> None:
+        """Stop accepting scrapes, if the server was started."""
+        if self._server is not None and self._thread is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = self._thread = None
@@ -0,0 +1,206 @@
+import asyncio
+import json
+from contextlib import suppress
+from typing import Any
+
+from sqlalchemy import delete, select, tuple_
+from telegram.ext import BasePersistence, PersistenceInput
+
+from .db.database import async_session, dialect_insert
+from .db.models.persistence import PersistedConversation, PersistedUserData
+from .logging import get_logger
+from .user_state import dump_user_data
+
+logger = get_logger(__name__)
+
+UserData = dict[str, Any]
+ConversationKey = tuple[int | str, ...]
+ConversationDict = dict[ConversationKey, object]
+
+
+class DatabasePersistence(BasePersistence[UserData, dict[Any, Any], dict[Any, Any]]):
+    """Persistence storing user data and conversation states in the bot database.
+
+    Changed state is buffered in memory (write-behind) and written to the database
+    in a single transaction `flush_delay` seconds after the first change, so a whole
+    `update_persistence` run of the application ends up in one batch. User state
+    objects are serialized only at this point.
+    Chat data, bot data and callback data are not stored.
+
+    State is read from the database at startup only, so the bot must be the
+    only instance using the database (see `Settings.BOT_INSTANCES`).
+    """
+
+    def __init__(self, update_interval: float = 60, flush_delay: float = 1) -> None:
+        """
+        Initialize the persistence.
+
+        Args:
+            update_interval: Seconds between application persistence updates
+            flush_delay: Seconds to buffer changes before writing them
+        """
+        super().__init__(
+            store_data=PersistenceInput(chat_data=False, bot_data=False, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.flush_delay = flush_delay
+        self._user_data: dict[int, UserData | None] = {}
+        self._conversations: dict[tuple[str, str], object | None] = {}
+        self._flush_task: asyncio.Task[None] | None = None
+        self._flush_lock = asyncio.Lock()
+
+    @staticmethod
+    def _encode_key(key: ConversationKey) -> str:
+        return json.dumps(key, separators=(",", ":"))
+
+    @staticmethod
+    def _decode_key(key: str) -> ConversationKey:
+        return tuple(json.loads(key))
+
+    async def get_user_data(self) -> dict[int, UserData]:
+        """Load all persisted user data."""
+        async with async_session() as session:
+            result = await session.execute(select(PersistedUserData))
+            return {row.user_id: row.data for row in result.scalars()}
+
+    async def get_chat_data(self) -> dict[int, dict[Any, Any]]:
+        """Chat data is not persisted."""
+        return {}
+
+    async def get_bot_data(self) -> dict[Any, Any]:
+        """Bot data is not persisted."""
+        return {}
+
+    async def get_callback_data(self) -> None:
+        """Callback data is not persisted."""
+        return None
+
+    async def get_conversations(self, name: str) -> ConversationDict:
+        """Load persisted states of the named conversation handler."""
+        async with async_session() as session:
+            result = await session.execute(
+                select(PersistedConversation).where(PersistedConversation.name == name)
+            )
+            return {self._decode_key(row.key): row.state for row in result.scalars()}
+
+    async def update_conversation(
+        self, name: str, key: ConversationKey, new_state: object | None
+    ) -> None:
+        """Buffer a conversation state change."""
+        self._conversations[(name, self._encode_key(key))] = new_state
+        self._schedule_flush()
+
+    async def update_user_data(self, user_id: int, data: UserData) -> None:
+        """Buffer changed user data."""
+        self._user_data[user_id] = data
+        self._schedule_flush()
+
+    async def update_chat_data(self, chat_id: int, data: dict[Any, Any]) -> None:
+        """Chat data is not persisted."""
+
+    async def update_bot_data(self, data: dict[Any, Any]) -> None:
+        """Bot data is not persisted."""
+
+    async def update_callback_data(self, data: Any) -> None:
+        """Callback data is not persisted."""
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        """Chat data is not persisted."""
+
+    async def drop_user_data(self, user_id: int) -> None:
+        """Buffer removal of user data."""
+        self._user_data[user_id] = None
+        self._schedule_flush()
+
+    async def refresh_user_data(self, user_id: int, user_data: UserData) -> None:
+        """Nothing to refresh, the single bot instance holds the current state."""
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict[Any, Any]) -> None:
+        """Chat data is not persisted."""
+
+    async def refresh_bot_data(self, bot_data: dict[Any, Any]) -> None:
+        """Bot data is not persisted."""
+
+    def _schedule_flush(self) -> None:
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self) -> None:
+        await asyncio.sleep(self.flush_delay)
+        try:
+            await self._write_buffered()
+        except Exception as e:
+            logger.error("Failed to flush persistence", error=str(e), exc_info=True)
+
+    async def flush(self) -> None:
+        """Write all buffered changes, called on application shutdown."""
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._flush_task
+        await self._write_buffered()
+
+    async def _write_buffered(self) -> None:
+        """Write buffered changes in a single transaction."""
+        async with self._flush_lock:
+            user_data, self._user_data = self._user_data, {}
+            conversations, self._conversations = self._conversations, {}
+            if not user_data and not conversations:
+                return
+
+            try:
+                await self._write(user_data, conversations)
+            except BaseException:
+                # Keep changes for the next flush unless they were superseded meanwhile
+                self._user_data = user_data | self._user_data
+                self._conversations = conversations | self._conversations
+                raise
+
+        logger.debug("Persistence flushed", users=len(user_data), conversations=len(conversations))
+
+    async def _write(
+        self,
+        user_data: dict[int, UserData | None],
+        conversations: dict[tuple[str, str], object | None],
+    ) -> None:
+        upsert_users = [
+            {"user_id": user_id, "data": dump_user_data(data)}
+            for user_id, data in user_data.items()
+            if data is not None
+        ]
+        drop_users = [user_id for user_id, data in user_data.items() if data is None]
+        upsert_conversations = [
+            {"name": name, "key": key, "state": state}
+            for (name, key), state in conversations.items()
+            if state is not None
+        ]
+        drop_conversations = [key for key, state in conversations.items() if state is None]
+
+        async with async_session() as session:
+            if upsert_users:
+                stmt = dialect_insert(PersistedUserData)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[PersistedUserData.user_id],
+                    set_={"data": stmt.excluded.data, "updated_at": stmt.excluded.updated_at},
+                )
+                await session.execute(stmt, upsert_users)
+            if drop_users:
+                await session.execute(
+                    delete(PersistedUserData).where(PersistedUserData.user_id.in_(drop_users))
+                )
+            if upsert_conversations:
+                stmt = dialect_insert(PersistedConversation)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[PersistedConversation.name, PersistedConversation.key],
+                    set_={"state": stmt.excluded.state, "updated_at": stmt.excluded.updated_at},
+                )
+                await session.execute(stmt, upsert_conversations)
+            if drop_conversations:
+                await session.execute(
+                    delete(PersistedConversation).where(
+                        tuple_(PersistedConversation.name, PersistedConversation.key).in_(
+                            drop_conversations
+                        )
+                    )
+                )
+            await session.commit()
@@ -0,0 +1,112 @@
+import functools
+from collections.abc import Callable, Coroutine, Iterator, Mapping
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from .db.stats import StatementCount, count_statements
+from .logging import get_logger
+from .metrics import query_budget_overruns
+
+logger = get_logger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when a block executed more SQL statements than its budget allows."""
+
+
+@dataclass(frozen=True, slots=True)
+class QueryBudget:
+    """Maximum number of SQL statements by kind, None for no limit."""
+
+    select: int | None = None
+    insert: int | None = None
+    update: int | None = None
+    delete: int | None = None
+    total: int | None = None
+
+    def limits(self) -> dict[str, int]:
+        """Get the limited kinds with their limits."""
+        return {kind: limit for kind, limit in asdict(self).items() if limit is not None}
+
+    def exceeded(self, statements: Mapping[str, int]) -> dict[str, int]:
+        """
+        Get the kinds executed more often than allowed.
+
+        Args:
+            statements: Number of executed statements by kind, as counted
+
+        Returns:
+            dict[str, int]: Executed number of statements of the exceeded kinds
+        """
+        executed = {kind.lower(): count for kind, count in statements.items()}
+        executed["total"] = sum(statements.values())
+        return {
+            kind: executed[kind]
+            for kind, limit in self.limits().items()
+            if executed.get(kind, 0) > limit
+        }
+
+
+def query_budget[**P, R](
+    **limits: int,
+) -> Callable[[Callable[P, Coroutine[Any, Any, R]]], Callable[P, Coroutine[Any, Any, R]]]:
+    """
+    Limit the SQL statements a handler executes, e.g. `@query_budget(select=1)`.
+
+    Calls over the budget are logged and counted in the metrics rather than
+    failed, the user still gets the answer. Statements of nested handlers
+    count towards the budget of the outer handler as well.
+    """
+    budget = QueryBudget(**limits)
+
+    def decorator(
+        handler: Callable[P, Coroutine[Any, Any, R]],
+    ) -> Callable[P, Coroutine[Any, Any, R]]:
+        name = handler.__name__
+        overruns = query_budget_overruns.labels(name)
+
+        @functools.wraps(handler)
+        async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            with count_statements() as count:
+                try:
+                    return await handler(*args, **kwargs)
+                finally:
+                    statements = count.by_kind()
+                    if budget.exceeded(statements):
+                        overruns.inc()
+                        logger.warning(
+                            "Query budget exceeded",
+                            handler=name,
+                            statements=statements,
+                            budget=budget.limits(),
+                        )
+
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def assert_query_budget(**limits: int) -> Iterator[StatementCount]:
+    """
+    Fail if the block executes more SQL statements than allowed.
+
+    Used by tests and benchmarks to lock in the statements of a code path:
+
+        with assert_query_budget(select=1, total=1):
+            await give_active_workout(update, context)
+
+    Raises:
+        QueryBudgetExceeded: If a limit is exceeded when the block exits
+    """
+    budget = QueryBudget(**limits)
+    with count_statements() as count:
+        yield count
+
+    statements = count.by_kind()
+    exceeded = budget.exceeded(statements)
+    if exceeded:
+        raise QueryBudgetExceeded(
+            f"Executed {exceeded} over the budget {budget.limits()}, statements: {statements}"
+        )
@@ -0,0 +1,313 @@
+import asyncio
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Coroutine
+from datetime import timedelta
+from typing import Any
+
+from telegram.error import BadRequest, NetworkError, RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from .logging import get_logger
+from .metrics import api_request_duration, api_request_errors
+
+logger = get_logger(__name__)
+
+JSONDict = dict[str, Any]
+APIResult = bool | JSONDict | list[JSONDict]
+MessageKey = tuple[int | str, int]
+
+# Edits are compared against the content last sent to the message
+SENT_CONTENT_CACHE_SIZE = 4096
+# Idle per-chat buckets are dropped every this many requests
+PRUNE_INTERVAL = 1024
+# First delay of the network error backoff, doubled on every retry
+NETWORK_RETRY_DELAY = 0.5
+
+EDIT_TEXT_ENDPOINT = "editMessageText"
+SEND_MESSAGE_ENDPOINT = "sendMessage"
+# Requests answered outside of the chat limits, they must not be delayed
+UNLIMITED_ENDPOINTS = frozenset({"answerCallbackQuery"})
+# Request parameters making up the displayed message content
+CONTENT_KEYS = ("text", "parse_mode", "entities", "link_preview_options", "reply_markup")
+
+
+class _TokenBucket:
+    """Token bucket that can additionally be blocked for a while by flood control."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated", "blocked_until")
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def delay(self, now: float) -> float:
+        """Seconds to wait until a token is available."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+        return max(wait, self.blocked_until - now)
+
+    def consume(self) -> None:
+        self.tokens -= 1
+
+    def block(self, now: float, seconds: float) -> None:
+        self.blocked_until = max(self.blocked_until, now + seconds)
+
+    def is_idle(self, now: float) -> bool:
+        return self.delay(now) == 0 and self.tokens >= self.capacity
+
+
+def _seconds(value: int | float | timedelta) -> float:
+    return value.total_seconds() if isinstance(value, timedelta) else float(value)
+
+
+def _is_idempotent(endpoint: str) -> bool:
+    return endpoint.startswith(("edit", "get", "delete")) or endpoint in UNLIMITED_ENDPOINTS
+
+
+class TelegramRateLimiter(BaseRateLimiter[int]):
+    """Rate limiter scheduling outgoing Bot API requests.
+
+    - Requests to a chat pass a global and a per-chat token bucket; group chats
+      use the slower group limit.
+    - Flood control (`RetryAfter`) blocks the affected bucket and the request is
+      retried, network errors of idempotent requests are retried with backoff.
+    - Text edits of the same message are coalesced: an edit still waiting for a
+      token is skipped once a newer edit of the message arrives.
+    - Edits repeating the content last sent to the message are skipped, and
+      "Message is not modified" errors are treated as success. The sent content
+      is remembered per process: with several bot instances editing the same
+      messages it can be stale, disable `skip_unchanged_edits` there.
+
+    Skipped edits return `True`, like edits of inline messages do.
+    `rate_limit_args` overrides the maximum number of retries of a request.
+    """
+
+    __slots__ = (
+        "_overall",
+        "_chat_rate",
+        "_chat_burst",
+        "_group_per_minute",
+        "_max_retries",
+        "_chats",
+        "_edit_generations",
+        "_skip_unchanged_edits",
+        "_sent_content",
+        "_requests",
+        "_edits",
+    )
+
+    def __init__(
+        self,
+        overall_per_second: float = 30,
+        chat_per_second: float = 1,
+        chat_burst: int = 5,
+        group_per_minute: float = 20,
+        max_retries: int = 3,
+        skip_unchanged_edits: bool = True,
+    ) -> None:
+        """
+        Initialize the rate limiter.
+
+        Args:
+            overall_per_second: Requests per second to all chats
+            chat_per_second: Requests per second to a private chat
+            chat_burst: Requests a private chat can receive at once
+            group_per_minute: Requests per minute to a group chat
+            max_retries: Retries of a request failed with flood control or network errors
+            skip_unchanged_edits: Skip edits repeating the content last sent to the message
+        """
+        self._overall = _TokenBucket(overall_per_second, overall_per_second)
+        self._chat_rate = chat_per_second
+        self._chat_burst = chat_burst
+        self._group_per_minute = group_per_minute
+        self._max_retries = max_retries
+        self._skip_unchanged_edits = skip_unchanged_edits
+        self._chats: dict[int | str, _TokenBucket] = {}
+        self._edit_generations: dict[MessageKey, int] = {}
+        self._sent_content: OrderedDict[MessageKey, tuple[Any, ...]] = OrderedDict()
+        self._requests = 0
+        self._edits = 0
+
+    async def initialize(self) -> None:
+        """Nothing to initialize."""
+
+    async def shutdown(self) -> None:
+        """Nothing to shut down."""
+
+    def _chat_bucket(self, chat_id: int | str) -> _TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if isinstance(chat_id, str) or chat_id < 0:
+                per_second = self._group_per_minute / 60
+                bucket = _TokenBucket(per_second, self._group_per_minute)
+            else:
+                bucket = _TokenBucket(self._chat_rate, self._chat_burst)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        for chat_id in [c for c, bucket in self._chats.items() if bucket.is_idle(now)]:
+            del self._chats[chat_id]
+
+    async def _acquire(
+        self, chat_id: int | str | None, superseded: Callable[[], bool] | None
+    ) -> bool:
+        """Wait for tokens, returns False if the request was superseded meanwhile."""
+        if chat_id is None:
+            return True
+        chat = self._chat_bucket(chat_id)
+        while True:
+            now = time.monotonic()
+            delay = max(self._overall.delay(now), chat.delay(now))
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+            if superseded is not None and superseded():
+                return False
+        self._overall.consume()
+        chat.consume()
+        return True
+
+    def _remember_content(self, key: MessageKey, content: tuple[Any, ...]) -> None:
+        if not self._skip_unchanged_edits:
+            return
+        self._sent_content[key] = content
+        self._sent_content.move_to_end(key)
+        if len(self._sent_content) > SENT_CONTENT_CACHE_SIZE:
+            self._sent_content.popitem(last=False)
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, APIResult]],
+        args: Any,
+        kwargs: dict[str, Any],
+        endpoint: str,
+        data: dict[str, Any],
+        rate_limit_args: int | None,
+    ) -> APIResult:
+        """Send the request respecting the rate limits."""
+        self._requests += 1
+        if self._requests % PRUNE_INTERVAL == 0:
+            self._prune()
+
+        chat_id = data.get("chat_id") if endpoint not in UNLIMITED_ENDPOINTS else None
+        message_id = data.get("message_id")
+        if endpoint != EDIT_TEXT_ENDPOINT or chat_id is None or message_id is None:
+            result = await self._send(callback, args, kwargs, endpoint, chat_id, rate_limit_args)
+            if (
+                endpoint == SEND_MESSAGE_ENDPOINT
+                and chat_id is not None
+                and isinstance(result, dict)
+            ):
+                self._remember_content((chat_id, result["message_id"]), _edit_content(data))
+            return result
+
+        key = (chat_id, message_id)
+        content = _edit_content(data)
+        self._edits += 1
+        generation = self._edits
+        self._edit_generations[key] = generation
+        try:
+            if not await self._acquire(
+                chat_id, lambda: self._edit_generations.get(key) != generation
+            ):
+                logger.debug("Skipped superseded edit", chat_id=chat_id, message_id=message_id)
+                return True
+            if self._sent_content.get(key) == content:
+                logger.debug("Skipped unchanged edit", chat_id=chat_id, message_id=message_id)
+                return True
+
+            try:
+                result = await self._send(
+                    callback, args, kwargs, endpoint, chat_id, rate_limit_args, acquired=True
+                )
+            except BadRequest as e:
+                if "Message is not modified" not in e.message:
+                    self._sent_content.pop(key, None)
+                    raise
+                result = True
+            except BaseException:
+                # The message may or may not have been changed
+                self._sent_content.pop(key, None)
+                raise
+            self._remember_content(key, content)
+            return result
+        finally:
+            if self._edit_generations.get(key) == generation:
+                del self._edit_generations[key]
+
+    async def _send(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, APIResult]],
+        args: Any,
+        kwargs: dict[str, Any],
+        endpoint: str,
+        chat_id: int | str | None,
+        rate_limit_args: int | None,
+        acquired: bool = False,
+    ) -> APIResult:
+        """Send the request, retrying on flood control and network errors."""
+        max_retries = self._max_retries if rate_limit_args is None else rate_limit_args
+        attempt = 0
+        while True:
+            if not acquired:
+                await self._acquire(chat_id, None)
+            acquired = False
+            try:
+                return await _timed_request(callback, args, kwargs, endpoint)
+            except RetryAfter as e:
+                if attempt >= max_retries:
+                    raise
+                retry_after = _seconds(e.retry_after)
+                bucket = self._overall if chat_id is None else self._chat_bucket(chat_id)
+                bucket.block(time.monotonic(), retry_after)
+                logger.warning(
+                    "Flood control exceeded",
+                    endpoint=endpoint,
+                    chat_id=chat_id,
+                    retry_after=retry_after,
+                )
+                if chat_id is None:
+                    await asyncio.sleep(retry_after)
+            except BadRequest:
+                raise
+            except NetworkError as e:
+                if attempt >= max_retries or not _is_idempotent(endpoint):
+                    raise
+                delay = NETWORK_RETRY_DELAY * 2**attempt
+                logger.warning(
+                    "Retrying request after network error",
+                    endpoint=endpoint,
+                    error=str(e),
+                    delay=delay,
+                )
+                await asyncio.sleep(delay)
+            attempt += 1
+
+
+async def _timed_request(
+    callback: Callable[..., Coroutine[Any, Any, APIResult]],
+    args: Any,
+    kwargs: dict[str, Any],
+    endpoint: str,
+) -> APIResult:
+    """Send the request once, recording its latency and errors."""
+    started = time.perf_counter()
+    try:
+        return await callback(*args, **kwargs)
+    except Exception as e:
+        api_request_errors.labels(endpoint, type(e).__name__).inc()
+        raise
+    finally:
+        api_request_duration.labels(endpoint).observe(time.perf_counter() - started)
+
+
+def _edit_content(data: dict[str, Any]) -> tuple[Any, ...]:
+    """Get the displayed content of a message send or text edit request."""
+    return tuple(data.get(key) for key in CONTENT_KEYS)
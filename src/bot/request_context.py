@@ -0,0 +1,108 @@
+import functools
+from collections.abc import Callable, Coroutine
+from contextvars import ContextVar
+from typing import Any, Concatenate
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from .db.database import async_session
+from .db.enrollment_cache import enrollment_cache
+from .db.repositories import Enrollment, TrainingRepository
+
+_UNLOADED: Any = object()
+
+
+class RequestContext:
+    """State shared by the handler and helpers processing one update.
+
+    The database session is opened on first use and closed when the handler
+    returns. The enrollment of the user is taken from the enrollment cache,
+    loaded on a miss, and memoized for the update. Handlers changing it
+    write the new enrollment through with `set_enrollment()`, and drop one
+    the database disagrees with using `discard_enrollment()`.
+    """
+
+    __slots__ = ("user_id", "_session", "_enrollment")
+
+    def __init__(self, user_id: int) -> None:
+        self.user_id = user_id
+        self._session: AsyncSession | None = None
+        self._enrollment: Enrollment | None = _UNLOADED
+
+    async def session(self) -> AsyncSession:
+        """Get the database session of the update."""
+        if self._session is None:
+            self._session = async_session()
+        return self._session
+
+    async def enrollment(self) -> Enrollment | None:
+        """Get unfinished program of the user and its progress, None if there is none."""
+        if self._enrollment is _UNLOADED:
+            self._enrollment = await enrollment_cache.get_or_load(
+                self.user_id, self._load_enrollment
+            )
+        return self._enrollment
+
+    async def _load_enrollment(self) -> Enrollment | None:
+        session = await self.session()
+        enrollment = await TrainingRepository(session).get_enrollment(self.user_id)
+        # Return the connection to the pool before the handler talks to Telegram
+        await session.commit()
+        return enrollment
+
+    def set_enrollment(self, enrollment: Enrollment | None) -> None:
+        """Store the enrollment changed by the handler for this and later updates."""
+        self._enrollment = enrollment
+        enrollment_cache.set(self.user_id, enrollment)
+
+    def discard_enrollment(self) -> None:
+        """Drop the enrollment found stale, it is loaded again on next access."""
+        self._enrollment = _UNLOADED
+        enrollment_cache.discard(self.user_id)
+
+    async def close(self) -> None:
+        """Close the database session, if it was opened."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+_request_context: ContextVar[RequestContext | None] = ContextVar("request_context", default=None)
+
+
+def get_request_context() -> RequestContext:
+    """Get context of the update being processed."""
+    request = _request_context.get()
+    if request is None:
+        raise RuntimeError("No request context, the handler must use @with_request_context")
+    return request
+
+
+def with_request_context[**P, R](
+    handler: Callable[Concatenate[Update, ContextTypes.DEFAULT_TYPE, P], Coroutine[Any, Any, R]],
+) -> Callable[Concatenate[Update, ContextTypes.DEFAULT_TYPE, P], Coroutine[Any, Any, R]]:
+    """
+    Run the handler within a request context of its update.
+
+    Handlers called by another decorated handler share the context of the
+    outermost one, which closes it.
+    """
+
+    @functools.wraps(handler)
+    async def wrapper(
+        update: Update, context: ContextTypes.DEFAULT_TYPE, *args: P.args, **kwargs: P.kwargs
+    ) -> R:
+        if _request_context.get() is not None:
+            return await handler(update, context, *args, **kwargs)
+
+        request = RequestContext(update.effective_user.id)
+        token = _request_context.set(request)
+        try:
+            return await handler(update, context, *args, **kwargs)
+        finally:
+            _request_context.reset(token)
+            await request.close()
+
+    return wrapper
@@ -0,0 +1,98 @@
+from collections.abc import Iterable
+from typing import Any, NoReturn
+
+from telegram import Update
+from telegram.ext import (
+    Application,
+    ApplicationHandlerStop,
+    BaseHandler,
+    CallbackQueryHandler,
+    CommandHandler,
+    ConversationHandler,
+    filters,
+)
+
+from .handlers.routing import CallbackRouter
+from .logging import get_logger
+
+logger = get_logger(__name__)
+
+# Update types a message-based handler may accept when its filters are unknown
+MESSAGE_UPDATE_TYPES = (
+    Update.MESSAGE,
+    Update.EDITED_MESSAGE,
+    Update.CHANNEL_POST,
+    Update.EDITED_CHANNEL_POST,
+    Update.BUSINESS_MESSAGE,
+    Update.EDITED_BUSINESS_MESSAGE,
+)
+
+# Group checked before all other handlers
+UPDATE_FILTER_GROUP = -1
+
+
+def _handler_update_types(handler: BaseHandler[Any, Any, Any]) -> Iterable[str]:
+    """Get update types the handler may accept."""
+    if isinstance(handler, ConversationHandler):
+        nested = [*handler.entry_points, *handler.fallbacks]
+        for state_handlers in handler.states.values():
+            nested.extend(state_handlers)
+        return {update_type for h in nested for update_type in _handler_update_types(h)}
+    if isinstance(handler, CallbackQueryHandler | CallbackRouter):
+        return (Update.CALLBACK_QUERY,)
+    if isinstance(handler, CommandHandler):
+        if handler.filters is filters.UpdateType.MESSAGES:
+            return (Update.MESSAGE, Update.EDITED_MESSAGE)
+        return MESSAGE_UPDATE_TYPES
+    # Unknown handler types may accept anything
+    return Update.ALL_TYPES
+
+
+def get_allowed_updates(handlers: Iterable[BaseHandler[Any, Any, Any]]) -> list[str]:
+    """Get update types accepted by at least one of the handlers."""
+    allowed = {update_type for h in handlers for update_type in _handler_update_types(h)}
+    # Keep Telegram's order for stable API calls and logs
+    return [update_type for update_type in Update.ALL_TYPES if update_type in allowed]
+
+
+class UnhandledUpdateFilter(BaseHandler[Update, Any, NoReturn]):
+    """Handler stopping updates of types no registered handler accepts.
+
+    Registered in a group before all other handlers, so dropped updates never
+    reach conversation handler matching. Accepted updates cost a few attribute
+    checks and do not build a callback context.
+    """
+
+    __slots__ = ("allowed_updates",)
+
+    def __init__(self, allowed_updates: Iterable[str]) -> None:
+        super().__init__(self._drop)
+        self.allowed_updates = tuple(allowed_updates)
+
+    def check_update(self, update: object) -> bool:
+        """Match updates that carry none of the allowed update types."""
+        if not isinstance(update, Update):
+            return False
+        return all(getattr(update, update_type) is None for update_type in self.allowed_updates)
+
+    @staticmethod
+    async def _drop(update: Update, context: Any) -> NoReturn:
+        logger.debug("Dropped unhandled update", update_id=update.update_id)
+        raise ApplicationHandlerStop
+
+
+def install_update_filter(application: Application) -> list[str]:
+    """
+    Compute update types of the registered handlers and drop all other updates.
+
+    Must be called after all handlers are registered.
+
+    Returns:
+        list[str]: Update types to request from Telegram
+    """
+    allowed_updates = get_allowed_updates(
+        handler for handlers in application.handlers.values() for handler in handlers
+    )
+    application.add_handler(UnhandledUpdateFilter(allowed_updates), group=UPDATE_FILTER_GROUP)
+    logger.info("Allowed updates computed", allowed_updates=allowed_updates)
+    return allowed_updates
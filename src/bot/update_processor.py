@@ -0,0 +1,89 @@
+import asyncio
+from collections.abc import Awaitable
+from typing import Any
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from .metrics import track_update
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Update processor running different users' updates concurrently.
+
+    Updates of the same user are processed strictly one after another in arrival
+    order, so conversation states and the active bot message stay consistent.
+    An update waiting for an earlier update of its user does not occupy one of
+    the `max_running_updates` slots, so a single busy user cannot stall others.
+    """
+
+    __slots__ = ("_max_running_updates", "_running", "_user_locks", "_user_pending")
+
+    def __init__(self, max_running_updates: int, max_pending_updates: int) -> None:
+        """
+        Initialize the processor.
+
+        Args:
+            max_running_updates: Maximum number of handlers running at the same time
+            max_pending_updates: Maximum number of updates accepted for processing,
+                including updates waiting for an earlier update of the same user
+        """
+        if max_running_updates < 1:
+            raise ValueError("`max_running_updates` must be a positive integer")
+        if max_pending_updates < max_running_updates:
+            raise ValueError("`max_pending_updates` must not be less than `max_running_updates`")
+
+        super().__init__(max_pending_updates)
+        self._max_running_updates = max_running_updates
+        self._running = asyncio.Semaphore(max_running_updates)
+        self._user_locks: dict[int, asyncio.Lock] = {}
+        self._user_pending: dict[int, int] = {}
+
+    @property
+    def max_running_updates(self) -> int:
+        """Maximum number of handlers running at the same time."""
+        return self._max_running_updates
+
+    @staticmethod
+    def _ordering_key(update: object) -> int | None:
+        """Get the id whose updates must be processed in order."""
+        if not isinstance(update, Update):
+            return None
+        if update.effective_user:
+            return update.effective_user.id
+        if update.effective_chat:
+            return update.effective_chat.id
+        return None
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        """Process the update after all earlier updates of the same user."""
+        key = self._ordering_key(update)
+        if key is None:
+            async with self._running:
+                with track_update():
+                    await coroutine
+            return
+
+        lock = self._user_locks.get(key)
+        if lock is None:
+            lock = self._user_locks[key] = asyncio.Lock()
+        self._user_pending[key] = self._user_pending.get(key, 0) + 1
+
+        try:
+            async with lock, self._running:
+                with track_update():
+                    await coroutine
+        finally:
+            # Drop the lock with the last pending update to keep memory bounded
+            pending = self._user_pending[key] - 1
+            if pending:
+                self._user_pending[key] = pending
+            else:
+                del self._user_pending[key]
+                del self._user_locks[key]
+
+    async def initialize(self) -> None:
+        """Nothing to initialize."""
+
+    async def shutdown(self) -> None:
+        """Nothing to shut down, pending updates are awaited by the application."""
@@ -1,10 +1,15 @@
-from dataclasses import asdict, dataclass, field
+from collections.abc import Mapping
+from copy import deepcopy
+from dataclasses import dataclass
 from typing import Any, Self
 
 from telegram.ext import CallbackContext
 
+# Key of the user state object in context.user_data
+STATE_KEY = "state_obj"
 
-@dataclass(frozen=True)
+
+@dataclass(frozen=True, slots=True)
 class BotMessage:
     """Represents a bot message that will be updated."""
 
@@ -12,18 +17,96 @@ class BotMessage:
     message_id: int
 
 
-@dataclass
 class UserState:
-    """Data structure for storing user state."""
+    """Data structure for storing user state.
+
+    Instances live directly in `context.user_data` and are mutated in place.
+    Mutations must be followed by `mark_dirty()` (UserDataManager does this) so
+    that the cached serialized form is rebuilt on the next `to_dict()` call.
+    """
+
+    __slots__ = ("bot_message", "state", "data", "_serialized")
+
+    def __init__(
+        self,
+        bot_message: BotMessage | None = None,
+        state: str = "initial",
+        data: dict[str, Any] | None = None,
+    ) -> None:
+        self.bot_message = bot_message
+        self.state = state
+        self.data: dict[str, Any] = data if data is not None else {}
+        self._serialized: dict[str, Any] | None = None
+
+    def __deepcopy__(self, memo: dict[int, Any]) -> "UserState":
+        # The application deep-copies user data before handing it to persistence.
+        # BotMessage is immutable and the serialized form is replaced rather than
+        # mutated, so both can be shared with the copy.
+        copy = UserState.__new__(UserState)
+        copy.bot_message = self.bot_message
+        copy.state = self.state
+        copy.data = deepcopy(self.data, memo)
+        copy._serialized = self._serialized
+        return copy
+
+    @property
+    def dirty(self) -> bool:
+        """Whether the state changed since it was last serialized."""
+        return self._serialized is None
+
+    def mark_dirty(self) -> None:
+        """Invalidate the cached serialized form after a mutation."""
+        self._serialized = None
+
+    def to_dict(self) -> dict[str, Any]:
+        """Serialize the state, reusing the previous result if nothing changed."""
+        if self._serialized is None:
+            bot_message = self.bot_message
+            self._serialized = {
+                "bot_message": (
+                    {"chat_id": bot_message.chat_id, "message_id": bot_message.message_id}
+                    if bot_message
+                    else None
+                ),
+                "state": self.state,
+                "data": dict(self.data),
+            }
+        return self._serialized
+
+    @classmethod
+    def from_dict(cls, state_dict: Mapping[str, Any]) -> Self:
+        """Restore the state from its serialized form."""
+        bot_message_dict = state_dict.get("bot_message")
+        bot_message = None
+        if bot_message_dict and isinstance(bot_message_dict, dict):
+            try:
+                bot_message = BotMessage(
+                    chat_id=bot_message_dict.get("chat_id", 0),
+                    message_id=bot_message_dict.get("message_id", 0),
+                )
+            except (TypeError, ValueError):
+                bot_message = None
+
+        return cls(
+            bot_message=bot_message,
+            state=state_dict.get("state", "initial"),
+            data=dict(state_dict.get("data") or {}),
+        )
+
 
-    bot_message: BotMessage | None = None
-    state: str = "initial"
-    data: dict[str, Any] = field(default_factory=dict)
+def dump_user_data(user_data: Mapping[str, Any]) -> dict[str, Any]:
+    """Convert user data into a JSON-compatible dict for persistence."""
+    return {
+        key: value.to_dict() if isinstance(value, UserState) else value
+        for key, value in user_data.items()
+    }
 
 
 class UserDataManager:
     """Manages user data with an abstraction over the telegram context."""
 
+    __slots__ = ("context", "_state")
+
     def __init__(self, context: CallbackContext) -> None:
         """
         Initialize the user data manager.
@@ -33,9 +116,12 @@ class UserDataManager:
         """
         self.context = context
 
-        # Initialize state from user_data or create a new one
-        if not context.user_data.get("state_obj"):
-            context.user_data["state_obj"] = asdict(UserState())
+        # Use the stored state object, restoring it from persisted data if needed
+        state = context.user_data.get(STATE_KEY)
+        if not isinstance(state, UserState):
+            state = UserState.from_dict(state) if state else UserState()
+            context.user_data[STATE_KEY] = state
+        self._state: UserState = state
 
     def get_state(self) -> UserState:
         """
@@ -44,23 +130,7 @@ class UserDataManager:
         Returns:
             UserState: Object with user state
         """
-        state_dict = self.context.user_data["state_obj"]
-
-        # Process the nested BotMessage object
-        bot_message_dict = state_dict.get("bot_message")
-        bot_message = None
-        if bot_message_dict and isinstance(bot_message_dict, dict):
-            try:
-                bot_message = BotMessage(
-                    chat_id=bot_message_dict.get("chat_id", 0),
-                    message_id=bot_message_dict.get("message_id", 0),
-                )
-            except (TypeError, ValueError):
-                bot_message = None
-
-        return UserState(
-            bot_message=bot_message, state=state_dict["state"], data=state_dict["data"]
-        )
+        return self._state
 
     def save_state(self, state: UserState) -> None:
         """
@@ -69,8 +139,9 @@ class UserDataManager:
         Args:
             state: Updated user state
         """
-        state_dict = asdict(state)
-        self.context.user_data["state_obj"] = state_dict
+        state.mark_dirty()
+        self._state = state
+        self.context.user_data[STATE_KEY] = state
 
     def update_state(self, *, state: str | None = None, **data_updates: Any) -> Self:
         """
@@ -83,7 +154,7 @@ class UserDataManager:
         Returns:
             Self: Returns self for method chaining
         """
-        current_state = self.get_state()
+        current_state = self._state
 
         if state is not None:
             current_state.state = state
@@ -91,7 +162,7 @@ class UserDataManager:
         if data_updates:
             current_state.data.update(data_updates)
 
-        self.save_state(current_state)
+        current_state.mark_dirty()
         return self
 
     def update_message(self, chat_id: int, message_id: int) -> Self:
@@ -105,9 +176,11 @@ class UserDataManager:
         Returns:
             Self: Returns self for method chaining
         """
-        state = self.get_state()
-        state.bot_message = BotMessage(chat_id=chat_id, message_id=message_id)
-        self.save_state(state)
+        state = self._state
+        current = state.bot_message
+        if current is None or current.chat_id != chat_id or current.message_id != message_id:
+            state.bot_message = BotMessage(chat_id=chat_id, message_id=message_id)
+            state.mark_dirty()
         return self
 
     def get_active_message(self) -> BotMessage | None:
@@ -117,7 +190,7 @@ class UserDataManager:
         Returns:
             Optional[BotMessage]: Message information or None if no message exists yet
         """
-        return self.get_state().bot_message
+        return self._state.bot_message
 
     def clear_data(self, keys: list[str] | None = None) -> Self:
         """
@@ -129,7 +202,7 @@ class UserDataManager:
         Returns:
             Self: Returns self for method chaining
         """
-        state = self.get_state()
+        state = self._state
 
         if keys is None:
             state.data.clear()
@@ -137,5 +210,5 @@ class UserDataManager:
             for key in keys:
                 state.data.pop(key, None)
 
-        self.save_state(state)
+        state.mark_dirty()
         return self
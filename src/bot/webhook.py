@@ -0,0 +1,127 @@
+import asyncio
+import hmac
+from collections.abc import AsyncIterator, Sequence
+from contextlib import asynccontextmanager
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+from starlette.routing import Route
+from telegram import Update
+from telegram.ext import Application
+
+from .config import Settings
+from .logging import get_logger
+
+logger = get_logger(__name__)
+
+SECRET_TOKEN_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+@asynccontextmanager
+async def application_lifespan(
+    application: Application, settings: Settings, allowed_updates: Sequence[str] | None
+) -> AsyncIterator[None]:
+    """Run the application for the lifetime of the webhook server.
+
+    On exit the accepted updates are processed, bounded by the drain timeout,
+    before the application is stopped.
+    """
+    async with application:
+        if application.post_init:
+            await application.post_init(application)
+        if settings.WEBHOOK_URL:
+            await application.bot.set_webhook(
+                url=settings.WEBHOOK_URL.rstrip("/") + settings.WEBHOOK_PATH,
+                secret_token=settings.WEBHOOK_SECRET_TOKEN,
+                allowed_updates=allowed_updates,
+                max_connections=settings.WEBHOOK_MAX_CONNECTIONS,
+            )
+        await application.start()
+        logger.info(
+            "Webhook server started",
+            host=settings.WEBHOOK_HOST,
+            port=settings.WEBHOOK_PORT,
+            path=settings.WEBHOOK_PATH,
+        )
+
+        yield
+
+        try:
+            await asyncio.wait_for(application.update_queue.join(), settings.WEBHOOK_DRAIN_TIMEOUT)
+        except TimeoutError:
+            logger.warning(
+                "Timed out processing accepted updates",
+                pending=application.update_queue.qsize(),
+            )
+        await application.stop()
+        if application.post_stop:
+            await application.post_stop(application)
+        logger.info("Webhook server stopped")
+
+
+def create_webhook_app(
+    application: Application, settings: Settings, allowed_updates: Sequence[str] | None = None
+) -> Starlette:
+    """
+    Create an ASGI app feeding webhook updates to the application.
+
+    The application runs in the app lifespan, so it is stopped only after the
+    server stopped accepting requests.
+
+    Args:
+        application: Bot application
+        settings: Application settings
+        allowed_updates: Update types registered with the webhook
+    """
+    secret_token = settings.WEBHOOK_SECRET_TOKEN.encode() if settings.WEBHOOK_SECRET_TOKEN else None
+    accepted_types = frozenset(allowed_updates) if allowed_updates is not None else None
+
+    async def handle_update(request: Request) -> Response:
+        if secret_token is not None and not hmac.compare_digest(
+            request.headers.get(SECRET_TOKEN_HEADER, "").encode(), secret_token
+        ):
+            return Response(status_code=403)
+
+        try:
+            payload = await request.json()
+            # Skip decoding updates of types no handler accepts
+            if accepted_types is not None and accepted_types.isdisjoint(payload):
+                return Response()
+            update = Update.de_json(payload, application.bot)
+        except (ValueError, TypeError, KeyError, AttributeError):
+            return Response(status_code=400)
+
+        await application.update_queue.put(update)
+        return Response()
+
+    async def health(request: Request) -> Response:
+        if not application.running:
+            return PlainTextResponse("stopped", status_code=503)
+        return PlainTextResponse("ok")
+
+    return Starlette(
+        routes=[
+            Route(settings.WEBHOOK_PATH, handle_update, methods=["POST"]),
+            Route("/healthz", health, methods=["GET"]),
+        ],
+        lifespan=lambda app: application_lifespan(application, settings, allowed_updates),
+    )
+
+
+async def run_webhook(
+    application: Application, settings: Settings, allowed_updates: Sequence[str] | None = None
+) -> None:
+    """Serve webhook updates until the process receives a termination signal."""
+    server = uvicorn.Server(
+        uvicorn.Config(
+            create_webhook_app(application, settings, allowed_updates),
+            host=settings.WEBHOOK_HOST,
+            port=settings.WEBHOOK_PORT,
+            lifespan="on",
+            access_log=False,
+            log_config=None,
+        )
+    )
+    await server.serve()
@@ -0,0 +1,75 @@
+import os
+import tempfile
+from collections.abc import AsyncIterator, Iterator
+from pathlib import Path
+
+import pytest
+
+# Settings are read when the bot modules are imported, configure the test
+# database before that. Tests use SQLite in a temporary directory. With
+# TEST_POSTGRES_DB set they use that PostgreSQL database instead, connected
+# with the other TEST_POSTGRES_* variables, e.g. of a throwaway container.
+# Its tables are created and dropped by the tests.
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="bot-tests-")
+os.environ["CATALOG_SNAPSHOT"] = ""
+if os.environ.get("TEST_POSTGRES_DB"):
+    os.environ["DB_BACKEND"] = "postgresql"
+    for name in ("HOST", "PORT", "USER", "PASSWORD", "DB"):
+        if f"TEST_POSTGRES_{name}" in os.environ:
+            os.environ[f"POSTGRES_{name}"] = os.environ[f"TEST_POSTGRES_{name}"]
+else:
+    os.environ["DB_BACKEND"] = "sqlite"
+
+from alembic import command  # noqa: E402
+from alembic.config import Config  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession  # noqa: E402
+
+from bot.db.database import async_session, engine  # noqa: E402
+from bot.db.models import Base, TrainingProgram, Workout  # noqa: E402
+
+ROOT = Path(__file__).parent.parent
+
+
+@pytest.fixture(scope="session")
+def database() -> Iterator[None]:
+    """Create the schema with the migrations, and drop it with them after the tests."""
+    config = Config(ROOT / "alembic.ini")
+    config.set_main_option("script_location", str(ROOT / "migrations"))
+    command.upgrade(config, "head")
+    yield
+    command.downgrade(config, "base")
+
+
+@pytest.fixture
+async def session(database: None) -> AsyncIterator[AsyncSession]:
+    """Get a database session, all rows are deleted after the test."""
+    async with async_session() as session:
+        yield session
+
+    async with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            await conn.execute(table.delete())
+    # Pooled connections belong to the event loop of the test
+    await engine.dispose()
+
+
+@pytest.fixture
+async def program(session: AsyncSession) -> tuple[int, list[int]]:
+    """Create a program of three workouts, return its id and the ids of its workouts by order."""
+    program = TrainingProgram(name="Base", description="Base program")
+    session.add(program)
+    await session.flush()
+    workouts = [
+        Workout(
+            program_id=program.id,
+            order=order,
+            description=f"Workout {order}",
+            plan="plan",
+            warmup="warmup",
+            final_message="done",
+        )
+        for order in range(1, 4)
+    ]
+    session.add_all(workouts)
+    await session.commit()
+    return program.id, [workout.id for workout in workouts]
@@ -0,0 +1,29 @@
+import pytest
+from pydantic import ValidationError
+
+from bot.config import (
+    POSTGRES_MAX_CONCURRENT_UPDATES,
+    SQLITE_MAX_CONCURRENT_UPDATES,
+    Settings,
+)
+
+
+def test_persistence_requires_single_instance() -> None:
+    with pytest.raises(ValidationError, match="BOT_INSTANCES=1"):
+        Settings(BOT_INSTANCES=2)
+
+    settings = Settings(BOT_INSTANCES=2, PERSISTENCE_ENABLED=False)
+    assert not settings.PERSISTENCE_ENABLED
+
+
+def test_enrollment_cache_requires_single_instance() -> None:
+    assert Settings().enrollment_cache_size == Settings().ENROLLMENT_CACHE_SIZE
+    assert Settings(BOT_INSTANCES=2, PERSISTENCE_ENABLED=False).enrollment_cache_size == 0
+
+
+def test_concurrent_updates_default_by_backend() -> None:
+    assert Settings(DB_BACKEND="sqlite").max_concurrent_updates == SQLITE_MAX_CONCURRENT_UPDATES
+    assert (
+        Settings(DB_BACKEND="postgresql").max_concurrent_updates == POSTGRES_MAX_CONCURRENT_UPDATES
+    )
+    assert Settings(DB_BACKEND="sqlite", MAX_CONCURRENT_UPDATES=16).max_concurrent_updates == 16
@@ -0,0 +1,241 @@
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+import pytest
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from sqlalchemy import Connection, Table, event, insert, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.config import get_settings
+from bot.db.database import dialect_insert, engine
+from bot.db.models import Base, UserWorkout
+from bot.db.models.training import UserTrainingProgram, Workout
+from bot.db.repositories import TrainingRepository, UserRepository
+from bot.db.stats import count_statements
+from bot.persistence import DatabasePersistence
+
+# Telegram user ids do not fit into 32 bits
+USER_ID = 7_000_000_001
+
+
+def index_name(table: Any, *columns: str) -> str:
+    """Get the name of the model's index on exactly these columns."""
+    assert isinstance(table, Table)
+    for index in table.indexes:
+        if tuple(column.name for column in index.columns) == columns:
+            return str(index.name)
+    raise LookupError(f"No index on {table.name} {columns}")
+
+
+WORKOUT_INDEX = index_name(Workout.__table__, "program_id", "order")
+ENROLLMENT_INDEX = index_name(UserTrainingProgram.__table__, "user_id")
+
+type Lookup = Callable[[AsyncSession, int], Awaitable[object]]
+
+
+async def test_migrations_match_models(session: AsyncSession) -> None:
+    def compare(connection: Connection) -> list[object]:
+        context = MigrationContext.configure(connection, opts={"compare_type": True})
+        return compare_metadata(context, Base.metadata)
+
+    connection = await session.connection()
+    assert await connection.run_sync(compare) == []
+
+
+async def test_get_or_create_user(session: AsyncSession) -> None:
+    users = UserRepository(session)
+
+    created = await users.get_or_create_user(USER_ID, "runner", "Run", None, "en")
+    found = await users.get_or_create_user(USER_ID, "other", "Other", None, None)
+
+    assert found.id == created.id == USER_ID
+    assert found.username == "runner"
+
+
+async def test_program_progress(session: AsyncSession, program: tuple[int, list[int]]) -> None:
+    await UserRepository(session).get_or_create_user(USER_ID, None, "Run", None, None)
+    program_id, workout_ids = program
+    training = TrainingRepository(session)
+
+    enrollment = await training.start_program(USER_ID, program_id)
+    assert await training.get_enrollment(USER_ID) == enrollment
+    assert (enrollment.next_workout_order, enrollment.completed_workouts) == (1, 0)
+
+    enrollment = await training.finish_workout(USER_ID, enrollment, workout_ids[0], 1)
+    assert (enrollment.next_workout_order, enrollment.completed_workouts) == (2, 1)
+    assert await training.get_enrollment(USER_ID) == enrollment
+
+    await training.end_program(enrollment)
+    assert await training.get_enrollment(USER_ID) is None
+
+
+async def test_single_unfinished_program(
+    session: AsyncSession, program: tuple[int, list[int]]
+) -> None:
+    await UserRepository(session).get_or_create_user(USER_ID, None, "Run", None, None)
+    program_id, _ = program
+    training = TrainingRepository(session)
+    started = await training.start_program(USER_ID, program_id)
+
+    assert await training.start_program(USER_ID, program_id) is None
+    assert await training.get_enrollment(USER_ID) == started
+
+
+async def test_finish_workout_ignores_stale_button(
+    session: AsyncSession, program: tuple[int, list[int]]
+) -> None:
+    await UserRepository(session).get_or_create_user(USER_ID, None, "Run", None, None)
+    program_id, workout_ids = program
+    training = TrainingRepository(session)
+    started = await training.start_program(USER_ID, program_id)
+    finished = await training.finish_workout(USER_ID, started, workout_ids[0], 1)
+
+    # The button of the first workout tapped again, and one of a later workout
+    assert await training.finish_workout(USER_ID, started, workout_ids[0], 1) is None
+    assert await training.finish_workout(USER_ID, started, workout_ids[2], 3) is None
+
+    assert await training.get_enrollment(USER_ID) == finished
+    finished_workouts = await session.scalars(select(UserWorkout.workout_id))
+    assert finished_workouts.all() == [workout_ids[0]]
+
+
+async def test_persistence_upserts_state(session: AsyncSession) -> None:
+    persistence = DatabasePersistence(flush_delay=0)
+
+    await persistence.update_user_data(USER_ID, {"step": 1})
+    await persistence.update_conversation("main", (USER_ID, USER_ID), 1)
+    await persistence.flush()
+    await persistence.update_user_data(USER_ID, {"step": 2})
+    await persistence.update_conversation("main", (USER_ID, USER_ID), 2)
+    await persistence.flush()
+
+    assert await persistence.get_user_data() == {USER_ID: {"step": 2}}
+    assert await persistence.get_conversations("main") == {(USER_ID, USER_ID): 2}
+
+    await persistence.drop_user_data(USER_ID)
+    await persistence.update_conversation("main", (USER_ID, USER_ID), None)
+    await persistence.flush()
+
+    assert await persistence.get_user_data() == {}
+    assert await persistence.get_conversations("main") == {}
+
+
+async def workout_by_position(session: AsyncSession, program_id: int) -> object:
+    return await session.execute(
+        select(Workout).where(Workout.program_id == program_id, Workout.order == 1)
+    )
+
+
+async def program_workouts(session: AsyncSession, program_id: int) -> object:
+    return await session.execute(
+        select(Workout).where(Workout.program_id == program_id).order_by(Workout.order)
+    )
+
+
+async def catalog_workouts(session: AsyncSession, program_id: int) -> object:
+    return await session.execute(select(Workout).order_by(Workout.program_id, Workout.order))
+
+
+async def enrollment(session: AsyncSession, program_id: int) -> object:
+    return await TrainingRepository(session).get_enrollment(USER_ID)
+
+
+@pytest.mark.skipif(not get_settings().is_sqlite, reason="EXPLAIN QUERY PLAN of SQLite")
+@pytest.mark.parametrize(
+    ("lookup", "expected"),
+    [
+        (
+            workout_by_position,
+            f"SEARCH workouts USING INDEX {WORKOUT_INDEX} (program_id=? AND order=?)",
+        ),
+        (program_workouts, f"SEARCH workouts USING INDEX {WORKOUT_INDEX} (program_id=?)"),
+        (catalog_workouts, f"SCAN workouts USING INDEX {WORKOUT_INDEX}"),
+        (enrollment, f"SEARCH user_training_programs USING INDEX {ENROLLMENT_INDEX} (user_id=?)"),
+    ],
+    ids=["workout by position", "workouts of a program", "catalog load", "enrollment"],
+)
+async def test_lookup_uses_index(
+    session: AsyncSession, program: tuple[int, list[int]], lookup: Lookup, expected: str
+) -> None:
+    statements: list[tuple[str, Any]] = []
+
+    def capture(conn: Any, cursor: Any, statement: str, parameters: Any, *args: Any) -> None:
+        statements.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        await lookup(session, program[0])
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", capture)
+
+    connection = await session.connection()
+    plan = [
+        row.detail
+        for statement, parameters in statements
+        for row in await connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+    ]
+    assert any(line.startswith(expected) for line in plan), plan
+    assert not any("TEMP B-TREE" in line or line == "SCAN workouts" for line in plan), plan
+
+
+async def test_workout_upsert_matches_index(
+    session: AsyncSession, program: tuple[int, list[int]]
+) -> None:
+    program_id, workout_ids = program
+    # The program loader's upsert, ON CONFLICT needs a unique index on its target
+    stmt = dialect_insert(Workout)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Workout.program_id, Workout.order],
+        set_={"description": stmt.excluded.description},
+    )
+    values = {"plan": "plan", "warmup": "warmup", "final_message": "done"}
+    await session.execute(
+        stmt,
+        [
+            {"program_id": program_id, "order": 1, "description": "Changed", **values},
+            {"program_id": program_id, "order": 4, "description": "Added", **values},
+        ],
+    )
+    await session.commit()
+
+    result = await session.execute(
+        select(Workout.id, Workout.description)
+        .where(Workout.program_id == program_id)
+        .order_by(Workout.order)
+    )
+    rows = result.all()
+    assert rows[0] == (workout_ids[0], "Changed")
+    assert [description for _, description in rows[1:]] == ["Workout 2", "Workout 3", "Added"]
+
+
+async def test_statements_counted_by_compiled_kind(
+    session: AsyncSession, program: tuple[int, list[int]]
+) -> None:
+    program_id, workout_ids = program
+    # Neither statement starts with its own keyword
+    first = select(Workout.id).where(Workout.id == workout_ids[0]).cte("first")
+    rename = (
+        update(Workout)
+        .add_cte(first)
+        .where(Workout.id.in_(select(first.c.id)))
+        .values(description="Renamed")
+    )
+    copy = insert(Workout).from_select(
+        ["program_id", "description", "plan", "warmup", "final_message", "order"],
+        select(
+            Workout.program_id,
+            Workout.description,
+            Workout.plan,
+            Workout.warmup,
+            Workout.final_message,
+            Workout.order + 10,
+        ).where(Workout.program_id == program_id),
+    )
+
+    with count_statements() as count:
+        await session.execute(rename)
+        await session.execute(copy)
+        await session.execute(text("SELECT 1"))
+
+    assert count.by_kind() == {"UPDATE": 1, "INSERT": 1, "SELECT": 1}
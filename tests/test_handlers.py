@@ -0,0 +1,152 @@
+import json
+from collections.abc import AsyncIterator
+from typing import Any
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+from telegram import Update
+from telegram.ext import Application, CallbackContext, ContextTypes
+from telegram.request import BaseRequest, RequestData
+
+from bot.db.catalog import catalog
+from bot.db.enrollment_cache import enrollment_cache
+from bot.handlers.common import show_main_menu
+from bot.handlers.running import (
+    ACCEPT_PROGRAM_MENU,
+    SHOW_END_WORKOUT,
+    SHOW_PROGRAM_MENU,
+    SHOW_PROGRAMS,
+    SHOW_WORKOUT_DETAILS,
+    SHOW_WORKOUTS,
+    end_program,
+    end_workout,
+    give_active_workout,
+    handle_workout_details,
+    register_program,
+    running_menu,
+    show_program_menu,
+    show_program_workouts,
+)
+from bot.query_budget import assert_query_budget
+
+USER = {"id": 7_000_000_002, "is_bot": False, "first_name": "Run"}
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "bot", "username": "bot"}
+BOT_MESSAGE = {
+    "message_id": 1,
+    "date": 0,
+    "chat": {"id": USER["id"], "type": "private"},
+    "from": BOT_USER,
+    "text": "menu",
+}
+
+
+class FakeRequest(BaseRequest):
+    """Bot API transport answering every call locally."""
+
+    @property
+    def read_timeout(self) -> float | None:
+        return None
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def do_request(
+        self,
+        url: str,
+        method: str,
+        request_data: RequestData | None = None,
+        read_timeout: Any = None,
+        write_timeout: Any = None,
+        connect_timeout: Any = None,
+        pool_timeout: Any = None,
+    ) -> tuple[int, bytes]:
+        endpoint = url.rsplit("/", 1)[-1]
+        result: Any = True
+        if endpoint == "getMe":
+            result = BOT_USER
+        elif endpoint.startswith(("send", "edit")):
+            result = BOT_MESSAGE
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+
+@pytest.fixture
+async def application() -> AsyncIterator[Application]:
+    application = (
+        Application.builder()
+        .token("1:fake")
+        .request(FakeRequest())
+        .get_updates_request(FakeRequest())
+        .updater(None)
+        .build()
+    )
+    # Running, so that callback queries are answered by its tasks
+    async with application:
+        await application.start()
+        yield application
+        await application.stop()
+
+
+def make_context(application: Application, update: Update) -> ContextTypes.DEFAULT_TYPE:
+    return CallbackContext.from_update(update, application)
+
+
+async def test_handlers_stay_within_query_budgets(
+    application: Application, session: AsyncSession, program: tuple[int, list[int]]
+) -> None:
+    program_id, workout_ids = program
+    await catalog.load()
+    enrollment_cache.discard(USER["id"])
+
+    start = Update.de_json(
+        {
+            "update_id": 1,
+            "message": {
+                **BOT_MESSAGE,
+                "from": USER,
+                "text": "/start",
+                "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+            },
+        },
+        application.bot,
+    )
+    with assert_query_budget(select=2, insert=1):
+        await show_main_menu(start, make_context(application, start))
+
+    # Every button of the flow is tapped on the bot's message
+    update = Update.de_json(
+        {
+            "update_id": 2,
+            "callback_query": {
+                "id": "1",
+                "from": USER,
+                "chat_instance": "1",
+                "message": BOT_MESSAGE,
+                "data": "tap",
+            },
+        },
+        application.bot,
+    )
+    context = make_context(application, update)
+
+    with assert_query_budget(select=1, total=1):
+        assert await running_menu(update, context) == SHOW_PROGRAMS
+    # The enrollment is cached from here on
+    with assert_query_budget(total=0):
+        assert await show_program_menu(update, context, program_id) == SHOW_PROGRAM_MENU
+    with assert_query_budget(total=0):
+        assert await show_program_workouts(update, context, program_id) == SHOW_WORKOUTS
+    with assert_query_budget(total=0):
+        state = await handle_workout_details(update, context, workout_ids[0])
+        assert state == SHOW_WORKOUT_DETAILS
+    with assert_query_budget(insert=1, total=1):
+        assert await register_program(update, context, program_id) == ACCEPT_PROGRAM_MENU
+    with assert_query_budget(total=0):
+        assert await give_active_workout(update, context) == SHOW_WORKOUT_DETAILS
+    with assert_query_budget(insert=1, update=1, total=2):
+        state = await end_workout(update, context, program_id, workout_ids[0])
+        assert state == SHOW_END_WORKOUT
+    with assert_query_budget(update=1, total=1):
+        assert await end_program(update, context, program_id) == SHOW_PROGRAMS
@@ -0,0 +1,24 @@
+import pytest
+
+from bot.callback_data import CallbackAction
+from bot.handlers.routing import CallbackRouter
+from bot.metrics import instrument_handlers, registry
+
+
+async def test_instrument_handlers_wraps_router_routes() -> None:
+    async def failing_route(update: object, context: object, program_id: int) -> None:
+        raise ValueError(program_id)
+
+    router = CallbackRouter({CallbackAction.REGISTER_PROGRAM: failing_route})
+    handlers: list = [router]
+    instrument_handlers(handlers)
+
+    instrumented = handlers[0]
+    assert isinstance(instrumented, CallbackRouter)
+    assert router.routes[CallbackAction.REGISTER_PROGRAM] is failing_route
+
+    with pytest.raises(ValueError):
+        await instrumented.routes[CallbackAction.REGISTER_PROGRAM](None, None, 1)
+    labels = {"handler": "failing_route"}
+    assert registry.get_sample_value("bot_handler_errors_total", labels) == 1
+    assert registry.get_sample_value("bot_handler_duration_seconds_count", labels) == 1
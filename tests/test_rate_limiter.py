@@ -0,0 +1,30 @@
+from typing import Any
+
+from bot.rate_limiter import TelegramRateLimiter
+
+
+async def send_and_edit_twice(limiter: TelegramRateLimiter) -> list[str]:
+    """Send a message and edit it twice to the same text, return the sent endpoints."""
+    sent: list[str] = []
+
+    async def request(endpoint: str) -> dict[str, Any]:
+        sent.append(endpoint)
+        return {"message_id": 1}
+
+    async def process(endpoint: str, data: dict[str, Any]) -> None:
+        await limiter.process_request(request, (endpoint,), {}, endpoint, data, None)
+
+    await process("sendMessage", {"chat_id": 1, "text": "a"})
+    for _ in range(2):
+        await process("editMessageText", {"chat_id": 1, "message_id": 1, "text": "b"})
+    return sent
+
+
+async def test_unchanged_edits_are_skipped() -> None:
+    sent = await send_and_edit_twice(TelegramRateLimiter())
+    assert sent == ["sendMessage", "editMessageText"]
+
+
+async def test_unchanged_edits_are_sent_without_content_memory() -> None:
+    sent = await send_and_edit_twice(TelegramRateLimiter(skip_unchanged_edits=False))
+    assert sent == ["sendMessage", "editMessageText", "editMessageText"]